@@ -0,0 +1,146 @@
+from array import array
+
+from cache import Cache
+
+
+class ArrayCache(Cache):
+
+    # Same geometry, policies and semantics as Cache, but the blocks are not
+    # objects: every piece of block metadata lives in a flat typed array indexed
+    # by slot = line index * associated + way (the data of the slot being the
+    # slot-th block of the data store). Blocks handed out by search are
+    # lightweight ArrayBlock views over those arrays.
+    def create_lines(self):
+        slots = self.no_of_cache_lines * self.associated
+
+        self.tags = array("q", [-1]) * slots
+        self.valid_bits = bytearray(slots)
+        self.dirty_bits = bytearray(slots)
+        self.written_bits = bytearray(slots)
+        self.access_times = array("q", [-1]) * slots
+        self.accessed_counts = array("q", [0]) * slots
+        self.fifo_places = array("q", [0]) * slots
+
+    @property
+    def cache_lines(self):
+        return ArrayCacheLines(self)
+
+    def get_block(self, index, way):
+        slot = index * self.associated + way
+        if not self.valid_bits[slot]:
+            return None
+        return ArrayBlock(self, slot)
+
+    def place_block(self, index, way, tag, fifo_place, data_block):
+        slot = index * self.associated + way
+
+        self.tags[slot] = tag
+        self.valid_bits[slot] = 1
+        self.dirty_bits[slot] = 0
+        self.written_bits[slot] = 0
+        self.access_times[slot] = -1
+        self.accessed_counts[slot] = 0
+        self.fifo_places[slot] = fifo_place
+        data = self.data_view[slot * self.block_size : (slot + 1) * self.block_size]
+        data[:] = data_block if data_block else self.empty_block
+
+    def remove_block(self, index, way):
+        self.valid_bits[index * self.associated + way] = 0
+
+    def find_free_way(self, index):
+        start = index * self.associated
+        slot = self.valid_bits.find(0, start, start + self.associated)
+        return slot - start if slot != -1 else -1
+
+
+class ArrayCacheLines:
+
+    # read-only sequence of lines so that code written against Cache.cache_lines
+    # (display, iteration over all blocks) works unchanged on an ArrayCache
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __len__(self):
+        return self.cache.no_of_cache_lines
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("cache line index out of range")
+        return [
+            self.cache.get_block(index, way) for way in range(self.cache.associated)
+        ]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class ArrayBlock:
+
+    # view over one slot of an ArrayCache, exposes the CacheBlock interface
+    __slots__ = ("cache", "slot")
+
+    def __init__(self, cache, slot):
+        self.cache = cache
+        self.slot = slot
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ArrayBlock)
+            and self.cache is other.cache
+            and self.slot == other.slot
+        )
+
+    def __hash__(self):
+        return hash((id(self.cache), self.slot))
+
+    def get_data_byte(self, block_offset):
+        return self.cache.data_store[self.slot * self.cache.block_size + block_offset]
+
+    def decrement_fifo_place(self):
+        self.cache.fifo_places[self.slot] -= 1
+
+    def get_data(self):
+        start = self.slot * self.cache.block_size
+        return self.cache.data_view[start : start + self.cache.block_size]
+
+    def set_data(self, data, block_offset=0):
+        self.get_data()[block_offset : block_offset + len(data)] = data
+
+    def get_access_time(self):
+        return self.cache.access_times[self.slot]
+
+    def set_access_time(self, time):
+        self.cache.access_times[self.slot] = time
+
+    def get_tag(self):
+        return self.cache.tags[self.slot]
+
+    def get_fifo_place(self):
+        return self.cache.fifo_places[self.slot]
+
+    def is_data_empty(self):
+        return not any(self.get_data())
+
+    def increment_access_count(self):
+        self.cache.accessed_counts[self.slot] += 1
+
+    def set_accessed_count(self, count):
+        self.cache.accessed_counts[self.slot] = count
+
+    def get_accessed_count(self):
+        return self.cache.accessed_counts[self.slot]
+
+    def set_written(self, value):
+        self.cache.written_bits[self.slot] = value
+
+    def get_written(self):
+        return bool(self.cache.written_bits[self.slot])
+
+    def set_dirty_bit(self, value):
+        self.cache.dirty_bits[self.slot] = value
+
+    def get_dirty_bit(self):
+        return bool(self.cache.dirty_bits[self.slot])
@@ -1,6 +1,16 @@
-import random
+import mmap
+import tempfile
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # only simulate_trace needs numpy
+    np = None
 
 import util
+from replacement import create_policy
+from stats import CacheStats
 from util import CacheError, ReplacementStrategy, WritePolicy
 
 
@@ -16,13 +26,12 @@ class Cache:
         block_size,
         replacement_strategy=ReplacementStrategy.RANDOM,
         write_policy=WritePolicy.WRITE_THROUGH,
+        ram=None,
     ):
 
-        if not util.is_power_of_two(block_size):
-            raise util.CacheError("Block size not a power of two")
-
-        if not util.is_power_of_two(capacity):
-            raise util.CacheError("Capacity not a power of two")
+        self.no_of_cache_lines, self.associated = util.cache_geometry(
+            capacity, associativity, block_size
+        )
 
         self.capacity = capacity
         self.no_of_blocks = int(capacity / block_size)
@@ -30,124 +39,598 @@ class Cache:
         self.write_policy = write_policy
         self.block_size = block_size
         self.associativity = associativity
+        self.ram = ram  # source of the blocks that miss in access()
+
+        # called with (cache, block) right before a block leaves the cache,
+        # while it can still be changed (see CacheHierarchy)
+        self.eviction_listener = None
+
+        # blocks are also loaded ahead of demand if set (see prefetch.py)
+        self.prefetcher = None
+        # prefetched blocks not used yet -> the block each one replaced (None
+        # if it took a free way), and back; a replaced block only counts as a
+        # pollution victim while the block that replaced it is unused
+        self.prefetched = {}
+        self.prefetch_victims = {}
+        self.filling_prefetch = None  # the block being prefetched
 
         self.global_access_time = 0
 
-        if self.associativity == util.DIRECTLY_MAPPED:
-            self.no_of_cache_lines = capacity / self.block_size
-            self.associated = 1
-        elif self.associativity == util.FULLY_ASSOCIATIVE:
-            self.no_of_cache_lines = 1
-            self.associated = int(capacity / self.block_size)
-        elif util.is_k_way(self.associativity):
-            self.associated = util.extrack_k_from_k_way(associativity)
-            self.no_of_cache_lines = capacity / (self.associated * self.block_size)
-            if self.no_of_cache_lines < 2:
-                raise util.CacheError(
-                    "K-way association too high (NOTE: Block Size * Associativity <= Capacity / 2)"
-                )
+        # address layout: | tag | line index | block offset |
+        # the line index can only be masked out if the number of lines is a
+        # power of two (K-WAY with K not a power of two falls back to modulo)
+        self.offset_bits = block_size.bit_length() - 1
+        self.no_of_addressable_blocks = 1 << (
+            util.CACHE_ADDRESS_SIZE - self.offset_bits
+        )
+        self.offset_mask = block_size - 1
+        if util.is_power_of_two(self.no_of_cache_lines):
+            self.index_mask = self.no_of_cache_lines - 1
         else:
-            raise util.CacheError("Invalid associativity: " + self.associativity)
+            self.index_mask = None
 
-        self.no_of_cache_lines = int(self.no_of_cache_lines)
+        # the data of every block lives in one preallocated buffer, each block
+        # owns a slice of it and is read and written in place
+        self.data_store = bytearray(
+            self.no_of_cache_lines * self.associated * self.block_size
+        )
+        self.data_view = memoryview(self.data_store)
+        self.empty_block = bytes(self.block_size)
+
+        self.create_lines()
+
+        # per line: tag -> way of the block holding it
+        self.tag_index = [{} for y in range(self.no_of_cache_lines)]
+
+        # per line: the FIFO place of the next block placed in it, after the
+        # youngest one even when blocks were invalidated in between
+        self.next_fifo_places = array("q", [0]) * self.no_of_cache_lines
+
+        self.policy = None
+        self.reset_policy()
+
+        self.stats = CacheStats(
+            self.no_of_cache_lines,
+            self.no_of_cache_lines * self.associated,
+            self.block_size,
+        )
 
+    # storage of the blocks, overridden by engines that keep blocks differently
+    def create_lines(self):
         self.cache_lines = [
             [None for x in range(self.associated)]
             for y in range(self.no_of_cache_lines)
         ]
 
-    def block_replacement(self, line, block):
-
-        replaced_block = None
-
-        if self.strategy == ReplacementStrategy.RANDOM:
-            index = random.randint(0, len(line) - 1)
-        elif self.strategy == ReplacementStrategy.LEAST_FREQUENTLY_USED:
-            index = line.index(min(line, key=lambda x: x.get_accessed_count()))
-        elif self.strategy == ReplacementStrategy.LEAST_RECENTLY_USED:
-            index = line.index(min(line, key=lambda x: x.get_access_time()))
-        elif self.strategy == ReplacementStrategy.MOST_RECENTLY_USED:
-            index = line.index(max(line, key=lambda x: x.get_access_time()))
-        elif self.strategy == ReplacementStrategy.FIRST_IN_FIRST_OUT:
-            index = line.index(min(line, key=lambda x: x.get_fifo_place()))
-            [block.decrement_fifo_place() for block in line]
-        else:
-            raise CacheError("invalid replacement strategy")
+    def get_block(self, index, way):
+        return self.cache_lines[index][way]
 
-        replaced_block = line[index]
-        line[index] = block
-        # save the replaced block
-        if (
+    def block_data_view(self, index, way):
+        start = (index * self.associated + way) * self.block_size
+        return self.data_view[start : start + self.block_size]
+
+    def place_block(self, index, way, tag, fifo_place, data_block):
+        data = self.block_data_view(index, way)
+        data[:] = data_block if data_block else self.empty_block
+        self.cache_lines[index][way] = CacheBlock(
+            self.block_size, tag, fifo_place, data
+        )
+
+    # empties the way, the block being dropped without a write-back
+    def remove_block(self, index, way):
+        self.cache_lines[index][way] = None
+
+    # NOTE : returns -1 if every way of the line holds a block
+    def find_free_way(self, index):
+        for way, block in enumerate(self.cache_lines[index]):
+            if block is None:
+                return way
+        return -1
+
+    # save the block that is about to be replaced and drop it from the tag index
+    def evict(self, index, way):
+        replaced_block = self.get_block(index, way)
+        if replaced_block is None:
+            return
+
+        tag = replaced_block.get_tag()
+        del self.tag_index[index][tag]
+        if self.prefetcher is not None:
+            if tag in self.prefetched:
+                self.forget_prefetch(tag)
+                self.stats.record_useless_prefetch()
+            if self.filling_prefetch is not None:
+                self.prefetched[self.filling_prefetch] = tag
+                self.prefetch_victims[tag] = self.filling_prefetch
+        if self.eviction_listener is not None:
+            self.eviction_listener(self, replaced_block)
+
+        dirty = (
             self.write_policy != WritePolicy.WRITE_THROUGH
             and replaced_block.get_dirty_bit()
-        ):
-            self.write_back_to_ram(replaced_block.get_tag(), replaced_block.get_data())
+        )
+        self.stats.record_eviction(index, dirty)
+        if dirty:
+            self.write_back_to_ram(tag, replaced_block.get_data())
+
+    def block_replacement(self, index, block_index, data_block):
+
+        self.policy.miss(index, block_index)
+        way = self.policy.victim(index)
+        fifo_place = self.take_fifo_place(index)
+
+        self.evict(index, way)
+        self.place_block(index, way, block_index, fifo_place, data_block)
+        self.tag_index[index][block_index] = way
+        self.policy.fill(index, way)
 
     # block index in the RAM memory, data to be loaded in the cache block
     def write_from_ram(self, block_index, data_block):
 
         if self.associativity == util.DIRECTLY_MAPPED:
             line_index = block_index % self.no_of_cache_lines
-            replaced_block = self.cache_lines[line_index][0]
-            self.cache_lines[line_index][0] = CacheBlock(
-                self.block_size, block_index, -1, data_block
+            self.evict(line_index, 0)
+            self.place_block(line_index, 0, block_index, -1, data_block)
+            self.tag_index[line_index][block_index] = 0
+            return
+
+        if self.associativity == util.FULLY_ASSOCIATIVE:
+            line_index = 0
+        else:
+            line_index = block_index % self.no_of_cache_lines
+
+        line_tags = self.tag_index[line_index]
+        way = line_tags.get(block_index)
+
+        if way is not None:
+            # block already cached: reload it in place instead of duplicating it
+            fifo_place = self.get_block(line_index, way).get_fifo_place()
+            self.evict(line_index, way)
+        elif len(line_tags) < self.associated:
+            self.policy.miss(line_index, block_index)
+            way = self.find_free_way(line_index)
+            fifo_place = self.take_fifo_place(line_index)
+        else:
+            self.block_replacement(line_index, block_index, data_block)
+            return
+
+        self.place_block(line_index, way, block_index, fifo_place, data_block)
+        line_tags[block_index] = way
+        self.policy.fill(line_index, way)
+
+    # the FIFO place of a new block of the line, right after the youngest one
+    def take_fifo_place(self, index):
+        fifo_place = self.next_fifo_places[index]
+        self.next_fifo_places[index] = fifo_place + 1
+        return fifo_place
+
+    # Drops the block from the cache without writing it back. Returns a copy of
+    # its data and whether it was dirty, None if the block is not cached.
+    def invalidate(self, block_index):
+
+        index = self.line_index(block_index)
+        way = self.tag_index[index].pop(block_index, None)
+        if way is None:
+            return None
+        self.forget_prefetch(block_index)
+
+        block = self.get_block(index, way)
+        data = bytes(block.get_data())
+        dirty = self.write_policy != WritePolicy.WRITE_THROUGH and block.get_dirty_bit()
+        self.remove_block(index, way)
+        if self.policy is not None:
+            self.policy.invalidate(index, way)
+        return data, dirty
+
+    # Writes a whole block, e.g. one written back by the cache above it. As the
+    # whole block is overwritten, a miss allocates it without reading the RAM.
+    # Returns whether the block was already cached.
+    def write_block(self, block_index, data):
+
+        if len(data) != self.block_size:
+            raise CacheError("Written data does not match the block size")
+
+        index = self.line_index(block_index)
+        hit = block_index in self.tag_index[index]
+        self.stats.record_access(index, block_index, hit, True)
+
+        if not hit:
+            self.write_from_ram(block_index, data)
+
+        self.write(self.get_block(index, self.tag_index[index][block_index]), data)
+        return hit
+
+    def line_index(self, block_index):
+        if self.index_mask is None:
+            return block_index % self.no_of_cache_lines
+        return block_index & self.index_mask
+
+    # line index and way of a cached block
+    def block_location(self, block):
+        tag = block.get_tag()
+        index = tag % self.no_of_cache_lines
+        return index, self.tag_index[index][tag]
+
+    # let the replacement policy know the block was read or written
+    def touch(self, block):
+        if self.policy is not None and self.policy.tracks_accesses:
+            index, way = self.block_location(block)
+            self.policy.access(index, way)
+
+    # Replays a whole trace: an array of addresses and, optionally, an array of
+    # ops (true means write). Returns (hits, counters), the hit vector in trace
+    # order and the totals of the run. The cache is left as if access() had
+    # been called for every address, writes keeping the data of the block.
+    # NOTE : set-associative caches are replayed line by line, so RANDOM
+    # replacement draws its victims in a different order than access() would
+    def simulate_trace(self, addresses, ops=None):
+
+        if np is None:
+            raise CacheError("simulate_trace needs numpy")
+        # the levels of a hierarchy and the cores of a coherent system must
+        # see every miss in trace order (see their own simulate_trace)
+        if self.ram is not None and not isinstance(self.ram, Ram):
+            raise CacheError("Only a cache backed by a Ram can replay a trace")
+
+        addresses = np.asarray(addresses, dtype=np.int64)
+        if ops is None:
+            writes = np.zeros(addresses.shape, dtype=bool)
+        else:
+            writes = np.asarray(ops, dtype=bool)
+            if writes.shape != addresses.shape:
+                raise CacheError("Trace addresses and ops differ in length")
+
+        if len(addresses) and (
+            addresses.min() < 0 or addresses.max() >= 1 << util.CACHE_ADDRESS_SIZE
+        ):
+            raise CacheError(
+                f"Trace address does not fit in {util.CACHE_ADDRESS_SIZE} bits"
+            )
+
+        tags = addresses >> self.offset_bits
+        if (
+            len(tags)
+            and self.ram is not None
+            and not (
+                self.ram.holds(int(tags.min())) and self.ram.holds(int(tags.max()))
             )
+        ):
+            raise CacheError("Trace address outside of the RAM")
 
-            if replaced_block:
-                if (
-                    self.write_policy != WritePolicy.WRITE_THROUGH
-                    and replaced_block.get_dirty_bit()
-                ):
-                    self.write_back_to_ram(
-                        replaced_block.get_tag(), replaced_block.get_data()
-                    )
+        if self.index_mask is None:
+            indices = tags % self.no_of_cache_lines
+        else:
+            indices = tags & self.index_mask
 
+        # lines are independent, so the trace is grouped by line up front
+        # (stable sort: the order of the accesses inside a line is kept);
+        # a prefetcher loads blocks of other lines, so it needs trace order
+        if self.prefetcher is None:
+            order = np.argsort(indices, kind="stable")
         else:
-            line = None
-            if self.associativity == util.FULLY_ASSOCIATIVE:
-                line = self.cache_lines[0]
+            order = np.arange(len(addresses))
+
+        base_time = self.global_access_time
+        if self.associativity == util.DIRECTLY_MAPPED and self.prefetcher is None:
+            hits, evictions = self.simulate_directly_mapped(
+                order, tags, indices, writes
+            )
+        else:
+            hits, evictions = self.simulate_by_line(order, tags, indices, writes)
+        self.global_access_time = base_time + len(addresses)
+        # a prefetch between two accesses to a block can evict it
+        self.stats.record_trace(
+            tags, indices, writes, hits, repeats_hit=self.prefetcher is None
+        )
+
+        no_of_hits = int(np.count_nonzero(hits))
+        no_of_writes = int(np.count_nonzero(writes))
+        counters = {
+            "accesses": len(addresses),
+            "reads": len(addresses) - no_of_writes,
+            "writes": no_of_writes,
+            "hits": no_of_hits,
+            "misses": len(addresses) - no_of_hits,
+            "evictions": evictions,
+        }
+        return hits, counters
+
+    def fetch_from_ram(self, block_index):
+        if self.ram is None:
+            self.stats.record_ram_read()
+            return None
+        data_block = self.ram.load_block(block_index)
+        self.stats.record_ram_read()
+        return data_block
+
+    # one access at a time, but on the trace grouped by line; the access times
+    # are those of the original trace order
+    def simulate_by_line(self, order, tags, indices, writes):
+
+        base_time = self.global_access_time
+        hits = bytearray(len(order))
+        evictions_before = self.stats.evictions
+
+        for position, tag, index, is_write in zip(
+            order.tolist(),
+            tags[order].tolist(),
+            indices[order].tolist(),
+            writes[order].tolist(),
+        ):
+            line_tags = self.tag_index[index]
+            way = line_tags.get(tag)
+
+            if way is None:
+                self.write_from_ram(tag, self.fetch_from_ram(tag))
+                way = line_tags[tag]
             else:
-                line = self.cache_lines[block_index % self.no_of_cache_lines]
+                hits[position] = 1
 
-            fifo_place = sum(x is not None for x in line)
-            new_block = CacheBlock(self.block_size, block_index, fifo_place, data_block)
+            block = self.get_block(index, way)
+            self.global_access_time = base_time + position
+            if is_write:
+                self.write(block, None)
+            else:
+                self.read(block)
+
+            if self.prefetcher is not None:
+                self.prefetch(tag, hits[position] == 1)
+
+        return np.frombuffer(hits, dtype=bool), self.stats.evictions - evictions_before
+
+    # Every line holds one block, so an access hits exactly when the previous
+    # access to its line had the same tag. The trace (grouped by line) is cut
+    # in runs: the accesses to one block between its fill and its eviction.
+    # Only the last run of every line decides the final state of the cache.
+    def simulate_directly_mapped(self, order, tags, indices, writes):
+
+        size = len(order)
+        hits = np.zeros(size, dtype=bool)
+        if size == 0:
+            return hits, 0
+
+        tags = tags[order]
+        indices = indices[order]
+        writes = writes[order]
+
+        new_line = np.empty(size, dtype=bool)
+        new_line[0] = True
+        new_line[1:] = indices[1:] != indices[:-1]
+        line_starts = np.flatnonzero(new_line)
+        lines = indices[line_starts].tolist()
+
+        # the blocks the touched lines held before the trace
+        resident = [self.get_block(index, 0) for index in lines]
+
+        previous = np.empty(size, dtype=np.int64)
+        previous[1:] = tags[:-1]
+        previous[line_starts] = [-1 if b is None else b.get_tag() for b in resident]
+        sorted_hits = tags == previous
+        hits[order] = sorted_hits
+
+        misses = ~sorted_hits
+        evictions = int(np.count_nonzero(misses)) - resident.count(None)
+
+        run_starts = np.flatnonzero(misses | new_line)
+        run_ends = np.append(run_starts[1:], size) - 1
+        run_lengths = run_ends - run_starts + 1
+        run_writes = np.add.reduceat(writes.astype(np.int64), run_starts)
+        run_filled = misses[run_starts]
+        run_lines = np.cumsum(new_line)[run_starts] - 1
+
+        # a run that is not filled continues the block that was resident
+        prior_dirty = np.array([b is not None and b.get_dirty_bit() for b in resident])
+        prior_written = np.array([b is not None and b.get_written() for b in resident])
+        carried = ~run_filled
+        if self.write_policy == WritePolicy.WRITE_THROUGH:
+            dirty = np.zeros(len(run_starts), dtype=bool)
+        elif self.write_policy == WritePolicy.WRITE_BACK:
+            dirty = (run_writes > 0) | (carried & prior_dirty[run_lines])
+        elif self.write_policy == WritePolicy.WRITE_ONCE:
+            # the first write of a block goes through, the next ones dirty it
+            first_write_done = carried & prior_written[run_lines]
+            dirty = (run_writes >= np.where(first_write_done, 1, 2)) | (
+                carried & prior_dirty[run_lines]
+            )
+        else:
+            raise CacheError("invalid write policy")
 
-            placed = False
-            for index, block in enumerate(line):
-                if block is None:
-                    line[index] = new_block
-                    placed = True
-                    break
+        first_runs = np.flatnonzero(new_line[run_starts])
+        last_runs = np.append(first_runs[1:], len(run_starts)) - 1
+
+        # The trace carries no data, so the blocks filled and evicted during it
+        # only move bytes the RAM already holds: their evictions and traffic are
+        # counted without replaying them. The blocks resident before the trace
+        # are evicted (and written back) for real below.
+        replaced = run_filled.copy()
+        replaced[last_runs] = False
+        self.stats.record_evictions(indices[run_starts[replaced]], dirty[replaced])
+        write_backs = int(np.count_nonzero(dirty & replaced))
+
+        if self.write_policy == WritePolicy.WRITE_THROUGH:
+            write_backs += int(np.count_nonzero(writes))
+        elif self.write_policy == WritePolicy.WRITE_ONCE:
+            write_backs += int(
+                np.count_nonzero(
+                    (run_writes > 0) & ~(carried & prior_written[run_lines])
+                )
+            )
 
-            if not placed:
-                self.block_replacement(line, new_block)
+        block_reads = int(np.count_nonzero(misses))
+        self.stats.record_ram_read(block_reads)
+        self.stats.record_ram_write(write_backs)
+        if self.ram is not None:
+            self.ram.record_traffic(block_reads, write_backs)
+
+        for index, block, first_run, last_run in zip(
+            lines, resident, first_runs.tolist(), last_runs.tolist()
+        ):
+            end = run_ends[last_run]
+
+            if run_filled[last_run]:
+                if block is not None:
+                    if not run_filled[first_run]:
+                        block.set_dirty_bit(bool(dirty[first_run]))
+                    self.evict(index, 0)
+
+                tag = int(tags[end])
+                data = None if self.ram is None else self.ram.fetch_data(tag)
+                self.place_block(index, 0, tag, -1, data)
+                self.tag_index[index][tag] = 0
+                block = self.get_block(index, 0)
+                accessed_count = 0
+            else:
+                accessed_count = block.get_accessed_count()
+
+            block.set_access_time(self.global_access_time + int(order[end]) + 1)
+            block.set_accessed_count(accessed_count + int(run_lengths[last_run]))
+            if run_writes[last_run]:
+                block.set_written(True)
+            block.set_dirty_bit(bool(dirty[last_run]))
+
+        return hits, evictions
 
     # NOTE : shall return block if found, None otherwise
     def search(self, tag, index=0):
 
-        line = self.cache_lines[index]
-        for x in line:
-            if x is not None and x.get_tag() == tag:
-                return x
+        way = self.tag_index[index].get(tag)
+        if way is None:
+            return None
+
+        return self.get_block(index, way)
 
-        return None
+    # NOTE : the tag is the block index in the RAM memory, like everywhere else
+    # in the cache (the line index bits are not stripped from it)
+    def decode_address(self, address):
+
+        if not 0 <= address < 1 << util.CACHE_ADDRESS_SIZE:
+            raise CacheError(
+                f"Address {address} does not fit in {util.CACHE_ADDRESS_SIZE} bits"
+            )
+
+        tag = address >> self.offset_bits
+        if self.index_mask is None:
+            index = tag % self.no_of_cache_lines
+        else:
+            index = tag & self.index_mask
+
+        return tag, index, address & self.offset_mask
+
+    # Reads or writes the bytes at the address, loading their block from the
+    # RAM on a miss. Returns (hit, data): a view of the accessed bytes after
+    # the access (a copy of them if the cache has a prefetcher). A write
+    # stores data at the address (it may not run past the end of the block), a
+    # read returns size bytes (default: up to the end of the block). Data as
+    # large as a block is always the whole block.
+    # NOTE : a write without data leaves the data of the block as it is
+    # pc - program counter of the access, only used by the prefetcher
+    def access(self, address, is_write, data=None, pc=None, size=None):
+
+        tag, index, offset = self.decode_address(address)
+
+        if is_write and data is not None:
+            if len(data) == self.block_size:
+                offset = 0
+            size = len(data)
+        elif size is None:
+            size = self.block_size - offset
+        if offset + size > self.block_size:
+            raise CacheError("Accessed bytes run past the end of the block")
+
+        way = self.tag_index[index].get(tag)
+        hit = way is not None
+
+        if not hit:
+            if self.ram is None:
+                raise CacheError("No RAM to load the missing block from")
+            # a block outside of the RAM fails here, before anything changed
+            data_block = self.fetch_from_ram(tag)
+
+        self.stats.record_access(index, tag, hit, is_write)
+        if not hit:
+            self.write_from_ram(tag, data_block)
+            way = self.tag_index[index][tag]
+
+        block = self.get_block(index, way)
+
+        if is_write:
+            self.write(block, data, offset)
+            data = block.get_data()
+        else:
+            data = self.read(block)
+        data = data[offset : offset + size]
+
+        if self.prefetcher is not None:
+            # the prefetches may evict the block and reuse its slot
+            data = bytes(data)
+            self.prefetch(tag, hit, pc)
+
+        return hit, data
+
+    # tells the prefetcher about the demand access to the block and loads the
+    # blocks it asks for
+    def prefetch(self, block_index, hit, pc=None):
+
+        prefetch_hit = hit and block_index in self.prefetched
+        if prefetch_hit:
+            self.forget_prefetch(block_index)
+            self.stats.record_useful_prefetch()
+        elif not hit and block_index in self.prefetch_victims:
+            del self.prefetch_victims[block_index]
+            self.stats.record_pollution_miss()
+
+        for candidate in self.prefetcher.on_access(block_index, hit, pc, prefetch_hit):
+            if not 0 <= candidate < self.no_of_addressable_blocks:
+                continue
+            if self.ram is not None and not self.ram.holds(candidate):
+                continue
+            if candidate in self.tag_index[self.line_index(candidate)]:
+                continue
+
+            self.filling_prefetch = candidate
+            self.write_from_ram(candidate, self.fetch_from_ram(candidate))
+            self.filling_prefetch = None
+            self.prefetched.setdefault(candidate, None)
+
+            index = self.line_index(candidate)
+            way = self.tag_index[index][candidate]
+            self.get_block(index, way).set_access_time(self.global_access_time)
+            if self.policy is not None:
+                self.policy.prefetch_fill(index, way)
+            self.stats.record_prefetch()
+
+    # the prefetched block was used or left the cache, so the block it replaced
+    # is no longer a pollution victim
+    def forget_prefetch(self, block_index):
+        victim = self.prefetched.pop(block_index, None)
+        if victim is not None and self.prefetch_victims.get(victim) == block_index:
+            del self.prefetch_victims[victim]
+
+    def set_prefetcher(self, prefetcher):
+        self.prefetcher = prefetcher
+        self.prefetched.clear()
+        self.prefetch_victims.clear()
 
     # NOTE : you also have to simulate the saving of block if dirty bit is set
-    def write(self, block, data):
+    # NOTE : data is copied into the block at the offset, None only marks the
+    # block written
+    def write(self, block, data, block_offset=0):
 
         self.global_access_time += 1
         block.set_access_time(self.global_access_time)
 
+        if data is not None:
+            if block_offset + len(data) > self.block_size:
+                raise CacheError("Written data does not fit in the block")
+            block.set_data(data, block_offset)
+
         if self.write_policy == WritePolicy.WRITE_THROUGH:
-            block.set_data(data)
-            self.write_back_to_ram(block.get_tag(), data)
+            self.write_back_to_ram(block.get_tag(), block.get_data())
         elif self.write_policy == WritePolicy.WRITE_BACK:
-            block.set_data(data)
             block.set_dirty_bit(True)
         elif self.write_policy == WritePolicy.WRITE_ONCE:
-            block.set_data(data)
             if not block.get_written():
-                self.write_back_to_ram(block.get_tag(), data)
+                self.write_back_to_ram(block.get_tag(), block.get_data())
             else:
                 block.set_dirty_bit(True)
         else:
@@ -155,6 +638,7 @@ class Cache:
 
         block.increment_access_count()
         block.set_written(True)
+        self.touch(block)
 
     def read(self, block, block_offset=None):  # access byte in block or entire block
 
@@ -162,12 +646,21 @@ class Cache:
         block.set_access_time(self.global_access_time)
 
         block.increment_access_count()
+        self.touch(block)
         if block_offset:
             return block.get_data_byte(block_offset)
         return block.get_data()
 
     def write_back_to_ram(self, block_index, data):
-        pass  # Should not do anything actually :))
+        self.stats.record_ram_write()
+        if self.ram is not None:
+            self.ram.store_data(block_index, data)
+
+    def get_ram(self):
+        return self.ram
+
+    def set_ram(self, ram):
+        self.ram = ram
 
     def get_write_policy(self):
         return self.write_policy
@@ -180,6 +673,19 @@ class Cache:
 
     def set_strategy(self, strategy: ReplacementStrategy):
         self.strategy = strategy
+        self.reset_policy()
+
+    # directly mapped caches never choose a victim, so they need no policy
+    def reset_policy(self):
+        if self.associativity == util.DIRECTLY_MAPPED:
+            return
+
+        self.policy = create_policy(
+            self.strategy, self.no_of_cache_lines, self.associated
+        )
+        for index, line_tags in enumerate(self.tag_index):
+            if line_tags:
+                self.policy.load_line(index, self.cache_lines[index])
 
     def __str__(self) -> str:
         string = f"\nCACHE: capacity - {self.capacity} MB; block_size - {self.block_size} B; associativity - {self.associativity}\n\n"
@@ -189,7 +695,7 @@ class Cache:
                     string += "####################" + "   "
                     continue
                 string += (
-                    " ".join([str(elem) for elem in block.get_data()])
+                    util.format_data(block.get_data())
                     + "\t"
                     + str(block.get_tag())
                     + "\t"
@@ -199,13 +705,16 @@ class Cache:
 
 
 class CacheBlock:
+
+    # data - writable view of the block data (normally a slice of the data
+    # store of the cache), a zeroed buffer is allocated if not given
     def __init__(self, block_size, tag, fifo_place, data=None):
         self.no_of_cells = block_size
         self.tag = tag
-        if data:
+        if data is not None:
             self.data = data
         else:
-            self.data = [None for i in range(self.no_of_cells)]
+            self.data = memoryview(bytearray(self.no_of_cells))
         self.dirty_bit = False  # NOTE : for write back policy
         self.accessed_count = 0  # MOST/LAST frequently used replacement policy
         self.written = False  # NOTE : for write once policy
@@ -221,8 +730,8 @@ class CacheBlock:
     def get_data(self):
         return self.data
 
-    def set_data(self, data):
-        self.data = data
+    def set_data(self, data, block_offset=0):
+        self.data[block_offset : block_offset + len(data)] = data
 
     def get_access_time(self):
         return self.access_time
@@ -242,6 +751,9 @@ class CacheBlock:
     def increment_access_count(self):
         self.accessed_count += 1
 
+    def set_accessed_count(self, count):
+        self.accessed_count = count
+
     def get_accessed_count(self):
         return self.accessed_count
 
@@ -258,19 +770,156 @@ class CacheBlock:
         return self.dirty_bit
 
 
+# BYTE_SHIFTS[shift] maps every byte b to (b + shift) % BYTE_MAX, for bytes.translate
+BYTE_SHIFTS = [
+    bytes((shift + value) % util.BYTE_MAX for value in range(util.BYTE_MAX))
+    for shift in range(util.BYTE_MAX)
+]
+
+
 class Ram:
-    def __init__(self, size_in_megabytes, block_size_in_bytes):
+
+    # Blocks that were never written hold a fixed pattern (see fetch_data) and
+    # take no memory. The first write to a page of the RAM materializes that
+    # page in a sparse memory-mapped file; only touched pages ever use memory
+    # or disk, so the RAM can be as large as the address space.
+    # memo_size - number of recently fetched pattern blocks kept around (0 disables it)
+    # backing_path - file backing the RAM (default: an anonymous temporary file)
+    def __init__(
+        self,
+        size_in_megabytes,
+        block_size_in_bytes,
+        memo_size=0,
+        backing_path=None,
+    ):
         self.size_in_megabytes = size_in_megabytes
         self.block_size_in_bytes = block_size_in_bytes
-        self.index_count = int(
-            size_in_megabytes * 1024 * 1024 / self.block_size_in_bytes
+        self.size_in_bytes = int(size_in_megabytes * 1024 * 1024)
+        self.index_count = int(self.size_in_bytes / self.block_size_in_bytes)
+
+        # byte i of block n is (PRIME_ONE * n + PRIME_TWO * i) % BYTE_MAX, that is
+        # the PRIME_TWO * i part shifted by the same amount for the whole block
+        self.block_pattern = bytes(
+            (util.PRIME_TWO * index) % util.BYTE_MAX
+            for index in range(self.block_size_in_bytes)
         )
 
+        self.memo_size = memo_size
+        self.memo = OrderedDict()
+
+        self.page_size = max(mmap.PAGESIZE, self.block_size_in_bytes)
+        self.backing_path = backing_path
+        self.backing_file = None
+        self.backing_store = None  # mapped on the first write
+        self.materialized_pages = set()
+
+        # memory traffic
+        self.read_transactions = 0
+        self.bytes_read = 0
+        self.write_transactions = 0
+        self.bytes_written = 0
+
+    # whether the block is part of the RAM
+    def holds(self, block_index):
+        return 0 <= block_index < self.index_count
+
+    # contents of the block, without counting it as memory traffic
     def fetch_data(self, block_index):
-        return [
-            hex((util.PRIME_ONE * block_index + util.PRIME_TWO * index) % util.BYTE_MAX)
-            for index in range(self.block_size_in_bytes)
-        ]
+
+        if not self.holds(block_index):
+            raise CacheError(f"Block {block_index} is outside of the RAM")
+
+        if self.materialized_pages:
+            start = block_index * self.block_size_in_bytes
+            if start // self.page_size in self.materialized_pages:
+                return bytes(
+                    self.backing_store[start : start + self.block_size_in_bytes]
+                )
+
+        return self.pattern_data(block_index)
+
+    def pattern_data(self, block_index):
+
+        if self.memo_size:
+            data = self.memo.get(block_index)
+            if data is not None:
+                self.memo.move_to_end(block_index)
+                return data
+
+        shift = (util.PRIME_ONE * block_index) % util.BYTE_MAX
+        data = self.block_pattern.translate(BYTE_SHIFTS[shift])
+
+        if self.memo_size:
+            self.memo[block_index] = data
+            if len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+
+        return data
+
+    # a block read by a cache
+    def load_block(self, block_index):
+        data = self.fetch_data(block_index)
+        self.read_transactions += 1
+        self.bytes_read += self.block_size_in_bytes
+        return data
+
+    # a block written back by a cache
+    def store_data(self, block_index, data):
+
+        if not self.holds(block_index):
+            raise CacheError(f"Block {block_index} is outside of the RAM")
+
+        start = block_index * self.block_size_in_bytes
+        page = start // self.page_size
+        if page not in self.materialized_pages:
+            self.materialize_page(page)
+
+        self.backing_store[start : start + self.block_size_in_bytes] = data
+
+        self.write_transactions += 1
+        self.bytes_written += self.block_size_in_bytes
+
+    # traffic of blocks moved without their data (see Cache.simulate_trace)
+    def record_traffic(self, block_reads, block_writes):
+        self.read_transactions += block_reads
+        self.bytes_read += block_reads * self.block_size_in_bytes
+        self.write_transactions += block_writes
+        self.bytes_written += block_writes * self.block_size_in_bytes
+
+    def map_backing_store(self):
+
+        if self.backing_store is not None:
+            return
+        if self.backing_path is None:
+            self.backing_file = tempfile.TemporaryFile()
+        else:
+            self.backing_file = open(self.backing_path, "w+b")
+        # a truncated file is sparse: no page takes space before it is written
+        self.backing_file.truncate(self.size_in_bytes)
+        self.backing_store = mmap.mmap(self.backing_file.fileno(), self.size_in_bytes)
+
+    def materialize_page(self, page):
+
+        self.map_backing_store()
+
+        start = page * self.page_size
+        end = min(start + self.page_size, self.size_in_bytes)
+        first_block = start // self.block_size_in_bytes
+        last_block = end // self.block_size_in_bytes
+
+        self.backing_store[start:end] = b"".join(
+            self.pattern_data(block_index)
+            for block_index in range(first_block, last_block)
+        )
+        self.materialized_pages.add(page)
+
+    def get_traffic(self):
+        return {
+            "read_transactions": self.read_transactions,
+            "bytes_read": self.bytes_read,
+            "write_transactions": self.write_transactions,
+            "bytes_written": self.bytes_written,
+        }
 
     def __str__(self) -> str:
         return f"RAM: capacity - {self.size_in_megabytes} MB; block_size - {self.block_size_in_bytes} B"
@@ -0,0 +1,334 @@
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+import util
+from array_cache import ArrayCache
+from cache import Cache
+from cache import CacheBlock
+from cache import Ram
+from util import CacheError, ReplacementStrategy, WritePolicy
+
+# Checkpoints of a cache (blocks, metadata, replacement policy state, stats)
+# and of its RAM, so experiments can start from a warmed cache instead of
+# replaying the warm-up trace every time. Loading a checkpoint again gives a
+# new, independent copy of the state.
+#
+# File layout (little-endian):
+#   CHECKPOINT_MAGIC, then version and header length as two uint32
+#   header - JSON: configuration, scalar state and the (offset, length) of
+#            every section, offsets counted from the end of the header
+#   sections - raw binary in native byte order (the header tells which),
+#              each starting at a multiple of 8 bytes: the block
+#              metadata as flat arrays (one item per way of every line), the
+#              block data, the stats arrays, the pickled replacement policy
+#              and the RAM pages that were written
+# The file is memory-mapped on load and the sections are copied straight out
+# of the mapping.
+#
+# NOTE : the policy section is a pickle, so only load checkpoints you trust
+# NOTE : prefetchers, eviction listeners and the RAM of a cache that is not a
+# Ram (a level of a hierarchy, a core of a coherent system) are not saved
+
+CHECKPOINT_MAGIC = b"CACHECK1"
+CHECKPOINT_VERSION = 2
+CHECKPOINT_PREFIX = struct.Struct("<8sII")
+
+# block metadata arrays (typecode "q" or a bytearray "B"), as in ArrayCache
+BLOCK_FIELDS = (
+    ("tags", "q"),
+    ("valid_bits", "B"),
+    ("dirty_bits", "B"),
+    ("written_bits", "B"),
+    ("access_times", "q"),
+    ("accessed_counts", "q"),
+    ("fifo_places", "q"),
+)
+STATS_LINE_ARRAYS = (
+    "line_hits",
+    "line_misses",
+    "line_evictions",
+    "line_dirty_writebacks",
+)
+
+
+# ram - the RAM to save along (default: the RAM of the cache, if any)
+def save_checkpoint(path, cache, ram=None):
+
+    if ram is None:
+        ram = cache.get_ram()
+    if ram is not None and not isinstance(ram, Ram):
+        raise CacheError("Only a cache backed by a Ram can be checkpointed")
+
+    sections = {}
+    for name, data in block_sections(cache):
+        sections[name] = data
+    sections["data"] = cache.data_store
+
+    stats = cache.stats
+    for name in STATS_LINE_ARRAYS:
+        sections["stats_" + name] = getattr(stats, name)
+    sections["stats_seen_tags"] = array("q", stats.seen_tags)
+    sections["stats_shadow_tags"] = array("q", stats.shadow_tags)
+    sections["policy"] = pickle.dumps(cache.policy, pickle.HIGHEST_PROTOCOL)
+
+    header = {
+        "byteorder": sys.byteorder,
+        "cache": {
+            "engine": (
+                util.ARRAY_ENGINE
+                if isinstance(cache, ArrayCache)
+                else util.OBJECT_ENGINE
+            ),
+            "capacity": cache.capacity,
+            "associativity": cache.associativity,
+            "block_size": cache.block_size,
+            "strategy": (
+                cache.strategy.name
+                if isinstance(cache.strategy, ReplacementStrategy)
+                else cache.strategy
+            ),
+            "write_policy": cache.write_policy.name,
+            "global_access_time": cache.global_access_time,
+        },
+        "stats": {
+            "classify_misses": stats.classify_misses,
+            "counters": {
+                name: value for name, value in vars(stats).items() if type(value) is int
+            },
+        },
+        "ram": None,
+    }
+
+    if ram is not None:
+        pages = sorted(ram.materialized_pages)
+        header["ram"] = {
+            "size_in_megabytes": ram.size_in_megabytes,
+            "block_size_in_bytes": ram.block_size_in_bytes,
+            "memo_size": ram.memo_size,
+            "page_size": ram.page_size,
+            "traffic": ram.get_traffic(),
+        }
+        sections["ram_pages"] = array("q", pages)
+        sections["ram_data"] = b"".join(
+            ram.backing_store[page * ram.page_size : (page + 1) * ram.page_size]
+            for page in pages
+        )
+
+    write_sections(path, header, sections)
+
+
+# returns (cache, ram) as they were saved; ram is None if no RAM was saved
+def load_checkpoint(path):
+
+    with open(path, "rb") as checkpoint:
+        if os.fstat(checkpoint.fileno()).st_size < CHECKPOINT_PREFIX.size:
+            raise CacheError(path + " is not a cache checkpoint")
+        mapping = mmap.mmap(checkpoint.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapping)
+    sections = {}  # name -> view of the section in the mapping
+    try:
+        header = read_sections(path, view, sections)
+        return restore(header, sections)
+    finally:
+        # the mapping cannot be closed while views of it are alive
+        for section in sections.values():
+            section.release()
+        view.release()
+        mapping.close()
+
+
+def block_sections(cache):
+
+    if isinstance(cache, ArrayCache):
+        for name, typecode in BLOCK_FIELDS:
+            yield name, getattr(cache, name)
+        return
+
+    fields = {
+        name: array(typecode, [0]) * (cache.no_of_cache_lines * cache.associated)
+        for name, typecode in BLOCK_FIELDS
+    }
+    slot = 0
+    for line in cache.cache_lines:
+        for block in line:
+            if block is not None:
+                fields["tags"][slot] = block.get_tag()
+                fields["valid_bits"][slot] = 1
+                fields["dirty_bits"][slot] = block.get_dirty_bit()
+                fields["written_bits"][slot] = block.get_written()
+                fields["access_times"][slot] = block.get_access_time()
+                fields["accessed_counts"][slot] = block.get_accessed_count()
+                fields["fifo_places"][slot] = block.get_fifo_place()
+            slot += 1
+
+    for name, typecode in BLOCK_FIELDS:
+        yield name, fields[name]
+
+
+def write_sections(path, header, sections):
+
+    layout = {}
+    offset = 0
+    for name, data in sections.items():
+        length = memoryview(data).nbytes
+        layout[name] = (offset, length)
+        offset += length + -length % 8
+    header["sections"] = layout
+    encoded = json.dumps(header).encode()
+
+    with open(path, "wb") as checkpoint:
+        checkpoint.write(
+            CHECKPOINT_PREFIX.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(encoded))
+        )
+        checkpoint.write(encoded)
+        checkpoint.write(bytes(-checkpoint.tell() % 8))
+        for name, data in sections.items():
+            checkpoint.write(data)
+            checkpoint.write(bytes(-layout[name][1] % 8))
+
+
+# reads the header and puts a view of every section in sections
+def read_sections(path, view, sections):
+
+    magic, version, header_length = CHECKPOINT_PREFIX.unpack_from(view)
+    if magic != CHECKPOINT_MAGIC:
+        raise CacheError(path + " is not a cache checkpoint")
+    if version != CHECKPOINT_VERSION:
+        raise CacheError(f"Unsupported checkpoint version {version}")
+
+    start = CHECKPOINT_PREFIX.size
+    header = json.loads(bytes(view[start : start + header_length]))
+    if header["byteorder"] != sys.byteorder:
+        raise CacheError(
+            f"{path} was written on a {header['byteorder']}-endian machine"
+        )
+
+    start += header_length
+    start += -start % 8
+    for name, (offset, length) in header["sections"].items():
+        if start + offset + length > len(view):
+            raise CacheError(path + " is truncated")
+        sections[name] = view[start + offset : start + offset + length]
+
+    return header
+
+
+# array of 64-bit integers with the contents of the section
+def int_array(section):
+    values = array("q")
+    values.frombytes(section)
+    return values
+
+
+def restore(header, sections):
+
+    config = header["cache"]
+    strategy = config["strategy"]
+    if strategy in ReplacementStrategy.__members__:
+        strategy = ReplacementStrategy[strategy]
+    engine = ArrayCache if config["engine"] == util.ARRAY_ENGINE else Cache
+
+    cache = engine(
+        config["capacity"],
+        config["associativity"],
+        config["block_size"],
+        strategy,
+        WritePolicy[config["write_policy"]],
+    )
+    cache.global_access_time = config["global_access_time"]
+    cache.data_store[:] = sections["data"]
+
+    fields = {}
+    for name, typecode in BLOCK_FIELDS:
+        if typecode == "B":
+            fields[name] = bytearray(sections[name])
+        else:
+            fields[name] = int_array(sections[name])
+    restore_blocks(cache, fields)
+    cache.policy = pickle.loads(sections["policy"])
+
+    stats = cache.stats
+    stats.classify_misses = header["stats"]["classify_misses"]
+    for name, value in header["stats"]["counters"].items():
+        setattr(stats, name, value)
+    for name in STATS_LINE_ARRAYS:
+        setattr(stats, name, int_array(sections["stats_" + name]))
+    stats.seen_tags = set(int_array(sections["stats_seen_tags"]))
+    stats.shadow_tags = OrderedDict.fromkeys(int_array(sections["stats_shadow_tags"]))
+
+    ram = None
+    if header["ram"] is not None:
+        ram = restore_ram(header["ram"], sections)
+        cache.set_ram(ram)
+
+    return cache, ram
+
+
+def restore_blocks(cache, fields):
+
+    if isinstance(cache, ArrayCache):
+        for name, typecode in BLOCK_FIELDS:
+            setattr(cache, name, fields[name])
+    else:
+        for slot in range(len(fields["valid_bits"])):
+            if not fields["valid_bits"][slot]:
+                continue
+            index, way = divmod(slot, cache.associated)
+            block = cache.cache_lines[index][way] = CacheBlock(
+                cache.block_size,
+                fields["tags"][slot],
+                fields["fifo_places"][slot],
+                cache.block_data_view(index, way),
+            )
+            block.set_dirty_bit(bool(fields["dirty_bits"][slot]))
+            block.set_written(bool(fields["written_bits"][slot]))
+            block.set_access_time(fields["access_times"][slot])
+            block.set_accessed_count(fields["accessed_counts"][slot])
+
+    tags = fields["tags"]
+    valid_bits = fields["valid_bits"]
+    fifo_places = fields["fifo_places"]
+    for slot in range(len(valid_bits)):
+        if valid_bits[slot]:
+            index, way = divmod(slot, cache.associated)
+            cache.tag_index[index][tags[slot]] = way
+            cache.next_fifo_places[index] = max(
+                cache.next_fifo_places[index], fifo_places[slot] + 1
+            )
+
+
+def restore_ram(config, sections):
+
+    ram = Ram(
+        config["size_in_megabytes"],
+        config["block_size_in_bytes"],
+        config["memo_size"],
+    )
+    # the pages are those of the machine that saved the RAM, which may differ
+    # from the pages of this one
+    ram.page_size = config["page_size"]
+    traffic = config["traffic"]
+    ram.read_transactions = traffic["read_transactions"]
+    ram.bytes_read = traffic["bytes_read"]
+    ram.write_transactions = traffic["write_transactions"]
+    ram.bytes_written = traffic["bytes_written"]
+
+    pages = int_array(sections["ram_pages"])
+    if pages:
+        ram.map_backing_store()
+        data = sections["ram_data"]
+        for position, page in enumerate(pages):
+            start = page * ram.page_size
+            length = min(ram.page_size, ram.size_in_bytes - start)
+            offset = position * ram.page_size
+            ram.backing_store[start : start + length] = data[offset : offset + length]
+            ram.materialized_pages.add(page)
+
+    return ram
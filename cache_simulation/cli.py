@@ -0,0 +1,214 @@
+import argparse
+import json
+import math
+import sys
+
+import sampling
+import traces
+import util
+from controller import Controller
+from util import CacheError, ReplacementStrategy, WritePolicy
+
+# Runs one cache configuration headless, on a trace file or on one of the
+# workloads of the GUI, and prints its stats as JSON. Nothing of Qt is
+# imported, so batch jobs start fast and need no display.
+
+WORKLOADS = ("all", "all_blocks_once", "random", "replacement")
+
+
+def run_trace(controller, path, trace_format=None, chunk_size=None):
+
+    if chunk_size is None:
+        chunk_size = traces.DEFAULT_CHUNK_SIZE
+    traces.replay_trace(controller.cache, path, trace_format, chunk_size)
+
+
+# estimate of the miss ratio from a sample of the trace (see sampling.py)
+def run_sampled_trace(controller, args):
+
+    if args.sampling == util.SET_SAMPLING:
+        options = {"no_of_sampled_lines": args.sampled_lines, "seed": args.seed}
+    else:
+        options = {
+            "period": args.period,
+            "interval": args.interval,
+            "warmup": args.warmup,
+        }
+    return sampling.sample_trace(
+        controller.cache,
+        args.trace,
+        args.sampling,
+        args.format,
+        args.chunk_size or traces.DEFAULT_CHUNK_SIZE,
+        confidence=args.confidence,
+        **options,
+    )
+
+
+# the runs of the GUI simulation (see Controller.simulation_runs), on a cache
+# filled up front as the GUI does (the stats and RAM traffic include the fill)
+def run_workload(controller, workload):
+
+    controller.fill_cache()
+
+    all_blocks_once, random_operations, replacements = [
+        operations for operations, count in controller.simulation_runs()
+    ]
+    runs = {
+        "all": [all_blocks_once, random_operations, replacements],
+        "all_blocks_once": [all_blocks_once],
+        "random": [random_operations],
+        "replacement": [replacements],
+    }[workload]
+
+    # the operations are performed as they are iterated
+    for operations in runs:
+        for operation in operations:
+            pass
+
+
+def simulate(args):
+
+    if args.ram_size is not None:
+        ram_size = args.ram_size
+    elif args.trace is not None:
+        ram_size = (1 << util.CACHE_ADDRESS_SIZE) >> 20  # every address
+    else:
+        # room for the blocks the replacement workload brings in
+        ram_size = max(1, math.ceil(4 * args.capacity / (1 << 20)))
+
+    controller = Controller(args.seed)
+    controller.create_cache(
+        args.capacity,
+        args.associativity,
+        args.block_size,
+        ReplacementStrategy[args.strategy],
+        WritePolicy[args.write_policy],
+        args.engine,
+    )
+    controller.create_ram(ram_size, args.block_size)
+
+    estimate = None
+    if args.trace is not None and args.sampling is not None:
+        estimate = run_sampled_trace(controller, args)
+        source = {"trace": args.trace, "sampling": args.sampling}
+    elif args.trace is not None:
+        run_trace(controller, args.trace, args.format, args.chunk_size)
+        source = {"trace": args.trace}
+    else:
+        run_workload(controller, args.workload)
+        source = {"workload": args.workload, "seed": args.seed}
+
+    cache = controller.cache
+    report = {
+        "config": {
+            "capacity": cache.capacity,
+            "associativity": cache.associativity,
+            "block_size": cache.block_size,
+            "strategy": util.strategy_name(cache.strategy),
+            "write_policy": cache.write_policy.name,
+            "engine": args.engine,
+            "ram_size": ram_size,
+        },
+        "input": source,
+        "stats": cache.stats.to_dict(per_line=args.per_line),
+        "ram": controller.ram.get_traffic(),
+    }
+    if estimate is not None:
+        # the stats and traffic only cover the simulated accesses
+        report["estimate"] = estimate
+    return report
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description="Simulate one cache on a trace or workload and report its stats as JSON."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="dinero, lackey or binary trace (may be .gz)")
+    source.add_argument(
+        "--workload", choices=WORKLOADS, help="runs of the GUI simulation"
+    )
+    parser.add_argument(
+        "--format",
+        choices=[util.DINERO_TRACE, util.LACKEY_TRACE, util.BINARY_TRACE],
+        help="trace format (default: guessed from the file name)",
+    )
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--capacity", type=int, required=True)
+    parser.add_argument(
+        "--associativity",
+        required=True,
+        help=f"{util.DIRECTLY_MAPPED}, {util.FULLY_ASSOCIATIVE} or K-WAY",
+    )
+    parser.add_argument("--block-size", type=int, required=True)
+    parser.add_argument(
+        "--strategy",
+        choices=[strategy.name for strategy in ReplacementStrategy],
+        default=ReplacementStrategy.LEAST_RECENTLY_USED.name,
+    )
+    parser.add_argument(
+        "--write-policy",
+        choices=[policy.name for policy in WritePolicy],
+        default=WritePolicy.WRITE_BACK.name,
+    )
+    parser.add_argument(
+        "--engine",
+        choices=[util.OBJECT_ENGINE, util.ARRAY_ENGINE],
+        default=util.ARRAY_ENGINE,
+    )
+    parser.add_argument("--ram-size", type=int, help="megabytes of RAM")
+    parser.add_argument("--seed", type=int, help="seed of the workload")
+    parser.add_argument(
+        "--per-line", action="store_true", help="also report the counters per line"
+    )
+    parser.add_argument("--output", help="JSON file (default: standard output)")
+
+    sampled = parser.add_argument_group(
+        "sampling", "estimate the miss ratio of a trace from a sample of it"
+    )
+    sampled.add_argument(
+        "--sampling", choices=[util.SET_SAMPLING, util.INTERVAL_SAMPLING]
+    )
+    sampled.add_argument(
+        "--sampled-lines", type=int, help="lines simulated (set sampling)"
+    )
+    sampled.add_argument("--period", type=int, help="accesses per sampling period")
+    sampled.add_argument(
+        "--interval", type=int, help="accesses measured at the end of every period"
+    )
+    sampled.add_argument(
+        "--warmup",
+        type=int,
+        help="accesses simulated before every interval (default: the whole period)",
+    )
+    sampled.add_argument("--confidence", type=float, default=0.95)
+    args = parser.parse_args(argv)
+
+    if args.sampling is not None:
+        if args.trace is None:
+            parser.error("--sampling needs --trace")
+        if args.sampling == util.SET_SAMPLING and args.sampled_lines is None:
+            parser.error("set sampling needs --sampled-lines")
+        if args.sampling == util.INTERVAL_SAMPLING and (
+            args.period is None or args.interval is None
+        ):
+            parser.error("interval sampling needs --period and --interval")
+
+    try:
+        report = simulate(args)
+    except CacheError as error:
+        parser.exit(2, f"{parser.prog}: error: {error}\n")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+            output.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
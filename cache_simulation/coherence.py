@@ -0,0 +1,307 @@
+from util import CacheError, CoherenceProtocol, WritePolicy
+
+# Private write-back caches, one per core, kept coherent by snooping a shared
+# bus. Every cache sees the bus as its RAM (a BusPort), so its misses and
+# write-backs become bus transactions:
+# - BusRd (read miss): a Modified or Owned copy supplies the data. Under MESI
+#   a Modified owner writes the block back and keeps it Shared; under MOESI it
+#   keeps it as Owned, still dirty. Exclusive copies become Shared. The reader
+#   gets the block Shared, or Exclusive if no other cache holds it.
+# - BusRdX (write miss) and BusUpgr (write hit on a Shared or Owned copy):
+#   every other copy is invalidated and the writer holds the block Modified.
+#
+# A miss on a block whose copy was invalidated by another core is a coherence
+# miss. It is a true sharing miss if the word accessed was written by another
+# core since the invalidation, a false sharing miss otherwise (the cores only
+# share the block, not the data).
+
+MODIFIED = "M"
+OWNED = "O"
+EXCLUSIVE = "E"
+SHARED = "S"
+
+DIRTY_STATES = (MODIFIED, OWNED)
+
+
+class CoherentSystem:
+
+    # caches - one write-back cache per core; ram - the memory behind the bus
+    # word_size - bytes of the words false sharing is told apart by
+    def __init__(self, caches, ram, protocol=CoherenceProtocol.MESI, word_size=4):
+
+        if not caches:
+            raise CacheError("A coherent system needs at least one cache")
+        if not isinstance(protocol, CoherenceProtocol):
+            raise CacheError("invalid coherence protocol")
+
+        self.block_size = caches[0].block_size
+        for cache in caches:
+            if cache.block_size != self.block_size:
+                raise CacheError("The caches of the cores differ in block size")
+            if cache.write_policy != WritePolicy.WRITE_BACK:
+                raise CacheError("Coherent caches must be write-back caches")
+        if ram.block_size_in_bytes != self.block_size:
+            raise CacheError("The RAM block size differs from the cache block size")
+
+        self.caches = list(caches)
+        self.ram = ram
+        self.protocol = protocol
+        self.word_size = word_size
+
+        # per core: tag -> state of the valid copies (missing means Invalid)
+        self.states = [{} for cache in self.caches]
+        # per core: tag of an invalidated copy -> words written by the other
+        # cores since the invalidation
+        self.invalidated = [{} for cache in self.caches]
+        self.blocks = {}  # tag -> BlockSharing, blocks that were invalidated
+
+        self.coherence_misses = [0] * len(self.caches)
+        self.false_sharing_misses = [0] * len(self.caches)
+
+        # bus transactions
+        self.bus_reads = 0
+        self.bus_read_exclusives = 0
+        self.bus_upgrades = 0
+        self.cache_to_cache_transfers = 0
+        self.bus_write_backs = 0
+        self.bus_data_transfers = 0
+
+        # whether the access being served is a write, read on a bus miss
+        self.request_is_write = False
+
+        for core, cache in enumerate(self.caches):
+            cache.set_ram(BusPort(self, core))
+            cache.eviction_listener = self.block_evicted
+
+    def access(self, core, address, is_write, data=None):
+
+        cache = self.caches[core]
+        tag, index, offset = cache.decode_address(address)
+        word = offset // self.word_size
+        state = self.states[core].get(tag)
+
+        if state is None:
+            written_words = self.invalidated[core].pop(tag, None)
+            if written_words is not None:
+                self.record_coherence_miss(core, tag, word not in written_words)
+        elif is_write and state in (SHARED, OWNED):
+            self.bus_upgrades += 1
+            self.invalidate_others(core, tag)
+
+        self.request_is_write = is_write
+        hit, data = cache.access(address, is_write, data)
+
+        if is_write:
+            self.states[core][tag] = MODIFIED
+            for other, copies in enumerate(self.invalidated):
+                if other != core and tag in copies:
+                    copies[tag].add(word)
+
+        return hit, data
+
+    # cores, addresses and ops (true meaning write) of a multi-threaded trace
+    def simulate_trace(self, cores, addresses, ops=None):
+
+        if hasattr(cores, "tolist"):
+            cores = cores.tolist()
+        if hasattr(addresses, "tolist"):
+            addresses = addresses.tolist()
+        if ops is None:
+            ops = [False] * len(addresses)
+        elif hasattr(ops, "tolist"):
+            ops = ops.tolist()
+        if not len(cores) == len(addresses) == len(ops):
+            raise CacheError("Trace cores, addresses and ops differ in length")
+
+        for core, address, is_write in zip(cores, addresses, ops):
+            if not 0 <= core < len(self.caches):
+                raise CacheError(f"No cache for core {core}")
+            self.access(core, address, bool(is_write))
+
+        return self.report()
+
+    # a miss of the core (called by its bus port)
+    def bus_read(self, core, tag):
+
+        if self.request_is_write:
+            self.bus_read_exclusives += 1
+            owner_data = self.invalidate_others(core, tag)
+            self.states[core][tag] = MODIFIED
+        else:
+            self.bus_reads += 1
+            owner_data = self.share(core, tag)
+
+        self.bus_data_transfers += 1
+        if owner_data is not None:
+            self.cache_to_cache_transfers += 1
+            return owner_data
+        return self.ram.load_block(tag)
+
+    # BusRd snooped by the other caches; returns the data of a dirty owner
+    def share(self, core, tag):
+
+        owner_data = None
+        shared = False
+
+        for other, states in enumerate(self.states):
+            state = states.get(tag)
+            if other == core or state is None:
+                continue
+
+            shared = True
+            if state in DIRTY_STATES:
+                cache = self.caches[other]
+                block = cache.search(tag, cache.line_index(tag))
+                owner_data = bytes(block.get_data())
+
+                if self.protocol == CoherenceProtocol.MOESI:
+                    states[tag] = OWNED
+                elif state == MODIFIED:
+                    # MESI cannot share dirty data: the owner writes it back
+                    self.bus_write_backs += 1
+                    self.bus_data_transfers += 1
+                    self.ram.store_data(tag, owner_data)
+                    block.set_dirty_bit(False)
+                    states[tag] = SHARED
+            elif state == EXCLUSIVE:
+                states[tag] = SHARED
+
+        self.states[core][tag] = SHARED if shared else EXCLUSIVE
+        return owner_data
+
+    # BusRdX or BusUpgr snooped by the other caches; returns the data of a
+    # dirty owner
+    def invalidate_others(self, core, tag):
+
+        owner_data = None
+        for other, states in enumerate(self.states):
+            if other == core:
+                continue
+            state = states.pop(tag, None)
+            if state is None:
+                continue
+
+            cache = self.caches[other]
+            data, dirty = cache.invalidate(tag)
+            cache.stats.record_invalidation()
+            if state in DIRTY_STATES:
+                owner_data = data
+
+            self.invalidated[other][tag] = set()
+            self.block_sharing(tag).invalidations += 1
+
+        return owner_data
+
+    # the eviction listener of every cache
+    def block_evicted(self, cache, block):
+        self.states[self.caches.index(cache)].pop(block.get_tag(), None)
+
+    # a dirty block evicted by a cache (called by its bus port)
+    def bus_write_back(self, tag, data):
+        self.bus_write_backs += 1
+        self.bus_data_transfers += 1
+        self.ram.store_data(tag, data)
+
+    def record_coherence_miss(self, core, tag, false_sharing):
+        sharing = self.block_sharing(tag)
+        sharing.coherence_misses += 1
+        self.coherence_misses[core] += 1
+        if false_sharing:
+            sharing.false_sharing_misses += 1
+            self.false_sharing_misses[core] += 1
+
+    def block_sharing(self, tag):
+        sharing = self.blocks.get(tag)
+        if sharing is None:
+            sharing = self.blocks[tag] = BlockSharing()
+        return sharing
+
+    # blocks with the most false sharing misses (then invalidations) first
+    def hot_spots(self, count=10):
+
+        blocks = sorted(
+            self.blocks.items(),
+            key=lambda item: (
+                item[1].false_sharing_misses,
+                item[1].invalidations,
+                -item[0],
+            ),
+            reverse=True,
+        )
+        return [
+            {
+                "block": tag,
+                "address": tag * self.block_size,
+                "invalidations": sharing.invalidations,
+                "coherence_misses": sharing.coherence_misses,
+                "false_sharing_misses": sharing.false_sharing_misses,
+            }
+            for tag, sharing in blocks[:count]
+        ]
+
+    def report(self, hot_spots=10):
+
+        cores = []
+        for core, cache in enumerate(self.caches):
+            stats = cache.stats.to_dict(per_line=False)
+            stats["core"] = core
+            stats["coherence_misses"] = self.coherence_misses[core]
+            stats["true_sharing_misses"] = (
+                self.coherence_misses[core] - self.false_sharing_misses[core]
+            )
+            stats["false_sharing_misses"] = self.false_sharing_misses[core]
+            cores.append(stats)
+
+        return {
+            "protocol": self.protocol.name,
+            "cores": cores,
+            "bus": {
+                "reads": self.bus_reads,
+                "read_exclusives": self.bus_read_exclusives,
+                "upgrades": self.bus_upgrades,
+                "cache_to_cache_transfers": self.cache_to_cache_transfers,
+                "write_backs": self.bus_write_backs,
+                "bytes": self.bus_data_transfers * self.block_size,
+            },
+            "false_sharing_hot_spots": self.hot_spots(hot_spots),
+            "ram": self.ram.get_traffic(),
+        }
+
+
+class BlockSharing:
+
+    # coherence counters of one block
+    __slots__ = ("invalidations", "coherence_misses", "false_sharing_misses")
+
+    def __init__(self):
+        self.invalidations = 0
+        self.coherence_misses = 0
+        self.false_sharing_misses = 0
+
+
+class BusPort:
+
+    # what the cache of a core uses as its RAM: the snooping bus
+    def __init__(self, system, core):
+        self.system = system
+        self.core = core
+
+    def load_block(self, block_index):
+        return self.system.bus_read(self.core, block_index)
+
+    def store_data(self, block_index, data):
+        self.system.bus_write_back(block_index, data)
+
+    def holds(self, block_index):
+        return self.system.ram.holds(block_index)
+
+    # contents of the block, without any bus transaction
+    def fetch_data(self, block_index):
+        for states, cache in zip(self.system.states, self.system.caches):
+            if states.get(block_index) in DIRTY_STATES:
+                block = cache.search(block_index, cache.line_index(block_index))
+                return bytes(block.get_data())
+        return self.system.ram.fetch_data(block_index)
+
+    def record_traffic(self, block_reads, block_writes):
+        raise CacheError("Replay traces through CoherentSystem.simulate_trace")
@@ -1,38 +1,54 @@
 from re import search
-from PyQt5.QtWidgets import QApplication
 from cache import Cache
 from cache import Ram
+from array_cache import ArrayCache
+from journal import CacheJournal
 import util
 
 import sys
-import random
-
-from gui_management import GuiManager
 
 
 class Controller:
-    def __init__(self) -> None:
+    # seed - of the workloads and written data of the simulation runs
+    def __init__(self, seed=None) -> None:
         self.cache = None
         self.ram = None
-        self.cache_records = []
+        self.cache_records = None
+        self.seed = seed
+        self.rng = None  # created by the first run that draws random data
 
     def create_cache(
-        self, capacity, associativity, block_size, replacement_strategy, write_policy
+        self,
+        capacity,
+        associativity,
+        block_size,
+        replacement_strategy,
+        write_policy,
+        engine=util.OBJECT_ENGINE,
     ):
-        self.cache = Cache(
-            capacity, associativity, block_size, replacement_strategy, write_policy
+        if engine == util.ARRAY_ENGINE:
+            cache_class = ArrayCache
+        elif engine == util.OBJECT_ENGINE:
+            cache_class = Cache
+        else:
+            raise util.CacheError("Invalid cache engine: " + str(engine))
+
+        self.cache = cache_class(
+            capacity,
+            associativity,
+            block_size,
+            replacement_strategy,
+            write_policy,
+            self.ram,
         )
 
     def create_ram(self, capacity, block_size):
         self.ram = Ram(capacity, block_size)
+        if self.cache is not None:
+            self.cache.set_ram(self.ram)
 
-    def fetch_cache_data(self):
-
-        if self.cache is None or self.ram is None:
-            print("FETCH_CACHE_DATA: CACHE OR RAM IS NONE")
-            return
+    def table_headings(self):
 
-        values = []
         headings = []
 
         for x in range(self.cache.associated):
@@ -40,12 +56,9 @@ class Controller:
 
             if self.cache.strategy == util.ReplacementStrategy.FIRST_IN_FIRST_OUT:
                 headings.append("FP")
-            elif self.cache.strategy == util.ReplacementStrategy.LEAST_FREQUENTLY_USED:
+            elif self.cache.strategy in util.ACCESS_COUNT_STRATEGIES:
                 headings.append("AC")
-            elif self.cache.strategy in (
-                util.ReplacementStrategy.LEAST_RECENTLY_USED,
-                util.ReplacementStrategy.MOST_RECENTLY_USED,
-            ):
+            elif self.cache.strategy in util.ACCESS_TIME_STRATEGIES:
                 headings.append("AT")
 
             if self.cache.write_policy == util.WritePolicy.WRITE_ONCE:
@@ -56,166 +69,213 @@ class Controller:
 
             headings.append(f"Data {x}")
 
-        for line in self.cache.cache_lines:
-            line_row = list()
-            for block in line:
-                line_row.append(block.get_tag())
-
-                if self.cache.strategy == util.ReplacementStrategy.FIRST_IN_FIRST_OUT:
-                    line_row.append(block.get_fifo_place())
-                elif (
-                    self.cache.strategy
-                    == util.ReplacementStrategy.LEAST_FREQUENTLY_USED
-                ):
-                    line_row.append(block.get_accessed_count())
-                elif self.cache.strategy in (
-                    util.ReplacementStrategy.LEAST_RECENTLY_USED,
-                    util.ReplacementStrategy.MOST_RECENTLY_USED,
-                ):
-                    line_row.append(block.get_access_time())
-
-                if self.cache.write_policy == util.WritePolicy.WRITE_ONCE:
-                    line_row.append(block.get_written())
-                    line_row.append(block.get_dirty_bit())
-                elif self.cache.write_policy == util.WritePolicy.WRITE_BACK:
-                    line_row.append(block.get_dirty_bit())
-
-                line_row.append("".join(str(elem) + "  " for elem in block.get_data()))
-            values.append(line_row)
-
-        return (headings, values)
+        return headings
 
-    def fill_cache(self):
-        if self.cache is None or self.ram is None:
-            print("FILL_CACHE: CACHE OR RAM IS NONE")
-            return
+    # the cells of one block in the table, its data as raw bytes
+    def block_cells(self, block):
 
-        for i in range(self.cache.no_of_blocks):
-            block_data = self.ram.fetch_data(i)
-            self.cache.write_from_ram(i, block_data)
+        cells = [block.get_tag()]
 
-        self.cache_records.append(self.fetch_cache_data())
+        if self.cache.strategy == util.ReplacementStrategy.FIRST_IN_FIRST_OUT:
+            cells.append(block.get_fifo_place())
+        elif self.cache.strategy in util.ACCESS_COUNT_STRATEGIES:
+            cells.append(block.get_accessed_count())
+        elif self.cache.strategy in util.ACCESS_TIME_STRATEGIES:
+            cells.append(block.get_access_time())
 
-    def random_read_or_write(self, index, tag, with_miss=False):
-        operation = random.randint(0, 1)  # 0 means read, 1 means write
+        if self.cache.write_policy == util.WritePolicy.WRITE_ONCE:
+            cells.append(block.get_written())
+            cells.append(block.get_dirty_bit())
+        elif self.cache.write_policy == util.WritePolicy.WRITE_BACK:
+            cells.append(block.get_dirty_bit())
 
-        block = self.cache.search(tag, index)
-        operation_name = "_with_hit" if not with_miss else "_with_miss"
+        cells.append(bytes(block.get_data()))
+        return cells
 
-        if operation:
-            operation_name = "write" + operation_name
-            data = [hex(random.randint(0, 255)) for x in range(self.cache.block_size)]
-            self.cache.write(block, data)
+    # the cells of one line (one row of the table)
+    def line_cells(self, index):
 
-        else:
-            operation_name = "read" + operation_name
-            data = self.cache.read(block)
+        line_row = list()
+        for block in self.cache.cache_lines[index]:
+            line_row.extend(self.block_cells(block))
 
-        result = " ".join(elem for elem in data)
+        return line_row
 
-        self.cache_records.append(self.fetch_cache_data())
+    def table_rows(self):
+        return [self.line_cells(index) for index in range(self.cache.no_of_cache_lines)]
 
-        return (operation_name, tag, index, result)
+    # turns the raw data cells of the rows into their display form
+    @staticmethod
+    def format_rows(rows):
+        return [
+            [
+                util.format_data(value, "  ") if isinstance(value, bytes) else value
+                for value in row
+            ]
+            for row in rows
+        ]
 
-    def read_and_write_all_blocks_once(self):
+    def fetch_cache_data(self):
 
-        operations = []
+        if self.cache is None or self.ram is None:
+            print("FETCH_CACHE_DATA: CACHE OR RAM IS NONE")
+            return
 
-        for index, line in enumerate(self.cache.cache_lines):
-            for block in line:
-                tag = block.get_tag()
+        return (self.table_headings(), self.format_rows(self.table_rows()))
 
-                # search
-                block_found = self.cache.search(tag, index)
-                # read
-                data = self.cache.read(block_found)
-                result = " ".join(elem for elem in data)
-                operations.append(("read_with_hit", tag, index, result))
+    # the table as it was after the given operation (0 is the cache creation)
+    def fetch_cache_record(self, record_number):
+        headings, rows = self.cache_records[record_number]
+        return (headings, self.format_rows(rows))
 
-                self.cache_records.append(self.fetch_cache_data())
+    def fill_cache(self):
+        if self.cache is None or self.ram is None:
+            print("FILL_CACHE: CACHE OR RAM IS NONE")
+            return
 
-                # write
-                new_data = [hex(random.randint(0, 255)) for x in data]
-                self.cache.write(block_found, new_data)
-                result = " ".join(elem for elem in new_data)
-                operations.append(("write_with_hit", tag, index, result))
+        for i in range(self.cache.no_of_blocks):
+            block_data = self.ram.load_block(i)
+            self.cache.write_from_ram(i, block_data)
 
-                self.cache_records.append(self.fetch_cache_data())
+        headings = self.table_headings()
+        self.cache_records = CacheJournal(
+            headings, self.table_rows(), len(headings) // self.cache.associated
+        )
 
-        return operations
+    # numpy (and the workloads built on it) is only loaded by the runs that
+    # draw random accesses or data, not by replaying a trace
+    def get_rng(self):
+        if self.rng is None:
+            import numpy as np
+
+            self.rng = np.random.default_rng(self.seed)
+        return self.rng
+
+    def record_operation(self, operation_name, tag, hit, data):
+        index = self.cache.decode_address(tag * self.cache.block_size)[1]
+        operation_name += "_with_hit" if hit else "_with_miss"
+        result = util.format_data(data)
+
+        # the accessed block is the only one an operation changes
+        way = self.cache.tag_index[index][tag]
+        block = self.cache.get_block(index, way)
+        self.cache_records.record(
+            [(index, way, self.block_cells(block))], self.table_rows
+        )
 
-    def read_and_write_blocks_randomly(self):
+        return (operation_name, tag, index, result)
 
-        operations = []
-        no_operations = int(self.cache.no_of_blocks / 2)
+    # a write stores random data
+    def read_or_write(self, tag, is_write):
+        address = tag * self.cache.block_size
 
-        for i in range(no_operations):
-            random_tag = random.randint(0, self.cache.no_of_blocks - 1)
+        if is_write:
+            data = self.get_rng().bytes(self.cache.block_size)
+            hit, data = self.cache.access(address, True, data)
+            return self.record_operation("write", tag, hit, data)
 
-            if self.cache.associativity == util.FULLY_ASSOCIATIVE:
-                index = 0
-            else:
-                index = random_tag % self.cache.no_of_cache_lines
+        hit, data = self.cache.access(address, False)
+        return self.record_operation("read", tag, hit, data)
 
-            operation = self.random_read_or_write(index, random_tag)
-            operations.append(operation)
+    def read_and_write_all_blocks_once(self):
+        return list(self.all_blocks_once_operations())
 
-        return operations
+    def read_and_write_blocks_randomly(self):
+        return list(self.random_operations())
 
     def replace_blocks(self):
+        return list(self.replacement_operations())
 
-        operations = []
+    # The runs below perform their operations one by one as they are iterated,
+    # so a caller can stream them, report progress or stop in between.
 
-        if self.cache.associativity == util.DIRECTLY_MAPPED:
-            no_operations = int(self.cache.no_of_blocks / 4)
+    def all_blocks_once_operations(self):
 
-            for i in range(no_operations):
-                tag = random.randint(self.cache.no_of_blocks, self.ram.index_count - 1)
+        for line in self.cache.cache_lines:
+            for block in line:
+                tag = block.get_tag()
+                address = tag * self.cache.block_size
 
-                replacement_block = self.ram.fetch_data(tag)
-                self.cache.write_from_ram(tag, replacement_block)
+                # read
+                hit, data = self.cache.access(address, False)
+                yield self.record_operation("read", tag, hit, data)
 
-                operation = self.random_read_or_write(
-                    (tag % self.cache.no_of_cache_lines), tag, True
-                )
-                operations.append(operation)
+                # write
+                new_data = self.get_rng().bytes(len(data))
+                hit, new_data = self.cache.access(address, True, new_data)
+                yield self.record_operation("write", tag, hit, new_data)
 
-        elif self.cache.associativity == util.FULLY_ASSOCIATIVE:
-            no_operations = int(self.cache.no_of_blocks / 4)
+    # the accesses of the workload (see workloads.py) are drawn at once, then
+    # performed one by one
+    def workload_operations(self, workload, no_operations):
 
-            for i in range(no_operations):
-                tag = random.randint(self.cache.no_of_blocks, self.ram.index_count - 1)
+        addresses, ops = workload.generate(no_operations)
+        tags = (addresses // self.cache.block_size).tolist()
 
-                replacement_block = self.ram.fetch_data(tag)
-                self.cache.write_from_ram(tag, replacement_block)
+        for tag, is_write in zip(tags, ops.tolist()):
+            yield self.read_or_write(tag, is_write)
 
-                operation = self.random_read_or_write(0, tag, True)
-                operations.append(operation)
-        else:
-            for index in range(self.cache.no_of_cache_lines):
-                tag = random.randint(self.cache.no_of_blocks, self.ram.index_count - 1)
+    # reads and writes of blocks that may be in the cache, equally likely
+    def random_operations(self):
+        from workloads import UniformWorkload
 
-                modulo = tag % self.cache.no_of_cache_lines
-                if modulo < index:
-                    tag += index - modulo
-                elif modulo > index:
-                    tag += (
-                        self.cache.no_of_cache_lines
-                        - tag % self.cache.no_of_cache_lines
-                        + index
-                    )
+        workload = UniformWorkload(
+            self.cache.no_of_blocks * self.cache.block_size,
+            access_size=self.cache.block_size,
+            write_ratio=0.5,
+            seed=self.get_rng(),
+        )
+        return self.workload_operations(workload, int(self.cache.no_of_blocks / 2))
+
+    # reads and writes of blocks beyond the filled cache, which replace blocks
+    def replacement_operations(self):
+        from workloads import ConflictWorkload, UniformWorkload
+
+        block_size = self.cache.block_size
+
+        if self.cache.associativity in (util.DIRECTLY_MAPPED, util.FULLY_ASSOCIATIVE):
+            workload = UniformWorkload(
+                (self.ram.index_count - self.cache.no_of_blocks) * block_size,
+                access_size=block_size,
+                base=self.cache.no_of_blocks * block_size,
+                write_ratio=0.5,
+                seed=self.get_rng(),
+            )
+            return self.workload_operations(workload, int(self.cache.no_of_blocks / 4))
+
+        # one block per line, in line order, each mapped to its line
+        no_of_cache_lines = self.cache.no_of_cache_lines
+        workload = ConflictWorkload.for_cache(
+            self.cache,
+            self.ram.index_count // no_of_cache_lines - self.cache.associated,
+            first=self.cache.associated,
+            write_ratio=0.5,
+            seed=self.get_rng(),
+        )
+        return self.workload_operations(workload, no_of_cache_lines)
 
-                replacement_block = self.ram.fetch_data(tag)
-                self.cache.write_from_ram(tag, replacement_block)
+    # the runs of a simulation in order, as (operations, number of operations)
+    def simulation_runs(self):
 
-                operation = self.random_read_or_write(index, tag, True)
-                operations.append(operation)
+        if self.cache.associativity in (util.DIRECTLY_MAPPED, util.FULLY_ASSOCIATIVE):
+            no_of_replacements = int(self.cache.no_of_blocks / 4)
+        else:
+            no_of_replacements = self.cache.no_of_cache_lines
 
-        return operations
+        return [
+            (self.all_blocks_once_operations(), 2 * self.cache.no_of_blocks),
+            (self.random_operations(), int(self.cache.no_of_blocks / 2)),
+            (self.replacement_operations(), no_of_replacements),
+        ]
 
 
 def main():
 
+    # Qt is only loaded for the GUI, scripts importing the controller (see
+    # cli.py) run without it
+    from PyQt5.QtWidgets import QApplication
+    from gui_management import GuiManager
+
     app = QApplication(sys.argv)
 
     controller = Controller()
@@ -1,5 +1,8 @@
 from PyQt5 import QtWidgets
-from PyQt5.QtWidgets import QMainWindow, QTableWidgetItem
+from PyQt5.QtCore import QThread
+from PyQt5.QtWidgets import QMainWindow
+from simulation_worker import SimulationWorker
+from table_models import CacheTableModel, OperationsTableModel
 from user_interface import Ui_window
 
 import util
@@ -18,11 +21,28 @@ class GuiManager(QMainWindow):
         # set tables settings
         self.ui_window.cache_contents_table.setVisible(False)
         self.ui_window.operations_table.setVisible(False)
-        self.ui_window.operations_table.itemClicked.connect(self.change_cache_contents)
+        for table in (
+            self.ui_window.cache_contents_table,
+            self.ui_window.operations_table,
+        ):
+            # every row has the same height, the view never measures the rows
+            table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+            table.verticalHeader().setVisible(False)
+
+        self.operations_model = OperationsTableModel()
+        self.ui_window.operations_table.setModel(self.operations_model)
+        self.ui_window.operations_table.clicked.connect(self.change_cache_contents)
 
         # set button actions
         self.ui_window.create_button.clicked.connect(self.create_button_press)
         self.ui_window.start_button.clicked.connect(self.start_button_press)
+        self.ui_window.cancel_button.clicked.connect(self.cancel_button_press)
+
+        self.worker = None
+        self.worker_thread = None
+
+        # journal record of the first row of the operations table
+        self.first_record = 0
 
         self.setWindowTitle("Cache Simulation")
 
@@ -57,6 +77,14 @@ class GuiManager(QMainWindow):
             replacement_strategy = util.ReplacementStrategy.LEAST_RECENTLY_USED
         elif replacement_combo_box == "Most Recently Used":
             replacement_strategy = util.ReplacementStrategy.MOST_RECENTLY_USED
+        elif replacement_combo_box == "Pseudo LRU":
+            replacement_strategy = util.ReplacementStrategy.PSEUDO_LEAST_RECENTLY_USED
+        elif replacement_combo_box == "SRRIP":
+            replacement_strategy = util.ReplacementStrategy.STATIC_RRIP
+        elif replacement_combo_box == "BRRIP":
+            replacement_strategy = util.ReplacementStrategy.BIMODAL_RRIP
+        elif replacement_combo_box == "ARC":
+            replacement_strategy = util.ReplacementStrategy.ADAPTIVE_REPLACEMENT
 
         write_combo_box = self.ui_window.write_policy_combo_box.currentText()
         if write_combo_box == "Write Once":
@@ -80,76 +108,99 @@ class GuiManager(QMainWindow):
 
     def start_button_press(self):
 
-        headers = ["Operation", "Tag", "Index", "Result"]
+        # a second run continues the journal of the first one
+        self.first_record = len(self.controller.cache_records) - 1
+        self.operations_model = OperationsTableModel([("cache creation", "", "", "")])
 
-        operations = [("cache creation", "", "", "")]
+        table = self.ui_window.operations_table
+        table.setModel(self.operations_model)
+        table.setVisible(True)
 
-        operations = operations + self.controller.read_and_write_all_blocks_once()
+        # the worker changes the cache, meanwhile show it as it was created
+        self.change_cache_contents(self.operations_model.index(0, 0))
 
-        operations = operations + self.controller.read_and_write_blocks_randomly()
+        self.set_running(True)
+        self.ui_window.progress_bar.setValue(0)
 
-        operations = operations + self.controller.replace_blocks()
+        self.worker_thread = QThread(self)
+        self.worker = SimulationWorker(self.controller)
+        self.worker.moveToThread(self.worker_thread)
 
-        table = self.ui_window.operations_table
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.operations_ready.connect(self.operations_model.append_operations)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.finished.connect(self.simulation_finished)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker_thread.finished.connect(self.worker.deleteLater)
+        self.worker_thread.finished.connect(self.worker_thread_finished)
 
-        table.setRowCount(0)
-        table.setColumnCount(0)
-
-        table.setRowCount(len(operations))
-        table.setColumnCount(4)
-
-        # insert headers
-        for index, heading in enumerate(headers):
-            table.setItem(0, index, QTableWidgetItem(heading))
-
-        # insert values
-        for operation_index, operation in enumerate(operations):
-            for index, operation_attribute in enumerate(operation):
-                table.setItem(
-                    operation_index, index, QTableWidgetItem(str(operation_attribute))
-                )
-
-        table.setHorizontalHeaderLabels(headers)
-        header = table.horizontalHeader()
-        header.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(1, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(2, QtWidgets.QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(3, QtWidgets.QHeaderView.ResizeToContents)
-        table.verticalHeader().setVisible(False)
-        table.setVisible(True)
+        self.worker_thread.start()
 
-    def change_cache_contents(self, item):
-        headings, values = self.controller.cache_records[item.row()]
-        self.populate_table(headings, values)
+    def cancel_button_press(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.ui_window.cancel_button.setEnabled(False)
 
-    def populate_table(self, headings=None, values=None):
+    def set_running(self, running):
+        self.ui_window.create_button.setEnabled(not running)
+        self.ui_window.start_button.setEnabled(not running)
+        self.ui_window.cancel_button.setEnabled(running)
 
-        if not headings or not values:
-            headings, values = self.controller.fetch_cache_data()
+    def is_running(self):
+        return self.worker_thread is not None and self.worker_thread.isRunning()
 
-        table = self.ui_window.cache_contents_table
-
-        table.setRowCount(0)
-        table.setColumnCount(0)
+    def show_progress(self, done, total):
+        progress_bar = self.ui_window.progress_bar
+        progress_bar.setMaximum(max(total, 1))
+        progress_bar.setValue(done)
 
-        table.setRowCount(len(values))
-        table.setColumnCount(len(headings))
+    def simulation_finished(self, cancelled):
 
-        # insert headers
-        for index, heading in enumerate(headings):
-            table.setItem(0, index, QTableWidgetItem(heading))
+        # measures at most 1000 rows of the model (the default resize
+        # contents precision of the header), not the whole history
+        self.ui_window.operations_table.resizeColumnsToContents()
+        self.populate_table()
 
-        # insert values
-        for line_index, line_value in enumerate(values):
+    # the worker is only released once its thread is done with it (its
+    # deleteLater runs then), and a new run cannot start before
+    def worker_thread_finished(self):
+        self.worker = None
+        self.set_running(False)
+
+    def closeEvent(self, event):
+        if self.worker is not None and self.is_running():
+            self.worker.cancel()
+            # the quit queued by worker.finished would need this thread, which
+            # is blocked in wait(); quit() can be called from here directly
+            self.worker_thread.quit()
+            self.worker_thread.wait()
+        super().closeEvent(event)
+
+    def change_cache_contents(self, model_index):
+        record_number = self.first_record + model_index.row()
+        headings, rows = self.controller.cache_records[record_number]
+        self.show_cache_model(CacheTableModel.from_rows(headings, rows, self))
+
+    # shows the current contents of the cache
+    def populate_table(self):
+        cache = self.controller.cache
+        self.show_cache_model(
+            CacheTableModel(
+                self.controller.table_headings(),
+                cache.no_of_cache_lines,
+                self.controller.line_cells,
+                self,
+            )
+        )
 
-            for index, value in enumerate(line_value):
-                table.setItem(line_index, index, QTableWidgetItem(str(value)))
+    def show_cache_model(self, model):
 
-        table.setHorizontalHeaderLabels(headings)
-        table.verticalHeader().setVisible(False)
+        table = self.ui_window.cache_contents_table
 
-        header = table.horizontalHeader()
-        for i, _ in enumerate(headings):
-            header.setSectionResizeMode(i, QtWidgets.QHeaderView.ResizeToContents)
+        previous_model = table.model()
+        table.setModel(model)
+        if previous_model is not None and previous_model.parent() is self:
+            previous_model.deleteLater()
 
+        table.resizeColumnsToContents()
         table.setVisible(True)
@@ -0,0 +1,211 @@
+from util import CacheError, InclusionPolicy, WritePolicy
+
+# Caches chained from the level next to the processor (L1) down to the RAM.
+# Every level sees the levels below it as its RAM (a LowerLevels port), so
+# misses and write-backs flow down through the usual Cache.access and
+# Cache.write_back_to_ram paths. The inclusion policy decides where blocks go:
+# - INCLUSIVE: a miss fills every level on its way up; a block evicted from a
+#   level is invalidated in the levels above it (back-invalidation), their
+#   dirty data leaving with it
+# - EXCLUSIVE: a miss fills L1 only; a hit in a lower level moves the block up
+#   and every block evicted from a level, clean or dirty, moves one level down
+#   (the last level drops clean blocks and writes dirty ones back)
+# - NON_INCLUSIVE: a miss fills every level on its way up, evictions never
+#   affect the other levels
+#
+# All the levels and the RAM need the same block size: a block index is then
+# the tag of the block in every level.
+
+
+class CacheHierarchy:
+
+    # levels - the caches, L1 first; ram - the memory below the last level
+    def __init__(self, levels, ram, inclusion_policy=InclusionPolicy.NON_INCLUSIVE):
+
+        if not levels:
+            raise CacheError("A cache hierarchy needs at least one level")
+        if not isinstance(inclusion_policy, InclusionPolicy):
+            raise CacheError("invalid inclusion policy")
+
+        self.block_size = levels[0].block_size
+        for cache in levels:
+            if cache.block_size != self.block_size:
+                raise CacheError("The levels of a hierarchy differ in block size")
+        if ram.block_size_in_bytes != self.block_size:
+            raise CacheError("The RAM block size differs from the cache block size")
+
+        self.levels = list(levels)
+        self.ram = ram
+        self.inclusion_policy = inclusion_policy
+
+        # level that served the last access (len(levels) for the RAM)
+        self.hit_level = 0
+        # set when the last access moved a dirty block up to L1 (EXCLUSIVE)
+        self.moved_dirty = False
+
+        for level, cache in enumerate(self.levels):
+            cache.set_ram(LowerLevels(self, level + 1))
+            if inclusion_policy != InclusionPolicy.NON_INCLUSIVE:
+                cache.eviction_listener = self.block_evicted
+
+    # Reads or writes the block holding the address through L1. Returns
+    # (hit level, data): the level the block was found in (len(levels) if it
+    # came from the RAM) and a view of the accessed bytes in L1 after the access.
+    def access(self, address, is_write, data=None):
+
+        first_level = self.levels[0]
+        self.hit_level = 0
+        self.moved_dirty = False
+
+        hit, data = first_level.access(address, is_write, data)
+
+        if self.moved_dirty:
+            tag, index, offset = first_level.decode_address(address)
+            self.keep_dirty(first_level, first_level.search(tag, index))
+
+        return self.hit_level, data
+
+    # Replays a trace of addresses and ops (true means write) in one pass
+    # through all the levels. Returns the report of the hierarchy.
+    def simulate_trace(self, addresses, ops=None):
+
+        if hasattr(addresses, "tolist"):
+            addresses = addresses.tolist()
+        if ops is None:
+            ops = [False] * len(addresses)
+        elif hasattr(ops, "tolist"):
+            ops = ops.tolist()
+        if len(ops) != len(addresses):
+            raise CacheError("Trace addresses and ops differ in length")
+
+        for address, is_write in zip(addresses, ops):
+            self.access(address, bool(is_write))
+
+        return self.report()
+
+    # per level statistics (local to the level: the accesses of L2 are the
+    # misses and write-backs of L1) and the RAM traffic
+    def report(self, per_line=False):
+
+        levels = []
+        for level, cache in enumerate(self.levels):
+            stats = cache.stats.to_dict(per_line)
+            stats["level"] = f"L{level + 1}"
+            levels.append(stats)
+
+        return {
+            "inclusion_policy": self.inclusion_policy.name,
+            "levels": levels,
+            "ram": self.ram.get_traffic(),
+        }
+
+    # a block missing from the levels above is read from the given level
+    def load_from(self, level, block_index):
+
+        self.hit_level = max(self.hit_level, level)
+
+        if level == len(self.levels):
+            return self.ram.load_block(block_index)
+
+        cache = self.levels[level]
+        if self.inclusion_policy != InclusionPolicy.EXCLUSIVE:
+            hit, data = cache.access(block_index * self.block_size, False)
+            return bytes(data)
+
+        # the block moves up, so it leaves this level
+        index = cache.line_index(block_index)
+        removed = cache.invalidate(block_index)
+        cache.stats.record_access(index, block_index, removed is not None, False)
+        if removed is None:
+            return self.load_from(level + 1, block_index)
+
+        data, dirty = removed
+        self.moved_dirty = self.moved_dirty or dirty
+        return data
+
+    # a block written back (or written through) by the level above
+    def store_to(self, level, block_index, data):
+
+        if level == len(self.levels):
+            self.ram.store_data(block_index, data)
+            return
+
+        cache = self.levels[level]
+        if self.inclusion_policy == InclusionPolicy.EXCLUSIVE:
+            upper = self.levels[level - 1]
+            if upper.search(block_index, upper.line_index(block_index)) is not None:
+                # written through while still held above: no other level may
+                # hold it, so the data goes straight to the RAM
+                self.ram.store_data(block_index, data)
+                return
+
+        cache.write_block(block_index, data)
+
+    # the eviction listener of every level (not used for NON_INCLUSIVE)
+    def block_evicted(self, cache, block):
+
+        level = self.levels.index(cache)
+        tag = block.get_tag()
+
+        if self.inclusion_policy == InclusionPolicy.INCLUSIVE:
+            # closest level first, so the newest data (nearest to L1) wins
+            for upper in reversed(self.levels[:level]):
+                removed = upper.invalidate(tag)
+                if removed is None:
+                    continue
+
+                upper.stats.record_invalidation()
+                data, dirty = removed
+                if dirty:
+                    self.keep_dirty(cache, block, data)
+
+        elif self.inclusion_policy == InclusionPolicy.EXCLUSIVE:
+            dirty = (
+                cache.write_policy != WritePolicy.WRITE_THROUGH
+                and block.get_dirty_bit()
+            )
+            # dirty blocks move down as write-backs, clean ones are moved here
+            if not dirty and level + 1 < len(self.levels):
+                self.levels[level + 1].write_from_ram(tag, bytes(block.get_data()))
+
+    # the block holds data newer than the levels below it; data (if given)
+    # replaces the data of the block first
+    def keep_dirty(self, cache, block, data=None):
+
+        if data is None:
+            data = block.get_data()
+        else:
+            block.set_data(data)
+
+        if cache.write_policy == WritePolicy.WRITE_THROUGH:
+            cache.write_back_to_ram(block.get_tag(), data)
+        else:
+            block.set_dirty_bit(True)
+
+
+class LowerLevels:
+
+    # what a level of a hierarchy uses as its RAM: the levels below it
+    def __init__(self, hierarchy, level):
+        self.hierarchy = hierarchy
+        self.level = level
+
+    def load_block(self, block_index):
+        return self.hierarchy.load_from(self.level, block_index)
+
+    def store_data(self, block_index, data):
+        self.hierarchy.store_to(self.level, block_index, data)
+
+    def holds(self, block_index):
+        return self.hierarchy.ram.holds(block_index)
+
+    # contents of the block, without any access or traffic
+    def fetch_data(self, block_index):
+        for cache in self.hierarchy.levels[self.level :]:
+            block = cache.search(block_index, cache.line_index(block_index))
+            if block is not None:
+                return bytes(block.get_data())
+        return self.hierarchy.ram.fetch_data(block_index)
+
+    def record_traffic(self, block_reads, block_writes):
+        raise CacheError("Replay traces through CacheHierarchy.simulate_trace")
@@ -0,0 +1,79 @@
+from util import CacheError
+
+# History of the cache table shown by the GUI, one record per operation.
+# Instead of a copy of the whole table per operation, a record keeps only the
+# cells of the blocks the operation changed. Every checkpoint_interval records
+# the whole table is kept as a checkpoint, so any record is rebuilt from the
+# checkpoint before it plus at most checkpoint_interval - 1 deltas.
+#
+# The table is a list of rows, one per cache line; a row holds the cells of
+# every way of the line, block_width cells per block.
+
+DEFAULT_CHECKPOINT_INTERVAL = 256
+
+
+class CacheJournal:
+    def __init__(self, headings, rows, block_width, checkpoint_interval=None):
+
+        if checkpoint_interval is None:
+            # a checkpoint then costs about one changed block per record
+            no_of_blocks = sum(len(row) for row in rows) // block_width
+            checkpoint_interval = max(DEFAULT_CHECKPOINT_INTERVAL, no_of_blocks)
+        if checkpoint_interval < 1:
+            raise CacheError("Checkpoint interval must be at least 1")
+
+        self.headings = headings
+        self.block_width = block_width
+        self.checkpoint_interval = checkpoint_interval
+
+        self.checkpoints = [copy_rows(rows)]
+        self.deltas = [()]  # per record: tuple of (line index, way, cells)
+
+        # the last rebuilt table, stepping forward through the records reuses it
+        self.last_record = 0
+        self.last_rows = copy_rows(rows)
+
+    def __len__(self):
+        return len(self.deltas)
+
+    # changes - (line index, way, cells) of every block the operation changed;
+    # rows - callable returning the whole table, called when a checkpoint is due
+    def record(self, changes, rows):
+
+        record_number = len(self.deltas)
+        self.deltas.append(tuple(changes))
+
+        if record_number % self.checkpoint_interval == 0:
+            self.checkpoints.append(copy_rows(rows()))
+
+    def rows_at(self, record_number):
+
+        if record_number < 0:
+            record_number += len(self.deltas)
+        if not 0 <= record_number < len(self.deltas):
+            raise CacheError(f"No record {record_number} in the journal")
+
+        checkpoint = record_number // self.checkpoint_interval
+        start = checkpoint * self.checkpoint_interval
+
+        if start <= self.last_record <= record_number:
+            rows = self.last_rows
+            start = self.last_record
+        else:
+            rows = copy_rows(self.checkpoints[checkpoint])
+
+        width = self.block_width
+        for delta in self.deltas[start + 1 : record_number + 1]:
+            for index, way, cells in delta:
+                rows[index][way * width : (way + 1) * width] = cells
+
+        self.last_record = record_number
+        self.last_rows = rows
+        return copy_rows(rows)
+
+    def __getitem__(self, record_number):
+        return self.headings, self.rows_at(record_number)
+
+
+def copy_rows(rows):
+    return [list(row) for row in rows]
@@ -0,0 +1,182 @@
+import heapq
+from array import array
+
+import traces
+import util
+from array_cache import ArrayCache
+from util import CacheError
+
+# Belady's MIN: on a miss in a full line, the block evicted is the one whose
+# next use is the furthest away. No real policy can do better, so its misses
+# are the baseline the replacement strategies are measured against. It needs
+# the whole trace up front (it is an offline policy):
+# - one backward pass over the trace gives, for every access, the position of
+#   the next access to the same block (next_use_index)
+# - every line keeps its blocks in a max-heap keyed by next use; the keys are
+#   trace positions, unique per block, so the heap holds bare integers and the
+#   block of a key is found in the trace. A hit pushes the new key of the block
+#   and leaves the old one, which is skipped when it comes up (lazy deletion).
+#   Eviction is O(log associativity).
+
+
+# next_uses[i] - position of the next access to the block of access i; blocks
+# never accessed again get len(blocks) + i, beyond every real position
+def next_use_index(blocks):
+
+    no_of_accesses = len(blocks)
+    next_uses = array("q", [0]) * no_of_accesses
+    last_seen = {}
+
+    for position in range(no_of_accesses - 1, -1, -1):
+        block = blocks[position]
+        next_uses[position] = last_seen.get(block, no_of_accesses + position)
+        last_seen[block] = position
+
+    return next_uses
+
+
+class OptimalCache:
+
+    # capacity, associativity and block_size as for Cache; writes are counted
+    # as for a write-back cache (dirty blocks are written back when evicted)
+    def __init__(self, capacity, associativity, block_size):
+
+        # exactly the geometries Cache accepts
+        self.no_of_cache_lines, self.associated = util.cache_geometry(
+            capacity, associativity, block_size
+        )
+
+        self.capacity = capacity
+        self.associativity = associativity
+        self.block_size = block_size
+        self.offset_bits = block_size.bit_length() - 1
+
+    # runs the whole trace (addresses and ops, true meaning write) through an
+    # empty cache and returns its counters
+    def simulate(self, addresses, ops=None):
+
+        if hasattr(addresses, "tolist"):
+            addresses = addresses.tolist()
+        if ops is not None and hasattr(ops, "tolist"):
+            ops = ops.tolist()
+        if ops is not None and len(ops) != len(addresses):
+            raise CacheError("Trace addresses and ops differ in length")
+
+        offset_bits = self.offset_bits
+        blocks = array("q", [address >> offset_bits for address in addresses])
+        return self.simulate_blocks(blocks, ops)
+
+    # blocks - the block index of every access (any sequence of ints)
+    def simulate_blocks(self, blocks, ops=None):
+
+        no_of_accesses = len(blocks)
+        next_uses = next_use_index(blocks)
+
+        no_of_cache_lines = self.no_of_cache_lines
+        associated = self.associated
+        heap_limit = 2 * associated + 8
+        lines = [{} for x in range(no_of_cache_lines)]  # block -> next use
+        heaps = [[] for x in range(no_of_cache_lines)]  # -next use, lazily
+        dirty = set()
+        hits = evictions = dirty_writebacks = 0
+
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        for position in range(no_of_accesses):
+            block = blocks[position]
+            index = block % no_of_cache_lines
+            line = lines[index]
+            heap = heaps[index]
+
+            if block in line:
+                hits += 1
+            elif len(line) == associated:
+                # the furthest next use still current for its block
+                while True:
+                    key = -heappop(heap)
+                    victim = blocks[
+                        key if key < no_of_accesses else key - no_of_accesses
+                    ]
+                    if line.get(victim) == key:
+                        break
+                del line[victim]
+                evictions += 1
+                if victim in dirty:
+                    dirty.discard(victim)
+                    dirty_writebacks += 1
+
+            next_use = next_uses[position]
+            line[block] = next_use
+            heappush(heap, -next_use)
+            if len(heap) > heap_limit:
+                heap[:] = [-key for key in line.values()]
+                heapq.heapify(heap)
+
+            if ops is not None and ops[position]:
+                dirty.add(block)
+
+        return {
+            "accesses": no_of_accesses,
+            "hits": hits,
+            "misses": no_of_accesses - hits,
+            "hit_ratio": hits / no_of_accesses if no_of_accesses else 0.0,
+            "evictions": evictions,
+            "dirty_writebacks": dirty_writebacks,
+        }
+
+
+# OPT over a whole trace file; the block indices of the trace are kept in
+# memory (8 bytes per access), the addresses are read chunk by chunk
+def optimal_trace(
+    path,
+    capacity,
+    associativity,
+    block_size,
+    trace_format=None,
+    chunk_size=traces.DEFAULT_CHUNK_SIZE,
+):
+
+    cache = OptimalCache(capacity, associativity, block_size)
+    blocks = array("q")
+    ops = array("b")
+    for chunk_addresses, chunk_ops in traces.read_trace(path, trace_format, chunk_size):
+        blocks.extend((chunk_addresses >> cache.offset_bits).tolist())
+        ops.extend(chunk_ops.tolist())
+    return cache.simulate_blocks(blocks, ops)
+
+
+# Hit ratio of every strategy next to OPT on the same cache and trace. The
+# excess misses of a strategy are the share of its misses that OPT avoids.
+def compare_to_optimal(
+    addresses, ops, capacity, associativity, block_size, strategies=None
+):
+
+    if strategies is None:
+        strategies = list(util.ReplacementStrategy)
+
+    optimal = OptimalCache(capacity, associativity, block_size).simulate(addresses, ops)
+    rows = [{"strategy": "OPTIMAL", **optimal, "excess_misses": 0.0}]
+
+    for strategy in strategies:
+        cache = ArrayCache(
+            capacity, associativity, block_size, strategy, util.WritePolicy.WRITE_BACK
+        )
+        hits, counters = cache.simulate_trace(addresses, ops)
+        misses = counters["misses"]
+        rows.append(
+            {
+                "strategy": util.strategy_name(strategy),
+                "accesses": counters["accesses"],
+                "hits": counters["hits"],
+                "misses": misses,
+                "hit_ratio": cache.stats.hit_ratio(),
+                "evictions": counters["evictions"],
+                "dirty_writebacks": cache.stats.dirty_writebacks,
+                "excess_misses": (
+                    (misses - optimal["misses"]) / misses if misses else 0.0
+                ),
+            }
+        )
+
+    return rows
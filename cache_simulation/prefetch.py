@@ -0,0 +1,127 @@
+from collections import OrderedDict
+
+# Hardware prefetchers. A cache with a prefetcher (Cache.set_prefetcher) calls
+# on_access after every demand access; the block indices returned are loaded
+# into the cache unless they are cached already. The cache tags the blocks it
+# prefetched, so its stats tell how many were used (accuracy, coverage) and how
+# many demand misses the blocks they replaced caused (pollution).
+
+
+class Prefetcher:
+
+    # block_index - the block accessed; hit - whether it was cached
+    # pc - program counter of the access (None if the trace has none)
+    # prefetch_hit - first access to a block that was prefetched
+    def on_access(self, block_index, hit, pc=None, prefetch_hit=False):
+        return []
+
+
+class NextLinePrefetcher(Prefetcher):
+
+    # Tagged next-line prefetching: a miss, or the first use of a prefetched
+    # block, fetches the degree blocks that follow it, so a sequential stream
+    # keeps one step ahead after its first miss.
+    def __init__(self, degree=1):
+        self.degree = degree
+
+    def on_access(self, block_index, hit, pc=None, prefetch_hit=False):
+        if hit and not prefetch_hit:
+            return []
+        return range(block_index + 1, block_index + 1 + self.degree)
+
+
+class StridePrefetcher(Prefetcher):
+
+    # Reference prediction table: per program counter (or, without one, per
+    # region of region_blocks blocks) the last block accessed and the stride
+    # between the last two accesses. Once the same stride was seen threshold
+    # times in a row, the next degree blocks along the stride are prefetched.
+    # The table keeps the table_size most recently used entries.
+    def __init__(self, table_size=64, degree=1, threshold=2, region_blocks=64):
+        self.table_size = table_size
+        self.degree = degree
+        self.threshold = threshold
+        self.region_blocks = region_blocks
+        self.table = OrderedDict()  # key -> [last block, stride, times seen]
+
+    def on_access(self, block_index, hit, pc=None, prefetch_hit=False):
+
+        key = pc if pc is not None else block_index // self.region_blocks
+        entry = self.table.get(key)
+        if entry is None:
+            self.table[key] = [block_index, 0, 0]
+            if len(self.table) > self.table_size:
+                self.table.popitem(last=False)
+            return []
+
+        self.table.move_to_end(key)
+        last_block, stride, seen = entry
+        new_stride = block_index - last_block
+        if new_stride == 0:
+            return []
+
+        if new_stride == stride:
+            seen += 1
+        else:
+            stride = new_stride
+            seen = 1
+        entry[:] = [block_index, stride, seen]
+
+        if seen < self.threshold:
+            return []
+        return [block_index + stride * step for step in range(1, self.degree + 1)]
+
+
+class StreamPrefetcher(Prefetcher):
+
+    # Tracks up to no_of_streams streams. A miss that is not part of a stream
+    # starts one; the next access within window blocks of it sets the
+    # direction of the stream. Every access that moves a confirmed stream on
+    # prefetches up to degree blocks, staying at most distance blocks ahead.
+    def __init__(self, no_of_streams=16, window=4, distance=8, degree=2):
+        self.no_of_streams = no_of_streams
+        self.window = window
+        self.distance = distance
+        self.degree = degree
+        # stream id -> [head, direction (0 until confirmed), next block to prefetch]
+        self.streams = OrderedDict()
+        self.next_stream = 0
+
+    def on_access(self, block_index, hit, pc=None, prefetch_hit=False):
+
+        for stream, entry in reversed(self.streams.items()):
+            head, direction, next_prefetch = entry
+
+            if direction == 0:
+                step = block_index - head
+                if step == 0 or abs(step) > self.window:
+                    continue
+                direction = 1 if step > 0 else -1
+                next_prefetch = block_index + direction
+            elif (
+                not 0 < (block_index - head) * direction <= self.window + self.distance
+            ):
+                continue
+
+            self.streams.move_to_end(stream)
+
+            # the next blocks up to distance ahead, degree at a time
+            next_prefetch = (
+                max(next_prefetch * direction, (block_index + direction) * direction)
+                * direction
+            )
+            last = block_index + direction * self.distance
+            blocks = []
+            while len(blocks) < self.degree and (last - next_prefetch) * direction >= 0:
+                blocks.append(next_prefetch)
+                next_prefetch += direction
+
+            entry[:] = [block_index, direction, next_prefetch]
+            return blocks
+
+        if not hit:
+            self.streams[self.next_stream] = [block_index, 0, 0]
+            self.next_stream += 1
+            if len(self.streams) > self.no_of_streams:
+                self.streams.popitem(last=False)
+        return []
@@ -0,0 +1,546 @@
+import heapq
+import random
+from array import array
+from collections import OrderedDict
+
+from util import CacheError, ReplacementStrategy
+
+
+# Bookkeeping behind Cache.block_replacement. A policy tracks every line of a
+# cache by (line index, way) and is told about fills and accesses, so choosing
+# a victim never has to look at all the blocks of the line. Caches find the
+# policy of their strategy in POLICIES (see register_policy).
+#
+# For RANDOM, LRU, FIFO, LFU and MRU the victims are the same ones the
+# original min/max scans over the block metadata picked, ties included (the
+# lowest way wins a tie).
+class ReplacementPolicy:
+
+    # False if access() is a no-op, lets the cache skip locating the block
+    tracks_accesses = True
+
+    def __init__(self, no_of_cache_lines, associated):
+        self.no_of_cache_lines = no_of_cache_lines
+        self.associated = associated
+
+    # a new block was placed in the way (free way or victim)
+    def fill(self, index, way):
+        pass
+
+    # the block in the way was read or written
+    def access(self, index, way):
+        pass
+
+    # a block that is not cached is about to be placed in the line (before
+    # victim and fill); only policies keeping a history of tags need it
+    def miss(self, index, tag):
+        pass
+
+    # a prefetched block was placed in the way (after fill); it counts as
+    # recently used, or it would be the first victim before its use
+    def prefetch_fill(self, index, way):
+        pass
+
+    # the block in the way was dropped without a replacement (Cache.invalidate),
+    # the way stays free until a fill
+    def invalidate(self, index, way):
+        pass
+
+    # way of the block to be replaced in a full line
+    def victim(self, index):
+        raise NotImplementedError
+
+    # rebuild the state of a line from the metadata of its blocks
+    def load_line(self, index, line):
+        for way, block in enumerate(line):
+            if block is not None:
+                self.fill(index, way)
+
+
+class WaySet:
+
+    # set of ways that can also hand out its lowest way; the heap is cleaned
+    # lazily and rebuilt when stale entries outnumber the live ones
+    __slots__ = ("ways", "heap")
+
+    def __init__(self):
+        self.ways = set()
+        self.heap = []
+
+    def __len__(self):
+        return len(self.ways)
+
+    def __contains__(self, way):
+        return way in self.ways
+
+    def add(self, way):
+        if way not in self.ways:
+            self.ways.add(way)
+            heapq.heappush(self.heap, way)
+
+    def discard(self, way):
+        self.ways.discard(way)
+        if len(self.heap) > 2 * len(self.ways) + 8:
+            self.heap = list(self.ways)
+            heapq.heapify(self.heap)
+
+    def lowest(self):
+        heap = self.heap
+        while heap[0] not in self.ways:
+            heapq.heappop(heap)
+        return heap[0]
+
+
+class RandomPolicy(ReplacementPolicy):
+
+    tracks_accesses = False
+
+    def victim(self, index):
+        return random.randint(0, self.associated - 1)
+
+
+class FirstInFirstOutPolicy(ReplacementPolicy):
+
+    # Per line: the ways in the order their blocks were placed, oldest first.
+    # Invalidated ways leave the order and rejoin it as the youngest when they
+    # are filled again; a block reloaded in place keeps its place.
+    tracks_accesses = False
+
+    def __init__(self, no_of_cache_lines, associated):
+        super().__init__(no_of_cache_lines, associated)
+        self.orders = [None] * no_of_cache_lines
+
+    def line_order(self, index):
+        order = self.orders[index]
+        if order is None:
+            order = self.orders[index] = OrderedDict()
+        return order
+
+    def fill(self, index, way):
+        order = self.line_order(index)
+        if way not in order:
+            order[way] = None
+
+    def invalidate(self, index, way):
+        self.line_order(index).pop(way, None)
+
+    def victim(self, index):
+        way, none = self.line_order(index).popitem(last=False)
+        return way
+
+    def load_line(self, index, line):
+        blocks = [
+            (block.get_fifo_place(), way)
+            for way, block in enumerate(line)
+            if block is not None
+        ]
+        self.orders[index] = OrderedDict.fromkeys(way for place, way in sorted(blocks))
+
+
+class RecencyPolicy(ReplacementPolicy):
+
+    # Per line: the ways accessed since their fill, ordered from least to most
+    # recently used, and the "cold" ways that were filled but never accessed
+    # (their blocks have access time -1, so they count as least recent).
+    def __init__(self, no_of_cache_lines, associated):
+        super().__init__(no_of_cache_lines, associated)
+        self.recency = [None] * no_of_cache_lines
+        self.cold = [None] * no_of_cache_lines
+
+    def line_state(self, index):
+        recency = self.recency[index]
+        if recency is None:
+            recency = self.recency[index] = OrderedDict()
+            self.cold[index] = WaySet()
+        return recency, self.cold[index]
+
+    def fill(self, index, way):
+        recency, cold = self.line_state(index)
+        recency.pop(way, None)
+        cold.add(way)
+
+    def prefetch_fill(self, index, way):
+        self.access(index, way)
+
+    def access(self, index, way):
+        recency, cold = self.line_state(index)
+        if way in cold:
+            cold.discard(way)
+            recency[way] = None
+        else:
+            recency.move_to_end(way)
+
+    def load_line(self, index, line):
+        recency = self.recency[index] = OrderedDict()
+        cold = self.cold[index] = WaySet()
+
+        accessed = []
+        for way, block in enumerate(line):
+            if block is None:
+                continue
+            if block.get_access_time() == -1:
+                cold.add(way)
+            else:
+                accessed.append((block.get_access_time(), way))
+
+        for access_time, way in sorted(accessed):
+            recency[way] = None
+
+
+class LeastRecentlyUsedPolicy(RecencyPolicy):
+    def victim(self, index):
+        recency, cold = self.line_state(index)
+        if cold:
+            return cold.lowest()
+        return next(iter(recency))
+
+
+class MostRecentlyUsedPolicy(RecencyPolicy):
+    def victim(self, index):
+        recency, cold = self.line_state(index)
+        if recency:
+            return next(reversed(recency))
+        return cold.lowest()
+
+
+class LeastFrequentlyUsedPolicy(ReplacementPolicy):
+
+    # Per line: the access count of every way and buckets of ways by count.
+    # The lowest non-empty bucket is tracked, counts only grow by one at a time
+    # and a fill resets the count to zero.
+    def __init__(self, no_of_cache_lines, associated):
+        super().__init__(no_of_cache_lines, associated)
+        self.counts = [None] * no_of_cache_lines
+        self.buckets = [None] * no_of_cache_lines
+        self.min_counts = array("q", [0]) * no_of_cache_lines
+
+    def line_state(self, index):
+        counts = self.counts[index]
+        if counts is None:
+            counts = self.counts[index] = [-1] * self.associated
+            self.buckets[index] = {}
+        return counts, self.buckets[index]
+
+    def move(self, index, way, count):
+        counts, buckets = self.line_state(index)
+
+        old_count = counts[way]
+        if old_count != -1:
+            bucket = buckets[old_count]
+            bucket.discard(way)
+            if not bucket:
+                del buckets[old_count]
+                if self.min_counts[index] == old_count:
+                    self.min_counts[index] = count
+
+        counts[way] = count
+        bucket = buckets.get(count)
+        if bucket is None:
+            bucket = buckets[count] = WaySet()
+        bucket.add(way)
+
+        if count < self.min_counts[index] or len(buckets) == 1:
+            self.min_counts[index] = count
+
+    def fill(self, index, way):
+        self.move(index, way, 0)
+
+    def access(self, index, way):
+        counts, buckets = self.line_state(index)
+        self.move(index, way, counts[way] + 1)
+
+    def victim(self, index):
+        counts, buckets = self.line_state(index)
+        return buckets[self.min_counts[index]].lowest()
+
+    def load_line(self, index, line):
+        self.counts[index] = None
+        for way, block in enumerate(line):
+            if block is not None:
+                self.move(index, way, block.get_accessed_count())
+
+
+class PseudoLeastRecentlyUsedPolicy(ReplacementPolicy):
+
+    # Tree-PLRU: per line a binary tree over the ways, each node a bit telling
+    # which half of it was used less recently. The bits of a line are packed
+    # in one integer (node n, numbered heap-like from the root at 1, is bit
+    # n). An access points the nodes on the way to the root away from it and
+    # the victim is found by following the bits down. Lines with a way count
+    # that is not a power of two get a tree with unused leaves on the right,
+    # which the walk down never enters.
+    def __init__(self, no_of_cache_lines, associated):
+        super().__init__(no_of_cache_lines, associated)
+        self.leaves = 1 << (associated - 1).bit_length()
+        self.bits = [0] * no_of_cache_lines
+
+        # per leaf: the (mask, value) of every node on its way to the root,
+        # so an access is one and-not and one or on the bits of the line
+        self.paths = []
+        for way in range(associated):
+            mask = value = 0
+            node = self.leaves + way
+            while node > 1:
+                parent = node >> 1
+                mask |= 1 << parent
+                if not node & 1:  # left child: the right half is older now
+                    value |= 1 << parent
+                node = parent
+            self.paths.append((~mask, value))
+
+        # nodes with at least one real way below them
+        self.used = bytearray(2 * self.leaves)
+        for way in range(associated):
+            node = self.leaves + way
+            while node and not self.used[node]:
+                self.used[node] = 1
+                node >>= 1
+
+    def fill(self, index, way):
+        self.access(index, way)
+
+    def access(self, index, way):
+        keep, value = self.paths[way]
+        self.bits[index] = self.bits[index] & keep | value
+
+    def victim(self, index):
+        bits = self.bits[index]
+        node = 1
+        while node < self.leaves:
+            node = 2 * node + (bits >> node & 1)
+            if not self.used[node]:
+                node ^= 1
+        return node - self.leaves
+
+    def load_line(self, index, line):
+        self.bits[index] = 0
+        accessed = [
+            (block.get_access_time(), way)
+            for way, block in enumerate(line)
+            if block is not None
+        ]
+        for access_time, way in sorted(accessed):
+            self.access(index, way)
+
+
+class StaticRripPolicy(ReplacementPolicy):
+
+    # Re-reference interval prediction (Jaleel et al.): every way holds a
+    # 2-bit prediction of how far away its next use is, one byte per way in
+    # a single bytearray for the whole cache. Hits predict a near re-use (0),
+    # new blocks a long one (MAX_RRPV - 1), so blocks used only once leave
+    # before the ones that were re-used. The victim is the first way with a
+    # distant prediction (MAX_RRPV); if there is none, the line ages until
+    # one way gets there. The access right after a fill is the one that
+    # missed, not a re-reference, so it leaves the prediction as it is.
+    MAX_RRPV = 3
+
+    # bytes.translate tables adding 1, 2 or 3 to every prediction of a line
+    AGING = [None] + [
+        bytes(min(value + age, 255) for value in range(256)) for age in (1, 2, 3)
+    ]
+
+    def __init__(self, no_of_cache_lines, associated):
+        super().__init__(no_of_cache_lines, associated)
+        self.rrpv = bytearray([self.MAX_RRPV]) * (no_of_cache_lines * associated)
+        self.filled = -1  # position of the way filled last, until accessed
+
+    def insertion_rrpv(self, index):
+        return self.MAX_RRPV - 1
+
+    def fill(self, index, way):
+        self.filled = index * self.associated + way
+        self.rrpv[self.filled] = self.insertion_rrpv(index)
+
+    def access(self, index, way):
+        position = index * self.associated + way
+        if position == self.filled:
+            self.filled = -1
+            return
+        self.filled = -1
+        self.rrpv[position] = 0
+
+    def victim(self, index):
+        start = index * self.associated
+        position = self.rrpv.find(self.MAX_RRPV, start, start + self.associated)
+        if position != -1:
+            return position - start
+
+        end = start + self.associated
+        line = self.rrpv[start:end]
+        line = line.translate(self.AGING[self.MAX_RRPV - max(line)])
+        self.rrpv[start:end] = line
+        return line.index(self.MAX_RRPV)
+
+    def load_line(self, index, line):
+        self.filled = -1
+        for way, block in enumerate(line):
+            if block is not None:
+                re_referenced = block.get_accessed_count() > 1
+                self.rrpv[index * self.associated + way] = (
+                    0 if re_referenced else self.MAX_RRPV - 1
+                )
+
+
+class BimodalRripPolicy(StaticRripPolicy):
+
+    # BRRIP: new blocks are predicted distant (MAX_RRPV), except one fill out
+    # of every LONG_INSERTION_PERIOD, predicted long as under SRRIP; a working
+    # set larger than the cache then keeps part of it instead of thrashing.
+    # The throttle is a fill counter per line, so runs are reproducible and a
+    # line does not depend on the fills of the others (simulate_trace replays
+    # the trace line by line).
+    LONG_INSERTION_PERIOD = 32
+
+    def __init__(self, no_of_cache_lines, associated):
+        super().__init__(no_of_cache_lines, associated)
+        self.fills = array("q", [0]) * no_of_cache_lines
+
+    def insertion_rrpv(self, index):
+        self.fills[index] += 1
+        if self.fills[index] % self.LONG_INSERTION_PERIOD == 0:
+            return self.MAX_RRPV - 1
+        return self.MAX_RRPV
+
+
+class AdaptiveReplacementPolicy(ReplacementPolicy):
+
+    # ARC (Megiddo and Modha) within every line: T1 holds the ways used once
+    # since their fill, T2 the ways used again, both from least to most
+    # recently used. B1 and B2 remember the tags last evicted from T1 and T2.
+    # A miss on a tag in B1 means T1 was too small, so its target size p
+    # grows; a miss on a tag in B2 shrinks it. The victim comes from T1 while
+    # T1 is above its target, else from T2. When T1 alone fills the line (B1
+    # is then empty), its victim leaves no ghost, so T1 and B1 never hold more
+    # than associated tags. As under RRIP, the access right after a fill is
+    # the one that missed.
+    def __init__(self, no_of_cache_lines, associated):
+        super().__init__(no_of_cache_lines, associated)
+        self.lines = [None] * no_of_cache_lines
+        self.targets = array("q", [0]) * no_of_cache_lines
+        # (tag, found in B1, found in B2, victim kept in B1) of the miss
+        self.incoming = None
+        self.filled = None  # (index, way) filled last, until accessed
+
+    def line_state(self, index):
+        state = self.lines[index]
+        if state is None:
+            # T1 and T2: way -> tag; B1 and B2: tag -> None
+            state = self.lines[index] = tuple(OrderedDict() for x in range(4))
+        return state
+
+    def miss(self, index, tag):
+        t1, t2, b1, b2 = self.line_state(index)
+        target = self.targets[index]
+        in_b1 = tag in b1
+        in_b2 = tag in b2
+        keep_ghost = True
+
+        if in_b1:
+            target = min(self.associated, target + max(len(b2) // len(b1), 1))
+            del b1[tag]
+        elif in_b2:
+            target = max(0, target - max(len(b1) // len(b2), 1))
+            del b2[tag]
+        elif len(t1) + len(b1) >= self.associated:
+            if len(t1) < self.associated:
+                b1.popitem(last=False)
+            else:
+                keep_ghost = False
+        elif len(t1) + len(t2) + len(b1) + len(b2) >= 2 * self.associated and b2:
+            b2.popitem(last=False)
+
+        self.targets[index] = target
+        self.incoming = (tag, in_b1, in_b2, keep_ghost)
+
+    def victim(self, index):
+        t1, t2, b1, b2 = self.line_state(index)
+        in_b2 = self.incoming is not None and self.incoming[2]
+        keep_ghost = self.incoming is None or self.incoming[3]
+        target = self.targets[index]
+
+        if t1 and (len(t1) > target or (in_b2 and len(t1) == target) or not t2):
+            way, tag = t1.popitem(last=False)
+            if keep_ghost:
+                b1[tag] = None
+        else:
+            way, tag = t2.popitem(last=False)
+            b2[tag] = None
+        return way
+
+    def fill(self, index, way):
+        t1, t2, b1, b2 = self.line_state(index)
+        old_tag = t1.pop(way) if way in t1 else t2.pop(way, None)
+        self.filled = (index, way)
+
+        if self.incoming is None:  # the block was reloaded in place
+            t1[way] = old_tag
+            return
+        tag, in_b1, in_b2, keep_ghost = self.incoming
+        self.incoming = None
+        if in_b1 or in_b2:
+            t2[way] = tag
+        else:
+            t1[way] = tag
+
+    def invalidate(self, index, way):
+        t1, t2, b1, b2 = self.line_state(index)
+        t1.pop(way, None)
+        t2.pop(way, None)
+
+    def access(self, index, way):
+        filled = self.filled
+        self.filled = None
+        if filled is not None and filled == (index, way):
+            return
+
+        t1, t2, b1, b2 = self.line_state(index)
+        if way in t1:
+            t2[way] = t1.pop(way)
+        elif way in t2:
+            t2.move_to_end(way)
+
+    def load_line(self, index, line):
+        self.lines[index] = None
+        self.targets[index] = 0
+        self.filled = None
+        t1, t2, b1, b2 = self.line_state(index)
+
+        blocks = [
+            (block.get_access_time(), way, block)
+            for way, block in enumerate(line)
+            if block is not None
+        ]
+        for access_time, way, block in sorted(blocks, key=lambda item: item[:2]):
+            if block.get_accessed_count() > 1:
+                t2[way] = block.get_tag()
+            else:
+                t1[way] = block.get_tag()
+
+
+POLICIES = {
+    ReplacementStrategy.RANDOM: RandomPolicy,
+    ReplacementStrategy.LEAST_RECENTLY_USED: LeastRecentlyUsedPolicy,
+    ReplacementStrategy.FIRST_IN_FIRST_OUT: FirstInFirstOutPolicy,
+    ReplacementStrategy.LEAST_FREQUENTLY_USED: LeastFrequentlyUsedPolicy,
+    ReplacementStrategy.MOST_RECENTLY_USED: MostRecentlyUsedPolicy,
+    ReplacementStrategy.PSEUDO_LEAST_RECENTLY_USED: PseudoLeastRecentlyUsedPolicy,
+    ReplacementStrategy.STATIC_RRIP: StaticRripPolicy,
+    ReplacementStrategy.BIMODAL_RRIP: BimodalRripPolicy,
+    ReplacementStrategy.ADAPTIVE_REPLACEMENT: AdaptiveReplacementPolicy,
+}
+
+
+# Makes a policy class (a ReplacementPolicy) available to caches created with
+# the strategy; the strategy can be a ReplacementStrategy or any other hashable
+# key, such as the name of a policy of your own
+def register_policy(strategy, policy_class):
+    if not issubclass(policy_class, ReplacementPolicy):
+        raise CacheError("A replacement policy must subclass ReplacementPolicy")
+    POLICIES[strategy] = policy_class
+
+
+def create_policy(strategy, no_of_cache_lines, associated):
+    if strategy not in POLICIES:
+        raise CacheError("invalid replacement strategy")
+    return POLICIES[strategy](no_of_cache_lines, associated)
@@ -0,0 +1,209 @@
+import statistics
+
+import numpy as np
+
+import traces
+import util
+from util import CacheError
+
+# Estimates the miss ratio of a cache on a trace too long to simulate in full,
+# from a sample of it, with a confidence interval:
+# - set sampling: only the accesses to a random subset of the lines are
+#   simulated. Lines do not interact, so a sampled line behaves exactly as in
+#   the full simulation; the lines are the sampling units.
+# - interval sampling: the trace is cut in periods and the last accesses of
+#   every period are measured. Before each measured interval the cache is
+#   warmed on the accesses preceding it (functional warmup: simulated, not
+#   counted); the rest of the period is skipped. The intervals are the
+#   sampling units.
+# Both use the ratio estimator (misses over accesses of the sampled units);
+# its variance is estimated from the spread of the units, with the finite
+# population correction, and the interval uses the normal quantile.
+#
+# NOTE : the cache is driven with simulate_trace, so its stats only hold the
+# simulated accesses; the estimates are in the returned report
+
+
+# report of the ratio estimator over sampling units
+# accesses, misses - numpy arrays, one item per sampled unit
+# sampled_fraction - share of the population the units cover
+def ratio_estimate(accesses, misses, sampled_fraction, confidence):
+
+    if not 0 < confidence < 1:
+        raise CacheError("Confidence must be between 0 and 1")
+
+    no_of_units = len(accesses)
+    total_accesses = int(accesses.sum())
+    total_misses = int(misses.sum())
+    miss_ratio = total_misses / total_accesses if total_accesses else 0.0
+
+    standard_error = 0.0
+    if no_of_units > 1 and total_accesses and sampled_fraction < 1:
+        residuals = misses - miss_ratio * accesses
+        mean_accesses = total_accesses / no_of_units
+        variance = (
+            (1 - sampled_fraction)
+            * float(np.sum(residuals * residuals))
+            / ((no_of_units - 1) * no_of_units * mean_accesses * mean_accesses)
+        )
+        standard_error = variance**0.5
+
+    margin = statistics.NormalDist().inv_cdf((1 + confidence) / 2) * standard_error
+    return {
+        "units": no_of_units,
+        "accesses": total_accesses,
+        "misses": total_misses,
+        "miss_ratio": miss_ratio,
+        "standard_error": standard_error,
+        "confidence": confidence,
+        "miss_ratio_low": max(0.0, miss_ratio - margin),
+        "miss_ratio_high": min(1.0, miss_ratio + margin),
+    }
+
+
+# lines of the cache accessed by the addresses
+def line_indices(cache, addresses):
+    return (addresses >> cache.offset_bits) % cache.no_of_cache_lines
+
+
+def check_sampled_cache(cache):
+    # a prefetcher loads blocks into other lines, which breaks both the
+    # independence of the lines and the warmup of the intervals
+    if cache.prefetcher is not None:
+        raise CacheError("Sampling does not support caches with a prefetcher")
+
+
+# cache - an empty Cache or ArrayCache
+# chunks - (addresses, ops) numpy arrays, e.g. from traces.read_trace
+# no_of_sampled_lines - number of lines simulated, picked at random
+def set_sampling(cache, chunks, no_of_sampled_lines, confidence=0.95, seed=None):
+
+    check_sampled_cache(cache)
+    no_of_lines = cache.no_of_cache_lines
+    if not 1 <= no_of_sampled_lines <= no_of_lines:
+        raise CacheError(f"Between 1 and {no_of_lines} lines can be sampled")
+
+    rng = np.random.default_rng(seed)
+    sampled_lines = np.sort(
+        rng.choice(no_of_lines, size=no_of_sampled_lines, replace=False)
+    )
+    is_sampled = np.zeros(no_of_lines, dtype=bool)
+    is_sampled[sampled_lines] = True
+
+    line_accesses = np.zeros(no_of_lines, dtype=np.int64)
+    line_misses = np.zeros(no_of_lines, dtype=np.int64)
+    total_accesses = 0
+
+    for addresses, ops in chunks:
+        addresses = np.asarray(addresses, dtype=np.int64)
+        total_accesses += len(addresses)
+        selected = is_sampled[line_indices(cache, addresses)]
+        addresses = addresses[selected]
+        hits, counters = cache.simulate_trace(addresses, np.asarray(ops)[selected])
+
+        indices = line_indices(cache, addresses)
+        line_accesses += np.bincount(indices, minlength=no_of_lines)
+        line_misses += np.bincount(indices[~hits], minlength=no_of_lines)
+
+    report = ratio_estimate(
+        line_accesses[sampled_lines],
+        line_misses[sampled_lines],
+        no_of_sampled_lines / no_of_lines,
+        confidence,
+    )
+    report["mode"] = util.SET_SAMPLING
+    report["total_accesses"] = total_accesses
+    report["simulated_accesses"] = report["accesses"]
+    return report
+
+
+# cache - an empty Cache or ArrayCache
+# chunks - (addresses, ops) numpy arrays, e.g. from traces.read_trace
+# period - accesses per period; its last "interval" accesses are measured
+# warmup - accesses simulated before each measured interval; None warms the
+#          cache on the whole rest of the period (nothing is skipped)
+def interval_sampling(cache, chunks, period, interval, warmup=None, confidence=0.95):
+
+    check_sampled_cache(cache)
+    if not 1 <= interval <= period:
+        raise CacheError("The measured interval must fit in the period")
+    if warmup is None:
+        warmup = period - interval
+    if not 0 <= warmup <= period - interval:
+        raise CacheError("The warmup and the interval must fit in the period")
+
+    # phases of a period: skipped, warmed up, measured
+    warmup_start = period - interval - warmup
+    interval_start = period - interval
+
+    interval_accesses = []
+    interval_misses = []
+    misses = 0
+    position = 0  # in the trace
+    simulated = 0
+
+    for addresses, ops in chunks:
+        addresses = np.asarray(addresses, dtype=np.int64)
+        ops = np.asarray(ops)
+        start = 0
+        while start < len(addresses):
+            phase = position % period
+            if phase < warmup_start:
+                end = min(len(addresses), start + warmup_start - phase)
+            elif phase < interval_start:
+                end = min(len(addresses), start + interval_start - phase)
+                cache.simulate_trace(addresses[start:end], ops[start:end])
+                simulated += end - start
+            else:
+                end = min(len(addresses), start + period - phase)
+                hits, counters = cache.simulate_trace(
+                    addresses[start:end], ops[start:end]
+                )
+                simulated += end - start
+                misses += counters["misses"]
+                if phase + end - start == period:
+                    interval_accesses.append(interval)
+                    interval_misses.append(misses)
+                    misses = 0
+            position += end - start
+            start = end
+
+    # an interval cut short by the end of the trace
+    phase = position % period
+    if phase > interval_start:
+        interval_accesses.append(phase - interval_start)
+        interval_misses.append(misses)
+
+    accesses = np.array(interval_accesses, dtype=np.int64)
+    report = ratio_estimate(
+        accesses,
+        np.array(interval_misses, dtype=np.int64),
+        int(accesses.sum()) / position if position else 1.0,
+        confidence,
+    )
+    report["mode"] = util.INTERVAL_SAMPLING
+    report["total_accesses"] = position
+    report["simulated_accesses"] = simulated
+    return report
+
+
+# sampled simulation of a trace file, read chunk by chunk
+# sampling - SET_SAMPLING or INTERVAL_SAMPLING; the other arguments go to set_sampling or
+#            interval_sampling
+def sample_trace(
+    cache,
+    path,
+    sampling,
+    trace_format=None,
+    chunk_size=traces.DEFAULT_CHUNK_SIZE,
+    **kwargs,
+):
+
+    chunks = traces.read_trace(
+        path, trace_format, chunk_size, address_bits=util.CACHE_ADDRESS_SIZE
+    )
+    if sampling == util.SET_SAMPLING:
+        return set_sampling(cache, chunks, **kwargs)
+    if sampling == util.INTERVAL_SAMPLING:
+        return interval_sampling(cache, chunks, **kwargs)
+    raise CacheError("Invalid sampling: " + str(sampling))
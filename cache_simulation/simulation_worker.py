@@ -0,0 +1,58 @@
+import threading
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Runs the simulation of the controller away from the Qt event thread. The
+# operations are handed to the GUI in batches (at most one batch every
+# batch_interval seconds), so the view fills in while the simulation runs
+# without a signal per operation.
+
+
+class SimulationWorker(QObject):
+
+    operations_ready = pyqtSignal(list)
+    progress = pyqtSignal(int, int)  # operations done, operations in total
+    finished = pyqtSignal(bool)  # True if the run was cancelled
+
+    def __init__(self, controller, batch_interval=0.05):
+        super().__init__()
+        self.controller = controller
+        self.batch_interval = batch_interval
+        self.cancel_event = threading.Event()
+
+    # may be called from any thread; the run stops after the current operation
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+
+        runs = self.controller.simulation_runs()
+        total = sum(no_of_operations for operations, no_of_operations in runs)
+
+        done = 0
+        batch = []
+        last_batch_time = time.monotonic()
+
+        try:
+            for operations, no_of_operations in runs:
+                for operation in operations:
+                    batch.append(operation)
+                    done += 1
+
+                    if self.cancel_event.is_set():
+                        break
+
+                    if time.monotonic() - last_batch_time >= self.batch_interval:
+                        self.operations_ready.emit(batch)
+                        self.progress.emit(done, total)
+                        batch = []
+                        last_batch_time = time.monotonic()
+
+                if self.cancel_event.is_set():
+                    break
+        finally:
+            if batch:
+                self.operations_ready.emit(batch)
+            self.progress.emit(done, total)
+            self.finished.emit(self.cancel_event.is_set())
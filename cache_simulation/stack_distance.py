@@ -0,0 +1,176 @@
+from array import array
+
+import traces
+import util
+from util import CacheError
+
+# Mattson's stack algorithm: an access hits in an LRU cache of C blocks
+# exactly when fewer than C distinct blocks were used since the previous
+# access to the same block (its stack distance). One pass over a trace gives
+# the distance of every access, hence the hit ratio of every LRU size at once.
+#
+# The distinct blocks between two accesses are counted with a Fenwick tree
+# over the access times, where only the latest access of every block is
+# marked, so each access costs O(log n).
+
+
+class FenwickTree:
+    def __init__(self, size):
+        self.size = size
+        self.tree = array("q", [0]) * (size + 1)
+
+    # tree where the first "count" positions hold a one
+    @classmethod
+    def of_ones(cls, size, count):
+        fenwick = cls(size)
+        for position in range(1, size + 1):
+            low = position - (position & -position)
+            fenwick.tree[position] = max(0, min(count, position) - low)
+        return fenwick
+
+    def add(self, position, value):
+        position += 1
+        while position <= self.size:
+            self.tree[position] += value
+            position += position & -position
+
+    # sum of positions 0..position
+    def prefix_sum(self, position):
+        position += 1
+        total = 0
+        while position > 0:
+            total += self.tree[position]
+            position -= position & -position
+        return total
+
+
+class LruStack:
+
+    # the LRU stack of one set of the cache
+    def __init__(self, initial_size=1024):
+        self.initial_size = initial_size
+        self.time = 0
+        self.last_access = {}
+        self.marks = FenwickTree(initial_size)
+
+    # returns the stack distance of the access, None for a first access
+    def access(self, block):
+
+        previous = self.last_access.get(block)
+        if previous is None:
+            distance = None
+        else:
+            distance = len(self.last_access) - self.marks.prefix_sum(previous)
+            self.marks.add(previous, -1)
+            del self.last_access[block]
+
+        if self.time == self.marks.size:
+            self.compact()
+
+        self.marks.add(self.time, 1)
+        self.last_access[block] = self.time
+        self.time += 1
+
+        return distance
+
+    # renumbers the latest accesses 0..k-1 so the tree does not grow with the
+    # length of the trace, only with the number of distinct blocks
+    def compact(self):
+        blocks = sorted(self.last_access, key=self.last_access.get)
+        self.last_access = {block: time for time, block in enumerate(blocks)}
+        self.time = len(blocks)
+        self.marks = FenwickTree.of_ones(
+            max(2 * self.time, self.initial_size), self.time
+        )
+
+
+class StackDistanceAnalyzer:
+
+    # block_size - bytes per block, no_of_sets - number of lines of the K-WAY
+    # caches to analyze (1 analyzes fully associative caches); the hit ratio of
+    # a cache with K blocks per line is then known for every K
+    def __init__(self, block_size, no_of_sets=1):
+
+        if not util.is_power_of_two(block_size):
+            raise CacheError("Block size not a power of two")
+        if not util.is_power_of_two(no_of_sets):
+            raise CacheError("Number of sets not a power of two")
+
+        self.block_size = block_size
+        self.no_of_sets = no_of_sets
+        self.offset_bits = block_size.bit_length() - 1
+
+        self.stacks = {}
+        self.histogram = {}  # stack distance -> number of accesses
+        self.cold_misses = 0
+        self.accesses = 0
+
+    def process(self, addresses):
+
+        if hasattr(addresses, "tolist"):
+            addresses = addresses.tolist()
+
+        stacks = self.stacks
+        histogram = self.histogram
+        set_mask = self.no_of_sets - 1
+
+        for address in addresses:
+            block = address >> self.offset_bits
+            stack = stacks.get(block & set_mask)
+            if stack is None:
+                stack = stacks[block & set_mask] = LruStack()
+
+            distance = stack.access(block)
+            if distance is None:
+                self.cold_misses += 1
+            else:
+                histogram[distance] = histogram.get(distance, 0) + 1
+
+        self.accesses += len(addresses)
+
+    def hits(self, blocks_per_set):
+        return sum(
+            count
+            for distance, count in self.histogram.items()
+            if distance < blocks_per_set
+        )
+
+    def hit_ratio(self, blocks_per_set):
+        if self.accesses == 0:
+            return 0.0
+        return self.hits(blocks_per_set) / self.accesses
+
+    # (blocks per set, capacity in bytes, hit ratio) for every associativity up
+    # to max_blocks_per_set (default: the largest one that still gains hits)
+    def miss_ratio_curve(self, max_blocks_per_set=None):
+
+        if max_blocks_per_set is None:
+            max_blocks_per_set = max(self.histogram, default=0) + 1
+
+        curve = []
+        hits = 0
+        for blocks_per_set in range(1, max_blocks_per_set + 1):
+            hits += self.histogram.get(blocks_per_set - 1, 0)
+            capacity = blocks_per_set * self.no_of_sets * self.block_size
+            curve.append(
+                (
+                    blocks_per_set,
+                    capacity,
+                    hits / self.accesses if self.accesses else 0.0,
+                )
+            )
+        return curve
+
+
+def analyze_trace(
+    path,
+    block_size,
+    no_of_sets=1,
+    trace_format=None,
+    chunk_size=traces.DEFAULT_CHUNK_SIZE,
+):
+
+    analyzer = StackDistanceAnalyzer(block_size, no_of_sets)
+    for addresses, ops in traces.read_trace(path, trace_format, chunk_size):
+        analyzer.process(addresses)
+    return analyzer
@@ -0,0 +1,251 @@
+import json
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # only record_trace needs numpy
+    np = None
+
+LINE_COUNTERS = ("hits", "misses", "evictions", "dirty_writebacks")
+
+
+class CacheStats:
+
+    # Counters of a cache, globally and per line. Misses are also split in the
+    # three Cs: compulsory (first reference to the block), capacity (would
+    # miss in a fully associative LRU cache of the same size too) and conflict
+    # (would hit there). The fully associative cache is a shadow set of tags.
+    # classify_misses - keep the shadow up to date and classify the misses
+    def __init__(
+        self, no_of_cache_lines, no_of_blocks, block_size, classify_misses=True
+    ):
+        self.no_of_cache_lines = no_of_cache_lines
+        self.no_of_blocks = no_of_blocks
+        self.block_size = block_size
+        self.classify_misses = classify_misses
+        self.reset()
+
+    def reset(self):
+        self.accesses = 0
+        self.reads = 0
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dirty_writebacks = 0
+        self.invalidations = 0  # blocks dropped on request of another cache
+
+        # prefetched blocks: loaded, used by a demand access, evicted unused;
+        # pollution misses are demand misses on blocks a prefetch replaced
+        self.prefetches = 0
+        self.useful_prefetches = 0
+        self.useless_prefetches = 0
+        self.pollution_misses = 0
+
+        # memory traffic caused by the cache (fills, write-backs, write-throughs)
+        self.ram_reads = 0
+        self.ram_writes = 0
+
+        self.compulsory_misses = 0
+        self.capacity_misses = 0
+        self.conflict_misses = 0
+
+        self.line_hits = array("q", [0]) * self.no_of_cache_lines
+        self.line_misses = array("q", [0]) * self.no_of_cache_lines
+        self.line_evictions = array("q", [0]) * self.no_of_cache_lines
+        self.line_dirty_writebacks = array("q", [0]) * self.no_of_cache_lines
+
+        self.seen_tags = set()
+        self.shadow_tags = OrderedDict()
+
+    def record_access(self, index, tag, hit, is_write):
+
+        self.accesses += 1
+        if is_write:
+            self.writes += 1
+        else:
+            self.reads += 1
+
+        if hit:
+            self.hits += 1
+            self.line_hits[index] += 1
+        else:
+            self.misses += 1
+            self.line_misses[index] += 1
+
+        if self.classify_misses:
+            self.classify(tag, hit)
+
+    def classify(self, tag, hit):
+
+        shadow = self.shadow_tags
+        shadow_hit = tag in shadow
+        if shadow_hit:
+            shadow.move_to_end(tag)
+        else:
+            shadow[tag] = None
+            if len(shadow) > self.no_of_blocks:
+                shadow.popitem(last=False)
+
+        if not hit:
+            if tag not in self.seen_tags:
+                self.compulsory_misses += 1
+            elif shadow_hit:
+                self.conflict_misses += 1
+            else:
+                self.capacity_misses += 1
+
+        self.seen_tags.add(tag)
+
+    def record_eviction(self, index, dirty):
+        self.evictions += 1
+        self.line_evictions[index] += 1
+        if dirty:
+            self.dirty_writebacks += 1
+            self.line_dirty_writebacks[index] += 1
+
+    def record_invalidation(self):
+        self.invalidations += 1
+
+    def record_prefetch(self):
+        self.prefetches += 1
+
+    def record_useful_prefetch(self):
+        self.useful_prefetches += 1
+
+    def record_useless_prefetch(self):
+        self.useless_prefetches += 1
+
+    def record_pollution_miss(self):
+        self.pollution_misses += 1
+
+    # useful prefetches out of all the prefetches
+    def prefetch_accuracy(self):
+        return self.useful_prefetches / self.prefetches if self.prefetches else 0.0
+
+    # misses the prefetches removed, out of the misses there would have been
+    def prefetch_coverage(self):
+        would_miss = self.misses + self.useful_prefetches
+        return self.useful_prefetches / would_miss if would_miss else 0.0
+
+    def record_ram_read(self, count=1):
+        self.ram_reads += count
+
+    def record_ram_write(self, count=1):
+        self.ram_writes += count
+
+    # a whole trace at once: arrays of tags, line indices, ops and hits
+    # repeats_hit - whether a repeated access to a block always hits, false
+    # if something between the two (e.g. a prefetch) can evict the block
+    def record_trace(self, tags, indices, writes, hits, repeats_hit=True):
+
+        no_of_hits = int(np.count_nonzero(hits))
+        no_of_writes = int(np.count_nonzero(writes))
+        self.accesses += len(tags)
+        self.writes += no_of_writes
+        self.reads += len(tags) - no_of_writes
+        self.hits += no_of_hits
+        self.misses += len(tags) - no_of_hits
+
+        lines = self.no_of_cache_lines
+        line_hits = np.bincount(indices[hits], minlength=lines)
+        line_accesses = np.bincount(indices, minlength=lines)
+        np.frombuffer(self.line_hits, dtype=np.int64)[:] += line_hits
+        np.frombuffer(self.line_misses, dtype=np.int64)[:] += line_accesses - line_hits
+
+        if self.classify_misses and len(tags):
+            if not repeats_hit:
+                self.classify_trace(tags.tolist(), hits.tolist())
+                return
+            # a repeated access to the block used just before is always a hit
+            # and leaves the shadow as it is, so runs of one block count once
+            changes = np.empty(len(tags), dtype=bool)
+            changes[0] = True
+            np.not_equal(tags[1:], tags[:-1], out=changes[1:])
+            self.classify_trace(tags[changes].tolist(), hits[changes].tolist())
+
+    # classify() inlined over a whole trace; a block in the shadow has been
+    # seen before, so only blocks missing from the shadow need the seen set
+    def classify_trace(self, tags, hits):
+
+        shadow = self.shadow_tags
+        move_to_end = shadow.move_to_end
+        pop_oldest = shadow.popitem
+        seen = self.seen_tags
+        capacity = self.no_of_blocks
+        compulsory_misses = capacity_misses = conflict_misses = 0
+
+        for tag, hit in zip(tags, hits):
+            if tag in shadow:
+                move_to_end(tag)
+                if not hit:
+                    conflict_misses += 1
+                continue
+
+            shadow[tag] = None
+            if len(shadow) > capacity:
+                pop_oldest(False)
+            if tag in seen:
+                if not hit:
+                    capacity_misses += 1
+            else:
+                seen.add(tag)
+                if not hit:
+                    compulsory_misses += 1
+
+        self.compulsory_misses += compulsory_misses
+        self.capacity_misses += capacity_misses
+        self.conflict_misses += conflict_misses
+
+    # evictions that happened inside a vectorized trace replay, per line
+    def record_evictions(self, indices, dirty):
+        lines = self.no_of_cache_lines
+        self.evictions += len(indices)
+        self.dirty_writebacks += int(np.count_nonzero(dirty))
+        np.frombuffer(self.line_evictions, dtype=np.int64)[:] += np.bincount(
+            indices, minlength=lines
+        )
+        np.frombuffer(self.line_dirty_writebacks, dtype=np.int64)[:] += np.bincount(
+            indices[dirty], minlength=lines
+        )
+
+    def hit_ratio(self):
+        return self.hits / self.accesses if self.accesses else 0.0
+
+    def to_dict(self, per_line=True):
+
+        stats = {
+            "accesses": self.accesses,
+            "reads": self.reads,
+            "writes": self.writes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio(),
+            "evictions": self.evictions,
+            "dirty_writebacks": self.dirty_writebacks,
+            "invalidations": self.invalidations,
+            "prefetches": self.prefetches,
+            "useful_prefetches": self.useful_prefetches,
+            "useless_prefetches": self.useless_prefetches,
+            "pollution_misses": self.pollution_misses,
+            "prefetch_accuracy": self.prefetch_accuracy(),
+            "prefetch_coverage": self.prefetch_coverage(),
+            "ram_reads": self.ram_reads,
+            "ram_writes": self.ram_writes,
+            "ram_bytes_read": self.ram_reads * self.block_size,
+            "ram_bytes_written": self.ram_writes * self.block_size,
+        }
+        if self.classify_misses:
+            stats["compulsory_misses"] = self.compulsory_misses
+            stats["capacity_misses"] = self.capacity_misses
+            stats["conflict_misses"] = self.conflict_misses
+
+        if per_line:
+            stats["lines"] = {
+                name: getattr(self, "line_" + name).tolist() for name in LINE_COUNTERS
+            }
+        return stats
+
+    def to_json(self, per_line=True, **kwargs):
+        return json.dumps(self.to_dict(per_line), **kwargs)
@@ -0,0 +1,188 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import traces
+import util
+from array_cache import ArrayCache
+from util import CacheError, ReplacementStrategy, WritePolicy
+
+# Runs one trace through many cache configurations in parallel. Every worker
+# maps the same binary trace file in memory (text and compressed traces are
+# converted once up front), so the trace is shared through the page cache
+# instead of being pickled to each process.
+
+RESULT_FIELDS = [
+    "capacity",
+    "associativity",
+    "block_size",
+    "strategy",
+    "write_policy",
+    "accesses",
+    "reads",
+    "writes",
+    "hits",
+    "misses",
+    "evictions",
+    "hit_ratio",
+    "dirty_writebacks",
+    "ram_reads",
+    "ram_writes",
+    "ram_bytes_read",
+    "ram_bytes_written",
+]
+
+# memory traffic columns, taken from the statistics of the cache
+TRAFFIC_FIELDS = RESULT_FIELDS[-5:]
+
+
+# every combination of the given values, as keyword arguments of Cache;
+# combinations Cache refuses (e.g. K-WAY too high for the capacity) are left out
+def sweep_configurations(
+    capacities, associativities, block_sizes, strategies, write_policies
+):
+
+    configurations = []
+    for capacity, associativity, block_size, strategy, policy in itertools.product(
+        capacities, associativities, block_sizes, strategies, write_policies
+    ):
+        configuration = {
+            "capacity": capacity,
+            "associativity": associativity,
+            "block_size": block_size,
+            "replacement_strategy": strategy,
+            "write_policy": policy,
+        }
+        try:
+            ArrayCache(capacity, associativity, block_size)
+        except CacheError:
+            continue
+        configurations.append(configuration)
+
+    return configurations
+
+
+# The cache runs without a RAM (the trace may reach any address), its
+# statistics still count the blocks it reads and writes back, which is what
+# tells the write policies apart.
+def simulate_configuration(trace_path, chunk_size, configuration):
+
+    cache = ArrayCache(**configuration)
+    counters = traces.replay_trace(cache, trace_path, util.BINARY_TRACE, chunk_size)
+    stats = cache.stats.to_dict(per_line=False)
+
+    accesses = counters.get("accesses", 0)
+    return {
+        "capacity": cache.capacity,
+        "associativity": cache.associativity,
+        "block_size": cache.block_size,
+        "strategy": util.strategy_name(cache.strategy),
+        "write_policy": cache.write_policy.name,
+        **counters,
+        "hit_ratio": counters["hits"] / accesses if accesses else 0.0,
+        **{name: stats[name] for name in TRAFFIC_FIELDS},
+    }
+
+
+# returns one result row (a dict with RESULT_FIELDS) per configuration, in the
+# order of the configurations
+def run_sweep(
+    trace_path,
+    configurations,
+    workers=None,
+    trace_format=None,
+    chunk_size=traces.DEFAULT_CHUNK_SIZE,
+):
+
+    if trace_format is None:
+        trace_format = traces.detect_format(trace_path)
+
+    converted = None
+    if trace_format != util.BINARY_TRACE or trace_path.endswith(".gz"):
+        descriptor, converted = tempfile.mkstemp(suffix=".bin")
+        os.close(descriptor)
+        traces.write_binary_trace(
+            converted, traces.read_trace(trace_path, trace_format, chunk_size)
+        )
+        trace_path = converted
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    simulate_configuration, trace_path, chunk_size, configuration
+                )
+                for configuration in configurations
+            ]
+            return [future.result() for future in futures]
+    finally:
+        if converted is not None:
+            os.remove(converted)
+
+
+def write_results(results, output):
+    writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(results)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description="Run a memory trace through every combination of cache settings."
+    )
+    parser.add_argument("trace", help="dinero, lackey or binary trace (may be .gz)")
+    parser.add_argument(
+        "--format",
+        choices=[util.DINERO_TRACE, util.LACKEY_TRACE, util.BINARY_TRACE],
+        help="trace format (default: guessed from the file name)",
+    )
+    parser.add_argument("--capacity", type=int, nargs="+", required=True)
+    parser.add_argument(
+        "--associativity",
+        nargs="+",
+        required=True,
+        help=f"{util.DIRECTLY_MAPPED}, {util.FULLY_ASSOCIATIVE} or K-WAY",
+    )
+    parser.add_argument("--block-size", type=int, nargs="+", required=True)
+    parser.add_argument(
+        "--strategy",
+        nargs="+",
+        choices=[strategy.name for strategy in ReplacementStrategy],
+        default=[ReplacementStrategy.LEAST_RECENTLY_USED.name],
+    )
+    parser.add_argument(
+        "--write-policy",
+        nargs="+",
+        choices=[policy.name for policy in WritePolicy],
+        default=[WritePolicy.WRITE_BACK.name],
+    )
+    parser.add_argument("--workers", type=int, help="default: one per CPU")
+    parser.add_argument("--chunk-size", type=int, default=traces.DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", help="CSV file (default: standard output)")
+    args = parser.parse_args(argv)
+
+    configurations = sweep_configurations(
+        args.capacity,
+        args.associativity,
+        args.block_size,
+        [ReplacementStrategy[name] for name in args.strategy],
+        [WritePolicy[name] for name in args.write_policy],
+    )
+    results = run_sweep(
+        args.trace, configurations, args.workers, args.format, args.chunk_size
+    )
+
+    if args.output:
+        with open(args.output, "w", newline="") as output:
+            write_results(results, output)
+    else:
+        write_results(results, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
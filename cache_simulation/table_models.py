@@ -0,0 +1,99 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+import util
+
+# Models behind the GUI tables. The views ask only for the cells they show, so
+# a row is built (and its data formatted) when it scrolls into view instead of
+# one table item per cell up front.
+
+
+def display_value(value):
+    if isinstance(value, bytes):
+        return util.format_data(value, "  ")
+    return str(value)
+
+
+class CacheTableModel(QAbstractTableModel):
+
+    # headings - column names; no_of_rows - number of cache lines;
+    # fetch_row - returns the raw cells of a line, e.g. Controller.line_cells
+    # for the live cache or a table rebuilt from the journal
+    def __init__(self, headings, no_of_rows, fetch_row, parent=None):
+        super().__init__(parent)
+        self.headings = headings
+        self.no_of_rows = no_of_rows
+        self.fetch_row = fetch_row
+
+        # Qt asks for the cells of a row one by one, the row is built once
+        self.last_row = None
+        self.last_cells = None
+
+    @classmethod
+    def from_rows(cls, headings, rows, parent=None):
+        return cls(headings, len(rows), rows.__getitem__, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.no_of_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headings)
+
+    def row_cells(self, row):
+        if row != self.last_row:
+            self.last_cells = self.fetch_row(row)
+            self.last_row = row
+        return self.last_cells
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return display_value(self.row_cells(index.row())[index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headings[section]
+        return str(section)
+
+    # the cache changed under the model, drop what was read from it
+    def refresh(self):
+        self.beginResetModel()
+        self.last_row = None
+        self.last_cells = None
+        self.endResetModel()
+
+
+class OperationsTableModel(QAbstractTableModel):
+
+    HEADINGS = ["Operation", "Tag", "Index", "Result"]
+
+    def __init__(self, operations=(), parent=None):
+        super().__init__(parent)
+        self.operations = list(operations)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.operations)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADINGS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return str(self.operations[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADINGS[section]
+        return str(section)
+
+    def append_operations(self, operations):
+        if not operations:
+            return
+        first = len(self.operations)
+        self.beginInsertRows(QModelIndex(), first, first + len(operations) - 1)
+        self.operations.extend(operations)
+        self.endInsertRows()
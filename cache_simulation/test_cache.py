@@ -1,5 +1,12 @@
+import random
+
+import pytest
+
+import util
 from cache import Cache
 from cache import Ram
+from array_cache import ArrayCache
+from util import CacheError, ReplacementStrategy, WritePolicy
 
 
 def test_cache():
@@ -19,9 +26,355 @@ def test_cache():
     print(cache.read(block, 2))
     print()
 
-    cache.write(block, ["0x00", "0x00", "0x00", "0x00"])
+    cache.write(block, bytes([0x00, 0x00, 0x00, 0x00]))
 
     print(cache)
 
 
 test_cache()
+
+
+def run_random_operations(cache, ram, seed):
+    random.seed(seed)
+    results = []
+
+    for i in range(cache.no_of_blocks):
+        cache.write_from_ram(i, ram.fetch_data(i))
+
+    for i in range(400):
+        tag = random.randint(0, 4 * cache.no_of_blocks)
+        if cache.associativity == util.FULLY_ASSOCIATIVE:
+            index = 0
+        else:
+            index = tag % cache.no_of_cache_lines
+
+        block = cache.search(tag, index)
+        if block is None:
+            cache.write_from_ram(tag, ram.fetch_data(tag))
+            block = cache.search(tag, index)
+
+        if random.randint(0, 1):
+            cache.write(block, random.randbytes(cache.block_size))
+        else:
+            results.append(bytes(cache.read(block)))
+
+    lines = [
+        [
+            (
+                block.get_tag(),
+                block.get_access_time(),
+                block.get_accessed_count(),
+                block.get_fifo_place(),
+                block.get_dirty_bit(),
+                block.get_written(),
+                bytes(block.get_data()),
+            )
+            for block in line
+        ]
+        for line in cache.cache_lines
+    ]
+    return results, lines
+
+
+def test_array_engine_matches_object_engine():
+    ram = Ram(1, 4)
+
+    for associativity in (util.DIRECTLY_MAPPED, util.FULLY_ASSOCIATIVE, "4-WAY"):
+        for strategy in ReplacementStrategy:
+            for policy in WritePolicy:
+                expected = run_random_operations(
+                    Cache(128, associativity, 4, strategy, policy), ram, 7
+                )
+                actual = run_random_operations(
+                    ArrayCache(128, associativity, 4, strategy, policy), ram, 7
+                )
+                assert actual == expected
+
+
+def test_tag_index_tracks_fills_and_evictions():
+    for cache_class in (Cache, ArrayCache):
+        cache = cache_class(64, util.FULLY_ASSOCIATIVE, 4)
+        ram = Ram(1, 4)
+
+        for i in range(cache.no_of_blocks):
+            cache.write_from_ram(i, ram.fetch_data(i))
+        cache.write_from_ram(3, ram.fetch_data(3))  # reload, no duplicate
+
+        assert len(cache.tag_index[0]) == cache.no_of_blocks
+        assert cache.search(3).get_tag() == 3
+
+        cache.write_from_ram(100, ram.fetch_data(100))
+        assert cache.search(100).get_tag() == 100
+        assert len(cache.tag_index[0]) == cache.no_of_blocks
+        for tag, way in cache.tag_index[0].items():
+            assert cache.get_block(0, way).get_tag() == tag
+
+
+def expected_victim(line, strategy):
+    if strategy == ReplacementStrategy.LEAST_FREQUENTLY_USED:
+        return line.index(min(line, key=lambda x: x.get_accessed_count()))
+    if strategy == ReplacementStrategy.LEAST_RECENTLY_USED:
+        return line.index(min(line, key=lambda x: x.get_access_time()))
+    if strategy == ReplacementStrategy.MOST_RECENTLY_USED:
+        return line.index(max(line, key=lambda x: x.get_access_time()))
+    return line.index(min(line, key=lambda x: x.get_fifo_place()))
+
+
+def test_replacement_policies_match_metadata_scan():
+    ram = Ram(1, 4)
+    # the policies of the original min/max scans over the block metadata
+    strategies = [
+        ReplacementStrategy.LEAST_RECENTLY_USED,
+        ReplacementStrategy.FIRST_IN_FIRST_OUT,
+        ReplacementStrategy.LEAST_FREQUENTLY_USED,
+        ReplacementStrategy.MOST_RECENTLY_USED,
+    ]
+
+    for cache_class in (Cache, ArrayCache):
+        for associativity in (util.FULLY_ASSOCIATIVE, "4-WAY"):
+            for strategy in strategies:
+                random.seed(11)
+                cache = cache_class(128, associativity, 4, strategy)
+
+                for i in range(3000):
+                    if i == 1500:
+                        # the policy is rebuilt from the block metadata
+                        cache.set_strategy(strategies[-1 - strategies.index(strategy)])
+                        cache.set_strategy(strategy)
+
+                    tag = random.randint(0, 3 * cache.no_of_blocks)
+                    index = tag % cache.no_of_cache_lines
+                    if cache.search(tag, index) is None:
+                        line = cache.cache_lines[index]
+                        full = None not in line
+                        if full:
+                            way = expected_victim(line, strategy)
+                        cache.write_from_ram(tag, ram.fetch_data(tag))
+                        if full:
+                            assert cache.cache_lines[index][way].get_tag() == tag
+                    if random.randint(0, 2):
+                        cache.read(cache.search(tag, index))
+
+
+def test_access_decodes_address_and_fills_misses():
+    ram = Ram(1, 4)
+
+    for cache_class in (Cache, ArrayCache):
+        cache = cache_class(128, "4-WAY", 4, ram=ram)
+
+        assert cache.decode_address(0x1235) == (0x48D, 0x48D % 8, 1)
+
+        hit, data = cache.access(0x1234, False)
+        assert not hit
+        assert data == ram.fetch_data(0x48D)
+
+        hit, data = cache.access(0x1237, True, bytes(4))
+        assert hit
+        assert cache.search(0x48D, 5).get_data() == bytes(4)
+
+        hit, data = cache.access(0x1234, False)
+        assert hit and data == bytes(4)
+
+
+def test_access_uses_the_block_offset():
+    ram = Ram(1, 16)
+
+    for cache_class in (Cache, ArrayCache):
+        cache = cache_class(256, "2-WAY", 16, ram=ram)
+        block = ram.fetch_data(0x123)
+
+        hit, data = cache.access(0x1235, False)
+        assert not hit and data == block[5:]
+
+        hit, data = cache.access(0x1235, False, size=2)
+        assert hit and data == block[5:7]
+
+        hit, data = cache.access(0x1236, True, b"xyz")
+        assert hit and data == b"xyz"
+        assert cache.access(0x1230, False)[1] == block[:6] + b"xyz" + block[9:]
+
+        # data as large as the block is the whole block, whatever the offset
+        hit, data = cache.access(0x1238, True, bytes(16))
+        assert data == bytes(16)
+        assert cache.search(0x123, 0x123 % 8).get_data() == bytes(16)
+
+        with pytest.raises(CacheError):
+            cache.access(0x123E, True, b"xyz")
+        with pytest.raises(CacheError):
+            cache.access(0x123E, False, size=3)
+
+
+def cache_state(cache):
+    return cache.global_access_time, [
+        [
+            (
+                None
+                if block is None
+                else (
+                    block.get_tag(),
+                    block.get_access_time(),
+                    block.get_accessed_count(),
+                    block.get_dirty_bit(),
+                    block.get_written(),
+                    bytes(block.get_data()),
+                )
+            )
+            for block in line
+        ]
+        for line in cache.cache_lines
+    ]
+
+
+def test_simulate_trace_matches_access():
+    random.seed(5)
+    addresses = [random.randint(0, 2047) for i in range(3000)]
+    ops = [random.randint(0, 1) for i in range(3000)]
+    # every strategy but RANDOM, whose victims are drawn in another order
+    strategies = [
+        strategy
+        for strategy in ReplacementStrategy
+        if strategy != ReplacementStrategy.RANDOM
+    ]
+
+    for cache_class in (Cache, ArrayCache):
+        for associativity in (util.DIRECTLY_MAPPED, util.FULLY_ASSOCIATIVE, "4-WAY"):
+            for strategy in strategies:
+                for policy in WritePolicy:
+                    caches = [
+                        cache_class(256, associativity, 4, strategy, policy, Ram(1, 4))
+                        for i in range(2)
+                    ]
+                    for cache in caches:  # warm up with blocks being written
+                        for address in range(0, 512, 12):
+                            if address % 3:
+                                cache.access(address, False)
+                            else:
+                                cache.access(address, True, bytes([address % 7]) * 4)
+
+                    expected = []
+                    for address, op in zip(addresses, ops):
+                        expected.append(caches[0].access(address, op)[0])
+
+                    hits, counters = caches[1].simulate_trace(addresses, ops)
+
+                    assert hits.tolist() == expected
+                    assert counters["hits"] == sum(expected)
+                    assert counters["writes"] == sum(ops)
+                    assert cache_state(caches[1]) == cache_state(caches[0])
+
+                    assert caches[1].stats.to_dict() == caches[0].stats.to_dict()
+
+                    rams = [cache.get_ram() for cache in caches]
+                    assert rams[1].get_traffic() == rams[0].get_traffic()
+                    for block_index in range(0, 128, 3):
+                        assert rams[1].fetch_data(block_index) == rams[0].fetch_data(
+                            block_index
+                        )
+
+
+def test_ram_blocks():
+    ram = Ram(1, 8, memo_size=2)
+
+    for block_index in (0, 5, 300, 5, 7, 0):
+        assert ram.fetch_data(block_index) == bytes(
+            (997 * block_index + 1009 * index) % 256 for index in range(8)
+        )
+    assert list(ram.memo) == [7, 0]
+
+
+def test_block_data_lives_in_the_data_store():
+    ram = Ram(1, 16)
+
+    for cache_class in (Cache, ArrayCache):
+        cache = cache_class(1024, "2-WAY", 16, ram=ram)
+        assert len(cache.data_store) == cache.capacity
+
+        hit, data = cache.access(0x40, False)
+        assert isinstance(data, memoryview) and data.obj is cache.data_store
+
+        cache.access(0x40, True, bytes(range(16)))
+        assert bytes(data) == bytes(range(16))
+        assert cache.read(cache.search(4, 4), 3) == 3
+
+
+def test_sparse_ram_backing_store():
+    ram = Ram(4096, 64)  # 4 GB, nothing allocated up front
+    cache = Cache(
+        256,
+        "2-WAY",
+        64,
+        ReplacementStrategy.LEAST_RECENTLY_USED,
+        WritePolicy.WRITE_BACK,
+        ram,
+    )
+
+    address = 3 << 30
+    cache.access(address, True, bytes(range(64)))
+    assert ram.get_traffic()["bytes_written"] == 0
+
+    # evict the dirty block: same line, two other tags
+    cache.access(address + 128, False)
+    cache.access(address + 256, False)
+
+    assert ram.fetch_data(address // 64) == bytes(range(64))
+    assert ram.fetch_data(address // 64 + 1) == ram.pattern_data(address // 64 + 1)
+    assert len(ram.materialized_pages) == 1
+    assert ram.get_traffic() == {
+        "read_transactions": 3,
+        "bytes_read": 192,
+        "write_transactions": 1,
+        "bytes_written": 64,
+    }
+
+    hit, data = cache.access(address, False)
+    assert not hit and bytes(data) == bytes(range(64))
+
+
+def test_stats_classify_misses():
+    ram = Ram(1, 16)
+    cache = Cache(
+        64, util.DIRECTLY_MAPPED, 16, write_policy=WritePolicy.WRITE_BACK, ram=ram
+    )
+
+    # blocks 0 and 4 share line 0 of the 4 line cache: conflict misses
+    for block_index in (0, 4, 0, 4, 1, 2, 3, 5, 6, 0):
+        cache.access(block_index * 16, block_index == 4)
+
+    stats = cache.stats.to_dict()
+    assert stats["hits"] == 0 and stats["misses"] == 10
+    assert stats["compulsory_misses"] == 7
+    assert stats["conflict_misses"] == 2
+    assert stats["capacity_misses"] == 1
+    assert stats["evictions"] == 6
+    assert stats["dirty_writebacks"] == 2
+    assert stats["lines"]["misses"] == [5, 2, 2, 1]
+    assert stats["ram_bytes_read"] == 160 and stats["ram_bytes_written"] == 32
+
+
+def test_blocks_outside_of_the_ram_fail_on_access():
+    for cache_class in (Cache, ArrayCache):
+        ram = Ram(1, 4)
+        cache = cache_class(
+            64,
+            util.DIRECTLY_MAPPED,
+            4,
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+            WritePolicy.WRITE_BACK,
+            ram,
+        )
+        cache.access(16, True, b"abcd")
+        stats = cache.stats.to_dict()
+        state = cache_state(cache)
+
+        # the block is past the end of the RAM but the address is valid
+        with pytest.raises(CacheError):
+            cache.access(1 << 22, True, b"wxyz")
+        with pytest.raises(CacheError):
+            cache.simulate_trace([0, 1 << 22])
+        assert cache.stats.to_dict() == stats
+        assert cache_state(cache) == state
+        assert ram.get_traffic()["read_transactions"] == 1
+
+        # the dirty block of line 4 is still written back by the next miss
+        cache.access(16 + 64, False)
+        assert ram.fetch_data(4) == b"abcd"
@@ -0,0 +1,137 @@
+import random
+
+import pytest
+
+from array_cache import ArrayCache
+from cache import Cache
+from cache import Ram
+from checkpoint import CHECKPOINT_PREFIX, load_checkpoint, save_checkpoint
+from util import CacheError, ReplacementStrategy, WritePolicy
+
+STRATEGIES = [
+    ReplacementStrategy.FIRST_IN_FIRST_OUT,
+    ReplacementStrategy.LEAST_RECENTLY_USED,
+    ReplacementStrategy.PSEUDO_LEAST_RECENTLY_USED,
+    ReplacementStrategy.STATIC_RRIP,
+    ReplacementStrategy.BIMODAL_RRIP,
+    ReplacementStrategy.ADAPTIVE_REPLACEMENT,
+]
+
+
+def make_trace(length, seed):
+    rng = random.Random(seed)
+    trace = []
+    for step in range(length):
+        address = rng.randrange(1 << 14) & ~3
+        if rng.random() < 0.3:
+            trace.append((address, True, rng.randbytes(4)))
+        else:
+            trace.append((address, False, None))
+    return trace
+
+
+def run(cache, trace):
+    for address, is_write, data in trace:
+        if is_write:
+            cache.access(address, True, data)
+        else:
+            cache.access(address, False)
+
+
+def block_state(cache):
+    state = []
+    for index in range(cache.no_of_cache_lines):
+        for way in range(cache.associated):
+            block = cache.get_block(index, way)
+            if block is not None:
+                state.append(
+                    (
+                        index,
+                        way,
+                        block.get_tag(),
+                        block.get_dirty_bit(),
+                        block.get_access_time(),
+                        bytes(block.get_data()),
+                    )
+                )
+    return state
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+@pytest.mark.parametrize("engine", [Cache, ArrayCache])
+def test_restored_cache_continues_like_the_original(tmp_path, strategy, engine):
+    trace = make_trace(4000, 7)
+    path = str(tmp_path / "warm.checkpoint")
+
+    original = engine(256, "4-WAY", 4, strategy, WritePolicy.WRITE_BACK, Ram(1, 4))
+    run(original, trace[:2000])
+    save_checkpoint(path, original)
+    run(original, trace[2000:])
+
+    cache, ram = load_checkpoint(path)
+    assert type(cache) is engine and cache.get_ram() is ram
+    run(cache, trace[2000:])
+
+    assert cache.stats.to_dict() == original.stats.to_dict()
+    assert block_state(cache) == block_state(original)
+    assert ram.get_traffic() == original.get_ram().get_traffic()
+    assert ram.materialized_pages
+    assert ram.materialized_pages == original.get_ram().materialized_pages
+    for block_index in range(1 << 12):
+        assert ram.fetch_data(block_index) == original.get_ram().fetch_data(block_index)
+
+
+def test_ram_pages_keep_the_page_size_they_were_saved_with(tmp_path):
+    path = str(tmp_path / "pages.checkpoint")
+    saved_ram = Ram(1, 64)
+    saved_ram.page_size = 3 * 64  # pages of another machine
+    for block_index in (0, 5, 7, 700):
+        saved_ram.store_data(block_index, bytes([block_index % 256]) * 64)
+    cache = Cache(256, "2-WAY", 64, ram=saved_ram)
+    save_checkpoint(path, cache)
+
+    cache, ram = load_checkpoint(path)
+    for block_index in range(saved_ram.index_count):
+        assert ram.fetch_data(block_index) == saved_ram.fetch_data(block_index)
+
+
+def test_loads_are_independent(tmp_path):
+    path = str(tmp_path / "warm.checkpoint")
+    original = Cache(
+        64,
+        "2-WAY",
+        4,
+        ReplacementStrategy.LEAST_RECENTLY_USED,
+        WritePolicy.WRITE_BACK,
+        Ram(1, 4),
+    )
+    run(original, make_trace(500, 3))
+    save_checkpoint(path, original)
+
+    first, first_ram = load_checkpoint(path)
+    second, second_ram = load_checkpoint(path)
+    run(first, make_trace(500, 4))
+
+    assert second.stats.to_dict() == original.stats.to_dict()
+    assert block_state(second) == block_state(original)
+    assert second_ram.get_traffic() == original.get_ram().get_traffic()
+
+
+def test_bad_checkpoints(tmp_path):
+    path = tmp_path / "bad.checkpoint"
+    path.write_bytes(b"not a checkpoint at all")
+    with pytest.raises(CacheError):
+        load_checkpoint(str(path))
+
+    path.write_bytes(b"")
+    with pytest.raises(CacheError):
+        load_checkpoint(str(path))
+
+    cache = Cache(32, "2-WAY", 4, ReplacementStrategy.LEAST_RECENTLY_USED)
+    save_checkpoint(str(path), cache)
+    contents = bytearray(path.read_bytes())
+    magic, version, header_length = CHECKPOINT_PREFIX.unpack_from(contents)
+    CHECKPOINT_PREFIX.pack_into(contents, 0, magic, version + 1, header_length)
+    path.write_bytes(bytes(contents))
+    with pytest.raises(CacheError):
+        load_checkpoint(str(path))
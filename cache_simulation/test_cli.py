@@ -0,0 +1,126 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import cli
+import traces
+from array_cache import ArrayCache
+from cache import Ram
+from util import ReplacementStrategy, WritePolicy
+
+
+def test_cli_replays_a_trace(tmp_path):
+    rng = np.random.default_rng(2)
+    addresses = rng.integers(0, 1 << 16, size=4000)
+    ops = rng.random(4000) < 0.3
+    trace = str(tmp_path / "run.trace")
+    traces.write_binary_trace(trace, [(addresses, ops)])
+    output = tmp_path / "stats.json"
+
+    cli.main(
+        [
+            "--trace",
+            trace,
+            "--capacity",
+            "1024",
+            "--associativity",
+            "4-WAY",
+            "--block-size",
+            "16",
+            "--strategy",
+            "FIRST_IN_FIRST_OUT",
+            "--output",
+            str(output),
+        ]
+    )
+    report = json.loads(output.read_text())
+
+    cache = ArrayCache(
+        1024,
+        "4-WAY",
+        16,
+        ReplacementStrategy.FIRST_IN_FIRST_OUT,
+        WritePolicy.WRITE_BACK,
+        Ram(4096, 16),
+    )
+    cache.simulate_trace(addresses, ops)
+
+    assert report["config"]["strategy"] == "FIRST_IN_FIRST_OUT"
+    assert report["input"] == {"trace": trace}
+    assert report["stats"] == cache.stats.to_dict(per_line=False)
+    assert report["ram"] == cache.get_ram().get_traffic()
+
+
+def test_cli_runs_a_seeded_workload(tmp_path, capsys):
+    argv = [
+        "--workload",
+        "all",
+        "--capacity",
+        "512",
+        "--associativity",
+        "2-WAY",
+        "--block-size",
+        "8",
+        "--seed",
+        "4",
+        "--engine",
+        "object",
+    ]
+    cli.main(argv)
+    first = json.loads(capsys.readouterr().out)
+    cli.main(argv)
+    second = json.loads(capsys.readouterr().out)
+
+    assert first == second
+    # every block read and written once, random operations on half of the
+    # blocks and one replacement per line
+    assert first["stats"]["accesses"] == 2 * 64 + 32 + 32
+    assert first["stats"]["evictions"] >= 32
+
+
+def test_cli_starts_without_qt():
+    code = "import sys, cli; print('PyQt5' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_cli_samples_a_trace(tmp_path, capsys):
+    rng = np.random.default_rng(4)
+    addresses = rng.integers(0, 1 << 16, size=20000)
+    trace = str(tmp_path / "run.trace")
+    traces.write_binary_trace(trace, [(addresses, np.zeros(20000, dtype=bool))])
+    arguments = [
+        "--trace",
+        trace,
+        "--capacity",
+        "1024",
+        "--associativity",
+        "2-WAY",
+        "--block-size",
+        "16",
+    ]
+
+    cli.main(arguments + ["--sampling", "sets", "--sampled-lines", "8", "--seed", "1"])
+    report = json.loads(capsys.readouterr().out)
+    estimate = report["estimate"]
+    assert report["input"]["sampling"] == "sets"
+    assert estimate["total_accesses"] == 20000
+    assert estimate["accesses"] == report["stats"]["accesses"] < 20000
+    assert estimate["miss_ratio_low"] <= estimate["miss_ratio"]
+    assert estimate["miss_ratio"] <= estimate["miss_ratio_high"]
+
+    cli.main(
+        arguments + ["--sampling", "intervals", "--period", "1000", "--interval", "100"]
+    )
+    estimate = json.loads(capsys.readouterr().out)["estimate"]
+    assert estimate["units"] == 20
+    assert estimate["simulated_accesses"] == 20000
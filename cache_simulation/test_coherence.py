@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+import traces
+from array_cache import ArrayCache
+from cache import Cache
+from cache import Ram
+from coherence import CoherentSystem
+from util import CacheError, CoherenceProtocol, ReplacementStrategy, WritePolicy
+
+
+def create_system(protocol, no_of_cores=2, engine=Cache):
+    caches = [
+        engine(
+            64,
+            "2-WAY",
+            16,
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+            WritePolicy.WRITE_BACK,
+        )
+        for core in range(no_of_cores)
+    ]
+    return CoherentSystem(caches, Ram(1, 16), protocol)
+
+
+@pytest.mark.parametrize("protocol", list(CoherenceProtocol))
+@pytest.mark.parametrize("engine", [Cache, ArrayCache])
+def test_cores_always_read_the_last_write(protocol, engine):
+    rng = random.Random(8)
+    system = create_system(protocol, 4, engine)
+    pristine = Ram(1, 16)
+    expected = {}
+
+    for step in range(5000):
+        core = rng.randrange(4)
+        tag = rng.randrange(24)
+        if rng.random() < 0.3:
+            data = rng.randbytes(16)
+            system.access(core, tag * 16, True, data)
+            expected[tag] = data
+        else:
+            hit, data = system.access(core, tag * 16, False)
+            assert bytes(data) == expected.get(tag, pristine.fetch_data(tag))
+
+        # one writable copy at most, and never next to other copies
+        holders = [states[tag] for states in system.states if tag in states]
+        if "M" in holders or "E" in holders:
+            assert len(holders) == 1
+        assert holders.count("O") <= 1
+
+    report = system.report()
+    assert sum(core["coherence_misses"] for core in report["cores"]) > 0
+    assert report["bus"]["upgrades"] > 0
+
+
+def test_mesi_and_moesi_transitions():
+    for protocol in CoherenceProtocol:
+        system = create_system(protocol)
+
+        system.access(0, 0x100, False)
+        assert system.states[0][0x10] == "E"
+        system.access(1, 0x100, False)
+        assert system.states[0][0x10] == system.states[1][0x10] == "S"
+
+        # upgrade: core 0 loses its copy
+        system.access(1, 0x104, True, None)
+        assert 0x10 not in system.states[0]
+        assert system.states[1][0x10] == "M"
+
+        # core 0 reads the word core 1 wrote: true sharing
+        system.access(0, 0x104, False)
+        writes_before = system.ram.write_transactions
+        if protocol == CoherenceProtocol.MESI:
+            assert system.states[1][0x10] == "S"
+            assert writes_before == 1
+        else:
+            assert system.states[1][0x10] == "O"
+            assert writes_before == 0
+
+        # core 1 writes word 0 again, core 0 reads word 3: false sharing
+        system.access(1, 0x100, True)
+        system.access(0, 0x10C, False)
+
+        report = system.report()
+        assert report["cores"][0]["coherence_misses"] == 2
+        assert report["cores"][0]["true_sharing_misses"] == 1
+        assert report["cores"][0]["false_sharing_misses"] == 1
+        assert report["cores"][0]["invalidations"] == 2
+        assert report["bus"]["upgrades"] == 2
+        assert report["bus"]["cache_to_cache_transfers"] == 2
+        assert report["false_sharing_hot_spots"][0]["block"] == 0x10
+
+
+def test_core_trace(tmp_path):
+    path = tmp_path / "threads.txt"
+    path.write_text("0 0 100\n1 1 104\n\n1 2 200\n0 0 10c\n")
+
+    chunks = list(traces.read_core_trace(str(path), chunk_size=3))
+    assert [len(cores) for cores, addresses, ops in chunks] == [3, 1]
+    cores, addresses, ops = chunks[0]
+    assert cores.tolist() == [0, 1, 1]
+    assert addresses.tolist() == [0x100, 0x104, 0x200]
+    assert ops.tolist() == [False, True, False]
+
+    system = create_system(CoherenceProtocol.MESI)
+    for cores, addresses, ops in chunks:
+        report = system.simulate_trace(cores, addresses, ops)
+    assert report["cores"][0]["false_sharing_misses"] == 1
+
+    with pytest.raises(CacheError):
+        system.simulate_trace([2], [0])
@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+from array_cache import ArrayCache
+from cache import Cache
+from cache import Ram
+from hierarchy import CacheHierarchy
+from util import CacheError, InclusionPolicy, ReplacementStrategy, WritePolicy
+
+
+def create_hierarchy(inclusion_policy, first_write_policy, engine=Cache):
+    levels = [
+        engine(
+            64, "2-WAY", 4, ReplacementStrategy.LEAST_RECENTLY_USED, first_write_policy
+        ),
+        engine(
+            256,
+            "4-WAY",
+            4,
+            ReplacementStrategy.FIRST_IN_FIRST_OUT,
+            WritePolicy.WRITE_BACK,
+        ),
+        engine(
+            1024,
+            "directly_mapped",
+            4,
+            ReplacementStrategy.RANDOM,
+            WritePolicy.WRITE_ONCE,
+        ),
+    ]
+    return CacheHierarchy(levels, Ram(1, 4), inclusion_policy)
+
+
+def cached_tags(cache):
+    return {tag for line_tags in cache.tag_index for tag in line_tags}
+
+
+@pytest.mark.parametrize("inclusion_policy", list(InclusionPolicy))
+@pytest.mark.parametrize("write_policy", list(WritePolicy))
+@pytest.mark.parametrize("engine", [Cache, ArrayCache])
+def test_hierarchy_keeps_data_and_inclusion(inclusion_policy, write_policy, engine):
+    random.seed(11)
+    hierarchy = create_hierarchy(inclusion_policy, write_policy, engine)
+    pristine = Ram(1, 4)
+    expected = {}
+
+    for step in range(4000):
+        tag = random.randrange(600)
+        if random.random() < 0.4:
+            data = random.randbytes(4)
+            hierarchy.access(tag * 4, True, data)
+            expected[tag] = data
+        else:
+            hit_level, data = hierarchy.access(tag * 4, False)
+            assert bytes(data) == expected.get(tag, pristine.fetch_data(tag))
+
+        l1, l2, l3 = [cached_tags(cache) for cache in hierarchy.levels]
+        if inclusion_policy == InclusionPolicy.INCLUSIVE:
+            assert l1 <= l2 <= l3
+        elif inclusion_policy == InclusionPolicy.EXCLUSIVE:
+            assert not l1 & l2 and not l1 & l3 and not l2 & l3
+
+    for tag in range(600):
+        hit_level, data = hierarchy.access(tag * 4, False)
+        assert bytes(data) == expected.get(tag, pristine.fetch_data(tag))
+
+    report = hierarchy.report()
+    assert [level["level"] for level in report["levels"]] == ["L1", "L2", "L3"]
+    if inclusion_policy == InclusionPolicy.INCLUSIVE:
+        assert report["levels"][0]["invalidations"] > 0
+
+
+def test_hierarchy_levels_see_the_misses_above():
+    hierarchy = create_hierarchy(InclusionPolicy.NON_INCLUSIVE, WritePolicy.WRITE_BACK)
+    rng = random.Random(2)
+    addresses = [rng.randrange(1 << 12) for i in range(5000)]
+    ops = [rng.random() < 0.3 for i in range(5000)]
+
+    report = hierarchy.simulate_trace(addresses, ops)
+    l1, l2, l3 = report["levels"]
+
+    assert l1["accesses"] == 5000
+    # every L1 miss reads L2, every dirty L1 eviction writes to it
+    assert l2["reads"] == l1["misses"] == l1["ram_reads"]
+    assert l2["writes"] == l1["dirty_writebacks"] == l1["ram_writes"]
+    assert l3["accesses"] == l2["ram_reads"] + l2["ram_writes"]
+    assert report["ram"]["read_transactions"] == l3["ram_reads"]
+
+
+def test_single_level_hierarchy_matches_the_cache():
+    rng = random.Random(4)
+    addresses = [rng.randrange(1 << 11) for i in range(3000)]
+    ops = [rng.random() < 0.3 for i in range(3000)]
+
+    cache = Cache(
+        128,
+        "4-WAY",
+        4,
+        ReplacementStrategy.LEAST_RECENTLY_USED,
+        WritePolicy.WRITE_BACK,
+        Ram(1, 4),
+    )
+    for address, is_write in zip(addresses, ops):
+        cache.access(address, is_write)
+
+    level = Cache(
+        128, "4-WAY", 4, ReplacementStrategy.LEAST_RECENTLY_USED, WritePolicy.WRITE_BACK
+    )
+    hierarchy = CacheHierarchy([level], Ram(1, 4), InclusionPolicy.INCLUSIVE)
+    report = hierarchy.simulate_trace(addresses, ops)
+
+    assert report["levels"][0] == {**cache.stats.to_dict(per_line=False), "level": "L1"}
+    assert report["ram"] == cache.get_ram().get_traffic()
+
+
+def test_hierarchy_needs_one_block_size():
+    with pytest.raises(CacheError):
+        CacheHierarchy([Cache(64, "2-WAY", 4), Cache(256, "2-WAY", 8)], Ram(1, 4))
+
+
+def test_levels_refuse_to_replay_a_trace_alone():
+    hierarchy = create_hierarchy(InclusionPolicy.INCLUSIVE, WritePolicy.WRITE_BACK)
+    hierarchy.simulate_trace([0, 64, 128], [True, False, True])
+
+    for cache in hierarchy.levels:
+        stats = cache.stats.to_dict()
+        tags = cached_tags(cache)
+        with pytest.raises(CacheError):
+            cache.simulate_trace([4, 512, 1024], [True, False, True])
+        assert cache.stats.to_dict() == stats
+        assert cached_tags(cache) == tags
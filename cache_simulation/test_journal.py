@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import util
+from controller import Controller
+from journal import CacheJournal
+from util import ReplacementStrategy, WritePolicy
+
+
+@pytest.mark.parametrize(
+    "associativity, strategy, write_policy",
+    [
+        (util.DIRECTLY_MAPPED, ReplacementStrategy.RANDOM, WritePolicy.WRITE_BACK),
+        ("4-WAY", ReplacementStrategy.FIRST_IN_FIRST_OUT, WritePolicy.WRITE_ONCE),
+        (
+            util.FULLY_ASSOCIATIVE,
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+            WritePolicy.WRITE_THROUGH,
+        ),
+    ],
+)
+def test_journal_rebuilds_every_record(associativity, strategy, write_policy):
+    random.seed(5)
+    controller = Controller()
+    controller.create_cache(256, associativity, 4, strategy, write_policy)
+    controller.create_ram(1, 4)
+    controller.fill_cache()
+    # small interval, so records are rebuilt across several checkpoints
+    controller.cache_records.checkpoint_interval = 7
+
+    # a full copy of the table after every operation, like the old records
+    snapshots = [controller.fetch_cache_data()]
+    record_operation = controller.record_operation
+
+    def record_and_snapshot(*args):
+        operation = record_operation(*args)
+        snapshots.append(controller.fetch_cache_data())
+        return operation
+
+    controller.record_operation = record_and_snapshot
+    controller.read_and_write_all_blocks_once()
+    controller.read_and_write_blocks_randomly()
+    controller.replace_blocks()
+
+    assert len(controller.cache_records) == len(snapshots)
+    order = list(range(len(snapshots)))
+    random.shuffle(order)
+    for record_number in list(range(len(snapshots))) + order:
+        assert controller.fetch_cache_record(record_number) == snapshots[record_number]
+
+
+def test_journal_deltas_and_checkpoints():
+    rows = [[0, b"\x00", 1, b"\x01"], [2, b"\x02", 3, b"\x03"]]
+    journal = CacheJournal(["Tag 0", "Data 0", "Tag 1", "Data 1"], rows, 2, 3)
+
+    tables = [[list(row) for row in rows]]
+    for step in range(1, 11):
+        index, way = step % 2, step % 3 % 2
+        cells = [10 + step, bytes([step])]
+        tables.append([list(row) for row in tables[-1]])
+        tables[-1][index][way * 2 : way * 2 + 2] = cells
+        journal.record([(index, way, cells)], lambda: tables[-1])
+
+    assert len(journal) == 11
+    assert len(journal.checkpoints) == 4
+    for record_number in [10, 0, 4, 5, 6, 2, 9, 9, 1]:
+        assert journal.rows_at(record_number) == tables[record_number]
+
+    # rebuilt tables are copies
+    journal.rows_at(4)[0][0] = None
+    assert journal.rows_at(4) == tables[4]
+
+    with pytest.raises(util.CacheError):
+        journal.rows_at(11)
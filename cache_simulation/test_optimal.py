@@ -0,0 +1,121 @@
+import random
+
+import numpy as np
+import pytest
+
+import traces
+import util
+from cache import Cache
+from optimal import OptimalCache, compare_to_optimal, next_use_index, optimal_trace
+from util import CacheError
+
+
+def brute_force_misses(blocks, no_of_lines, ways):
+    # evicts the block used furthest ahead by scanning the rest of the trace
+    lines = [[] for x in range(no_of_lines)]
+    misses = 0
+    for position, block in enumerate(blocks):
+        line = lines[block % no_of_lines]
+        if block in line:
+            continue
+        misses += 1
+        if len(line) == ways:
+            rest = blocks[position + 1 :]
+            line.remove(
+                max(
+                    line,
+                    key=lambda cached: (
+                        rest.index(cached) if cached in rest else len(rest)
+                    ),
+                )
+            )
+        line.append(block)
+    return misses
+
+
+def test_next_use_index():
+    blocks = [1, 2, 1, 3, 2, 1]
+    assert list(next_use_index(blocks)) == [2, 4, 5, 6 + 3, 6 + 4, 6 + 5]
+
+
+def test_textbook_reference_string():
+    pages = [7, 0, 1, 2, 0, 3, 0, 4, 2, 3, 0, 3, 2, 1, 2, 0, 1, 7, 0, 1]
+    cache = OptimalCache(16, util.FULLY_ASSOCIATIVE, 4)
+    report = cache.simulate([page * 4 for page in pages])
+    assert report["misses"] == 8
+    assert report["evictions"] == 4
+
+
+@pytest.mark.parametrize(
+    "associativity, lines", [(util.FULLY_ASSOCIATIVE, 1), ("4-WAY", 4), ("2-WAY", 8)]
+)
+def test_optimal_matches_brute_force(associativity, lines):
+    rng = random.Random(3)
+    blocks = [rng.randrange(60) for i in range(3000)]
+    cache = OptimalCache(256, associativity, 16)
+    assert cache.no_of_cache_lines == lines
+
+    report = cache.simulate([block * 16 for block in blocks])
+    assert report["misses"] == brute_force_misses(blocks, lines, 16 // lines)
+
+
+@pytest.mark.parametrize(
+    "capacity, associativity, block_size",
+    [
+        (256, "16-WAY", 16),
+        (256, "8-WAY", 16),
+        (256, "3-WAY", 16),
+        (256, util.FULLY_ASSOCIATIVE, 16),
+        (256, util.DIRECTLY_MAPPED, 16),
+        (256, "4-WAY", 12),
+        (96, "2-WAY", 16),
+        (256, "1-WAY", 16),
+    ],
+)
+def test_optimal_accepts_the_geometries_of_cache(capacity, associativity, block_size):
+    try:
+        cache = Cache(capacity, associativity, block_size)
+    except CacheError:
+        with pytest.raises(CacheError):
+            OptimalCache(capacity, associativity, block_size)
+        return
+
+    optimal = OptimalCache(capacity, associativity, block_size)
+    assert optimal.no_of_cache_lines == cache.no_of_cache_lines
+    assert optimal.associated == cache.associated
+
+
+def test_no_strategy_beats_optimal():
+    rng = np.random.default_rng(5)
+    addresses = np.where(
+        rng.random(20000) < 0.8,
+        rng.integers(0, 1 << 11, size=20000),
+        rng.integers(0, 1 << 15, size=20000),
+    )
+    ops = rng.random(20000) < 0.3
+
+    for associativity in (util.DIRECTLY_MAPPED, "4-WAY", util.FULLY_ASSOCIATIVE):
+        rows = compare_to_optimal(addresses, ops, 1024, associativity, 16)
+        optimal = rows[0]
+        assert optimal["strategy"] == "OPTIMAL"
+        assert len(rows) == 1 + len(util.ReplacementStrategy)
+
+        for row in rows[1:]:
+            assert row["misses"] >= optimal["misses"]
+            assert 0.0 <= row["excess_misses"] < 1.0
+            if associativity == util.DIRECTLY_MAPPED:
+                # a single way leaves nothing to choose
+                assert row["misses"] == optimal["misses"]
+                assert row["dirty_writebacks"] == optimal["dirty_writebacks"]
+
+
+def test_optimal_trace_file(tmp_path):
+    rng = np.random.default_rng(9)
+    addresses = rng.integers(0, 1 << 14, size=5000)
+    ops = rng.random(5000) < 0.5
+    path = str(tmp_path / "run.trace")
+    traces.write_binary_trace(path, [(addresses, ops)])
+
+    report = optimal_trace(path, 512, "4-WAY", 16, chunk_size=1000)
+    assert report == OptimalCache(512, "4-WAY", 16).simulate(addresses, ops)
+    assert report["dirty_writebacks"] > 0
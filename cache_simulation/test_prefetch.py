@@ -0,0 +1,202 @@
+import random
+
+import pytest
+
+from cache import Cache
+from cache import Ram
+import util
+from prefetch import NextLinePrefetcher, Prefetcher, StreamPrefetcher, StridePrefetcher
+from util import ReplacementStrategy, WritePolicy
+
+
+def create_cache(prefetcher=None, capacity=256):
+    cache = Cache(
+        capacity,
+        "4-WAY",
+        16,
+        ReplacementStrategy.LEAST_RECENTLY_USED,
+        WritePolicy.WRITE_BACK,
+        Ram(1, 16),
+    )
+    cache.set_prefetcher(prefetcher)
+    return cache
+
+
+@pytest.mark.parametrize(
+    "prefetcher",
+    [NextLinePrefetcher(), StridePrefetcher(), StreamPrefetcher()],
+    ids=["next_line", "stride", "stream"],
+)
+def test_prefetchers_cover_a_sequential_stream(prefetcher):
+    addresses = range(0, 16 * 2000, 4)
+
+    baseline = create_cache()
+    for address in addresses:
+        baseline.access(address, False)
+
+    cache = create_cache(prefetcher)
+    for address in addresses:
+        cache.access(address, False)
+
+    stats = cache.stats.to_dict(per_line=False)
+    assert stats["misses"] < baseline.stats.misses / 20
+    assert stats["prefetch_accuracy"] > 0.95
+    assert stats["prefetch_coverage"] > 0.95
+    assert stats["useful_prefetches"] + stats["useless_prefetches"] <= (
+        stats["prefetches"]
+    )
+
+
+def test_random_trace_shows_pollution():
+    rng = random.Random(3)
+    addresses = [rng.randrange(1 << 12) for i in range(5000)]
+
+    cache = create_cache(NextLinePrefetcher(degree=2))
+    for address in addresses:
+        cache.access(address, False)
+
+    stats = cache.stats
+    assert stats.prefetches > 0
+    assert stats.pollution_misses > 0
+    assert stats.useless_prefetches > stats.useful_prefetches
+    assert stats.prefetch_accuracy() < 0.5
+
+
+def test_simulate_trace_with_prefetcher_matches_access():
+    rng = random.Random(5)
+    addresses = []
+    for run in range(200):
+        start = rng.randrange(1 << 14)
+        addresses.extend(start + 8 * step for step in range(rng.randrange(1, 20)))
+    ops = [rng.random() < 0.3 for address in addresses]
+
+    cache = create_cache(StreamPrefetcher())
+    for address, is_write in zip(addresses, ops):
+        cache.access(address, is_write)
+
+    replayed = create_cache(StreamPrefetcher())
+    hits, counters = replayed.simulate_trace(addresses, ops)
+
+    assert replayed.stats.to_dict() == cache.stats.to_dict()
+    assert counters["misses"] == cache.stats.misses
+    assert counters["evictions"] == cache.stats.evictions
+    assert replayed.get_ram().get_traffic() == cache.get_ram().get_traffic()
+
+
+def test_simulate_trace_classifies_repeats_evicted_by_a_prefetch():
+    # the stride prefetch issued by the first access to a block evicts it
+    # before the repeated access, so the repeat misses too
+    addresses = [16 * block for block in (0, 4, 8, 8, 12, 16, 16, 20, 24, 24)]
+
+    def create_small_cache():
+        cache = Cache(
+            64,
+            util.DIRECTLY_MAPPED,
+            16,
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+            WritePolicy.WRITE_BACK,
+            Ram(1, 16),
+        )
+        cache.set_prefetcher(StridePrefetcher(threshold=1))
+        return cache
+
+    cache = create_small_cache()
+    for address in addresses:
+        cache.access(address, False)
+
+    replayed = create_small_cache()
+    replayed.simulate_trace(addresses)
+
+    stats = replayed.stats.to_dict(per_line=False)
+    assert stats == cache.stats.to_dict(per_line=False)
+    assert stats["misses"] == (
+        stats["compulsory_misses"] + stats["capacity_misses"] + stats["conflict_misses"]
+    )
+
+
+def test_stride_prefetcher_tracks_each_pc():
+    prefetcher = StridePrefetcher(degree=2)
+    cache = create_cache(prefetcher, capacity=1024)
+
+    # two loops interleaved: one walks forward 3 blocks at a time, the other
+    # backwards 5 blocks at a time, far apart
+    for step in range(100):
+        cache.access((1000 + 3 * step) * 16, False, pc=0x40)
+        cache.access((3000 - 5 * step) * 16, False, pc=0x80)
+
+    assert prefetcher.table[0x40][1] == 3
+    assert prefetcher.table[0x80][1] == -5
+    # only the three accesses per pc until its stride was seen twice miss
+    assert cache.stats.misses == 2 * 3
+    assert cache.stats.prefetch_accuracy() > 0.95
+
+
+def test_no_prefetch_past_the_ram():
+    cache = create_cache(NextLinePrefetcher(degree=2))
+    last_block = cache.get_ram().index_count - 1
+
+    cache.access(last_block * 16, False)
+    assert cache.stats.prefetches == 0
+    cache.access((last_block - 1) * 16, False)
+    assert cache.stats.prefetches == 0  # the next block is already cached
+
+
+@pytest.mark.parametrize(
+    "prefetcher",
+    [StridePrefetcher(threshold=1), StreamPrefetcher()],
+    ids=["stride", "stream"],
+)
+@pytest.mark.parametrize(
+    "strategy",
+    [ReplacementStrategy.FIRST_IN_FIRST_OUT, ReplacementStrategy.MOST_RECENTLY_USED],
+)
+def test_access_returns_the_accessed_data_despite_prefetches(prefetcher, strategy):
+    cache = Cache(128, "2-WAY", 16, strategy, WritePolicy.WRITE_BACK, Ram(1, 16))
+    cache.set_prefetcher(prefetcher)
+    rng = random.Random(9)
+    written = {}
+
+    for step in range(3000):
+        block = rng.randrange(64)
+        if rng.random() < 0.5:
+            data = rng.randbytes(16)
+            hit, returned = cache.access(block * 16, True, data)
+            written[block] = data
+        else:
+            hit, returned = cache.access(block * 16, False)
+        expected = written.get(block, cache.get_ram().fetch_data(block))
+        assert bytes(returned) == expected
+
+
+class ScriptedPrefetcher(Prefetcher):
+    # prefetches block 5 on the first access to block 2
+    def on_access(self, block_index, hit, pc=None, prefetch_hit=False):
+        return [5] if block_index == 2 and not hit else []
+
+
+@pytest.mark.parametrize("fate", ["unused", "used", "evicted"])
+def test_pollution_only_while_the_prefetched_block_is_unused(fate):
+    # one line of two ways: block 2 replaces block 0, the prefetch of block
+    # 5 replaces block 1
+    cache = Cache(
+        32,
+        util.FULLY_ASSOCIATIVE,
+        16,
+        ReplacementStrategy.LEAST_RECENTLY_USED,
+        ram=Ram(1, 16),
+    )
+    cache.set_prefetcher(ScriptedPrefetcher())
+    for block in (0, 1, 2):
+        cache.access(block * 16, False)
+    assert set(cache.tag_index[0]) == {2, 5}
+
+    if fate == "used":
+        cache.access(5 * 16, False)
+    elif fate == "evicted":
+        cache.access(2 * 16, False)
+        cache.access(7 * 16, False)  # replaces block 5, never used
+        assert 5 not in cache.tag_index[0]
+
+    cache.access(1 * 16, False)
+    assert cache.stats.pollution_misses == (1 if fate == "unused" else 0)
+    assert not cache.prefetch_victims
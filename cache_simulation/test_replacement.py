@@ -0,0 +1,202 @@
+import random
+
+import pytest
+
+import replacement
+import util
+from array_cache import ArrayCache
+from cache import Cache
+from cache import Ram
+from replacement import (
+    LeastRecentlyUsedPolicy,
+    PseudoLeastRecentlyUsedPolicy,
+    register_policy,
+)
+from util import CacheError, ReplacementStrategy
+
+NEW_STRATEGIES = [
+    ReplacementStrategy.PSEUDO_LEAST_RECENTLY_USED,
+    ReplacementStrategy.STATIC_RRIP,
+    ReplacementStrategy.BIMODAL_RRIP,
+    ReplacementStrategy.ADAPTIVE_REPLACEMENT,
+]
+
+
+def line_hits(strategy, tags):
+    # every tag maps to line 0, of four ways
+    cache = Cache(32, "4-WAY", 4, strategy, ram=Ram(1, 4))
+    hits = 0
+    for tag in tags:
+        hit, data = cache.access(tag * 4 * cache.no_of_cache_lines, False)
+        hits += hit
+    return hits
+
+
+def test_tree_plru_victims():
+    policy = PseudoLeastRecentlyUsedPolicy(1, 4)
+    for way in (0, 1, 2, 3):
+        policy.fill(0, way)
+    assert policy.victim(0) == 0
+
+    # true LRU would pick way 1, the tree only remembers that the left half
+    # was used last and that way 2 is older than way 3
+    policy.access(0, 0)
+    assert policy.victim(0) == 2
+
+    # two ways: the tree is a single bit, exactly LRU
+    plru = PseudoLeastRecentlyUsedPolicy(1, 2)
+    lru = LeastRecentlyUsedPolicy(1, 2)
+    rng = random.Random(1)
+    for way in (0, 1):
+        plru.fill(0, way)
+        lru.fill(0, way)
+    for step in range(200):
+        way = rng.randrange(2)
+        plru.access(0, way)
+        lru.access(0, way)
+        assert plru.victim(0) == lru.victim(0)
+
+
+@pytest.mark.parametrize("associated", [3, 6, 64, 100])
+def test_tree_plru_never_picks_a_missing_or_last_used_way(associated):
+    policy = PseudoLeastRecentlyUsedPolicy(2, associated)
+    rng = random.Random(associated)
+    for way in range(associated):
+        policy.fill(1, way)
+
+    for step in range(1000):
+        way = rng.randrange(associated)
+        policy.access(1, way)
+        victim = policy.victim(1)
+        assert 0 <= victim < associated and victim != way
+    assert policy.bits[0] == 0
+
+
+def test_rrip_keeps_the_working_set_through_scans():
+    # three hot blocks re-used between scans of blocks used only once
+    rng = random.Random(2)
+    tags = []
+    scan = 100
+    for round in range(200):
+        tags.extend([0, 1, 2] * 2)
+        tags.extend(range(scan, scan + rng.randrange(1, 4)))
+        scan += 4
+
+    lru = line_hits(ReplacementStrategy.LEAST_RECENTLY_USED, tags)
+    srrip = line_hits(ReplacementStrategy.STATIC_RRIP, tags)
+    arc = line_hits(ReplacementStrategy.ADAPTIVE_REPLACEMENT, tags)
+    assert srrip > lru
+    assert arc > lru
+
+
+def test_arc_drops_the_t1_victim_when_t1_fills_the_line():
+    cache = Cache(
+        32, "4-WAY", 4, ReplacementStrategy.ADAPTIVE_REPLACEMENT, ram=Ram(1, 4)
+    )
+    line_tags = [tag * cache.no_of_cache_lines for tag in range(5)]
+    for tag in line_tags:
+        cache.access(tag * 4, False)
+
+    # blocks used once fill T1, so the first of them leaves no ghost in B1
+    t1, t2, b1, b2 = cache.policy.line_state(0)
+    assert sorted(t1.values()) == line_tags[1:]
+    assert not b1
+
+    # and coming back is a plain miss, which does not move the target
+    hit, data = cache.access(line_tags[0] * 4, False)
+    assert not hit
+    assert cache.policy.targets[0] == 0
+    assert sorted(t1.values()) == sorted(line_tags[2:] + line_tags[:1])
+    assert not b1
+
+    # a block used again leaves T1, whose victims are then kept as ghosts
+    cache.access(line_tags[2] * 4, False)
+    cache.access(line_tags[1] * 4, False)
+    assert list(b1) == [line_tags[3]]
+
+    rng = random.Random(6)
+    for step in range(5000):
+        cache.access(rng.randrange(12) * cache.no_of_cache_lines * 4, False)
+        assert len(t1) + len(b1) <= cache.associated
+        assert len(t1) + len(t2) + len(b1) + len(b2) <= 2 * cache.associated
+
+
+def test_brrip_resists_thrashing():
+    # a loop over six blocks in a line of four: LRU always evicts the block
+    # needed next
+    tags = list(range(6)) * 200
+    assert line_hits(ReplacementStrategy.LEAST_RECENTLY_USED, tags) == 0
+    assert line_hits(ReplacementStrategy.BIMODAL_RRIP, tags) > len(tags) // 4
+
+
+@pytest.mark.parametrize("strategy", NEW_STRATEGIES)
+@pytest.mark.parametrize("engine", [Cache, ArrayCache])
+@pytest.mark.parametrize("associativity", [util.FULLY_ASSOCIATIVE, "4-WAY", "3-WAY"])
+def test_new_policies_keep_the_cache_consistent(strategy, engine, associativity):
+    ram = Ram(1, 4)
+    cache = engine(128, associativity, 4, strategy, ram=ram)
+    rng = random.Random(5)
+    expected = {}
+
+    for step in range(3000):
+        if step == 1500:
+            # the policy is rebuilt from the block metadata
+            cache.set_strategy(ReplacementStrategy.LEAST_RECENTLY_USED)
+            cache.set_strategy(strategy)
+
+        tag = rng.randrange(4 * cache.no_of_blocks)
+        if rng.random() < 0.3:
+            data = rng.randbytes(4)
+            cache.access(tag * 4, True, data)
+            expected[tag] = data
+        else:
+            hit, data = cache.access(tag * 4, False)
+            assert bytes(data) == expected.get(tag, ram.fetch_data(tag))
+
+    for index, line_tags in enumerate(cache.tag_index):
+        assert len(line_tags) <= cache.associated
+        for tag, way in line_tags.items():
+            assert cache.get_block(index, way).get_tag() == tag
+    assert cache.stats.hits > 0
+
+
+def test_register_policy(monkeypatch):
+    class KeepFirstPolicy(LeastRecentlyUsedPolicy):
+        def victim(self, index):
+            return self.associated - 1
+
+    # registered on a copy, so the policy does not outlive the test
+    monkeypatch.setattr(replacement, "POLICIES", dict(replacement.POLICIES))
+    register_policy("KEEP_FIRST", KeepFirstPolicy)
+    cache = Cache(32, "4-WAY", 4, "KEEP_FIRST", ram=Ram(1, 4))
+    for tag in range(0, 20, 2):
+        cache.access(tag * 4, False)
+    assert set(cache.tag_index[0]) == {0, 2, 4, 18}
+
+    with pytest.raises(CacheError):
+        register_policy("NOT_A_POLICY", object)
+
+
+@pytest.mark.parametrize("engine", [Cache, ArrayCache])
+def test_fifo_refills_after_an_invalidation(engine):
+    # tags 0, 2, 4, 6 all map to line 0 of a 2-way cache
+    cache = engine(
+        16, "2-WAY", 4, ReplacementStrategy.FIRST_IN_FIRST_OUT, ram=Ram(1, 4)
+    )
+    for tag in (0, 2):
+        cache.access(tag * 4, False)
+    cache.invalidate(0)
+
+    # the refilled hole is the youngest block, so the next victim is 2
+    cache.access(4 * 4, False)
+    cache.access(6 * 4, False)
+    assert set(cache.tag_index[0]) == {4, 6}
+
+    places = [cache.get_block(0, way).get_fifo_place() for way in (0, 1)]
+    assert len(set(places)) == 2
+    assert cache.get_block(0, cache.tag_index[0][6]).get_fifo_place() == max(places)
+
+    # the order survives a rebuild of the policy from the block metadata
+    cache.set_strategy(ReplacementStrategy.FIRST_IN_FIRST_OUT)
+    cache.access(8 * 4, False)
+    assert set(cache.tag_index[0]) == {6, 8}
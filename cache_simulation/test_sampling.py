@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+import traces
+import util
+from array_cache import ArrayCache
+from cache import Cache
+from prefetch import NextLinePrefetcher
+from sampling import interval_sampling, sample_trace, set_sampling
+from util import CacheError, ReplacementStrategy, WritePolicy
+
+
+def make_trace(length, seed):
+    rng = np.random.default_rng(seed)
+    # a hot region, a cold one and a working set that moves along the trace
+    hot = rng.integers(0, 1 << 14, size=length)
+    cold = rng.integers(0, 1 << 20, size=length)
+    phase = (np.arange(length) // 20000) << 13
+    moving = phase + rng.integers(0, 1 << 13, size=length)
+    choice = rng.random(length)
+    addresses = np.where(choice < 0.5, hot, np.where(choice < 0.8, moving, cold))
+    return addresses, rng.random(length) < 0.3
+
+
+def make_cache(strategy=ReplacementStrategy.LEAST_RECENTLY_USED):
+    return ArrayCache(8192, "4-WAY", 16, strategy, WritePolicy.WRITE_BACK)
+
+
+def chunks(addresses, ops, chunk_size=30000):
+    for start in range(0, len(addresses), chunk_size):
+        yield addresses[start : start + chunk_size], ops[start : start + chunk_size]
+
+
+@pytest.mark.parametrize(
+    "strategy",
+    [ReplacementStrategy.LEAST_RECENTLY_USED, ReplacementStrategy.STATIC_RRIP],
+)
+def test_estimates_match_full_simulation(strategy):
+    addresses, ops = make_trace(300000, 4)
+    full = make_cache(strategy)
+    hits, counters = full.simulate_trace(addresses, ops)
+    miss_ratio = counters["misses"] / counters["accesses"]
+
+    by_sets = set_sampling(make_cache(strategy), chunks(addresses, ops), 32, seed=1)
+    by_intervals = interval_sampling(
+        make_cache(strategy), chunks(addresses, ops), 5000, 500, warmup=1500
+    )
+
+    for estimate in (by_sets, by_intervals):
+        assert estimate["total_accesses"] == len(addresses)
+        assert estimate["simulated_accesses"] < len(addresses) / 2
+        assert estimate["miss_ratio_low"] <= miss_ratio <= estimate["miss_ratio_high"]
+        assert abs(estimate["miss_ratio"] - miss_ratio) < 0.01
+        assert estimate["standard_error"] > 0
+
+
+def test_full_samples_are_exact():
+    addresses, ops = make_trace(50000, 6)
+    hits, counters = make_cache().simulate_trace(addresses, ops)
+
+    every_line = set_sampling(make_cache(), chunks(addresses, ops), 128)
+    # warmed on the whole period: the cache sees the full trace
+    warmed = interval_sampling(make_cache(), chunks(addresses, ops, 7000), 1000, 300)
+
+    assert every_line["misses"] == counters["misses"]
+    assert every_line["miss_ratio_low"] == every_line["miss_ratio_high"]
+    assert warmed["simulated_accesses"] == len(addresses)
+    assert warmed["misses"] == np.count_nonzero(~hits.reshape(50, 1000)[:, 700:])
+
+    # measuring every access, the intervals add up to the whole trace even
+    # when the last one is cut short
+    everything = interval_sampling(
+        make_cache(), chunks(addresses[:49900], ops[:49900]), 1000, 1000
+    )
+    assert everything["units"] == 50
+    assert everything["accesses"] == 49900
+
+
+def test_sample_trace_file(tmp_path):
+    addresses, ops = make_trace(40000, 8)
+    path = str(tmp_path / "run.trace")
+    traces.write_binary_trace(path, [(addresses, ops)])
+
+    estimate = sample_trace(
+        Cache(8192, "4-WAY", 16, ReplacementStrategy.LEAST_RECENTLY_USED),
+        path,
+        util.SET_SAMPLING,
+        chunk_size=10000,
+        no_of_sampled_lines=16,
+        seed=3,
+    )
+    expected = set_sampling(make_cache(), chunks(addresses, ops), 16, seed=3)
+    assert estimate == expected
+
+
+def test_invalid_sampling():
+    addresses, ops = make_trace(1000, 1)
+    with pytest.raises(CacheError):
+        set_sampling(make_cache(), chunks(addresses, ops), 129)
+    with pytest.raises(CacheError):
+        interval_sampling(make_cache(), chunks(addresses, ops), 100, 60, warmup=50)
+
+    cache = make_cache()
+    cache.set_prefetcher(NextLinePrefetcher())
+    with pytest.raises(CacheError):
+        set_sampling(cache, chunks(addresses, ops), 8)
@@ -0,0 +1,60 @@
+import pytest
+
+from util import ReplacementStrategy, WritePolicy
+
+pytest.importorskip("PyQt5")
+from controller import Controller
+from simulation_worker import SimulationWorker
+
+
+def create_controller():
+    controller = Controller()
+    controller.create_cache(
+        1024,
+        "4-WAY",
+        4,
+        ReplacementStrategy.LEAST_RECENTLY_USED,
+        WritePolicy.WRITE_BACK,
+    )
+    controller.create_ram(1, 4)
+    controller.fill_cache()
+    return controller
+
+
+def run_worker(worker):
+    batches = []
+    progress = []
+    finished = []
+    worker.operations_ready.connect(batches.append)
+    worker.progress.connect(lambda done, total: progress.append((done, total)))
+    worker.finished.connect(finished.append)
+    worker.run()
+    return batches, progress, finished
+
+
+def test_worker_streams_every_operation():
+    controller = create_controller()
+    worker = SimulationWorker(controller, batch_interval=0)
+
+    batches, progress, finished = run_worker(worker)
+
+    operations = [operation for batch in batches for operation in batch]
+    total = 2 * 256 + 128 + 64
+    assert len(operations) == total
+    assert len(batches) > 1
+    assert progress[-1] == (total, total)
+    assert finished == [False]
+    assert len(controller.cache_records) == total + 1
+    assert operations[0][0].startswith("read")
+
+
+def test_worker_cancel_stops_the_run():
+    controller = create_controller()
+    worker = SimulationWorker(controller, batch_interval=0)
+    worker.operations_ready.connect(lambda batch: worker.cancel())
+
+    batches, progress, finished = run_worker(worker)
+
+    assert finished == [True]
+    assert sum(len(batch) for batch in batches) == progress[-1][0] < 100
+    assert len(controller.cache_records) == progress[-1][0] + 1
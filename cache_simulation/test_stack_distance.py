@@ -0,0 +1,50 @@
+import numpy as np
+
+import util
+from array_cache import ArrayCache
+from stack_distance import LruStack, StackDistanceAnalyzer
+from util import ReplacementStrategy
+
+
+def test_stack_distances():
+    stack = LruStack(initial_size=4)  # small, so it gets compacted
+    distances = [stack.access(block) for block in [1, 2, 3, 1, 1, 4, 2, 3, 3, 1]]
+    assert distances == [None, None, None, 2, 0, None, 3, 3, 0, 3]
+
+
+def test_hit_ratios_match_lru_caches():
+    rng = np.random.default_rng(8)
+    # a hot region and a cold one, so the curve has some shape
+    addresses = np.where(
+        rng.random(20000) < 0.7,
+        rng.integers(0, 1 << 11, size=20000),
+        rng.integers(0, 1 << 15, size=20000),
+    )
+
+    analyzer = StackDistanceAnalyzer(16)
+    analyzer.process(addresses[:5000])
+    analyzer.process(addresses[5000:])
+    curve = analyzer.miss_ratio_curve(256)
+
+    for blocks in (1, 8, 64, 256):
+        cache = ArrayCache(
+            blocks * 16,
+            util.FULLY_ASSOCIATIVE,
+            16,
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+        )
+        hits, counters = cache.simulate_trace(addresses)
+        assert analyzer.hits(blocks) == counters["hits"]
+        assert curve[blocks - 1] == (blocks, blocks * 16, counters["hits"] / 20000)
+
+    per_set = StackDistanceAnalyzer(16, no_of_sets=8)
+    per_set.process(addresses)
+    for ways in (2, 4, 8):
+        cache = ArrayCache(
+            8 * ways * 16,
+            f"{ways}-WAY",
+            16,
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+        )
+        hits, counters = cache.simulate_trace(addresses)
+        assert per_set.hits(ways) == counters["hits"]
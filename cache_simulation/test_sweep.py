@@ -0,0 +1,66 @@
+import numpy as np
+
+import sweep
+import util
+from array_cache import ArrayCache
+from util import ReplacementStrategy, WritePolicy
+
+
+def test_sweep_matches_serial_runs(tmp_path):
+    rng = np.random.default_rng(3)
+    addresses = rng.integers(0, 1 << 14, size=20000)
+    ops = rng.random(20000) < 0.25
+
+    path = tmp_path / "run.din"
+    path.write_text(
+        "".join(f"{int(op)} {address:x}\n" for address, op in zip(addresses, ops))
+    )
+
+    configurations = sweep.sweep_configurations(
+        [256, 1024],
+        [util.DIRECTLY_MAPPED, "4-WAY", "128-WAY"],
+        [16],
+        [
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+            ReplacementStrategy.FIRST_IN_FIRST_OUT,
+        ],
+        [WritePolicy.WRITE_BACK],
+    )
+    # 128-WAY needs two lines of 128 blocks of 16 bytes
+    assert len(configurations) == 8
+
+    results = sweep.run_sweep(str(path), configurations, workers=2, chunk_size=4096)
+
+    for configuration, result in zip(configurations, results):
+        hits, counters = ArrayCache(**configuration).simulate_trace(addresses, ops)
+        assert result["hits"] == counters["hits"]
+        assert result["misses"] == counters["misses"]
+        assert result["hit_ratio"] == counters["hits"] / len(addresses)
+
+
+def test_sweep_tells_write_policies_apart(tmp_path):
+    rng = np.random.default_rng(4)
+    addresses = rng.integers(0, 1 << 12, size=5000)
+    ops = rng.random(5000) < 0.5
+
+    path = tmp_path / "run.din"
+    path.write_text(
+        "".join(f"{int(op)} {address:x}\n" for address, op in zip(addresses, ops))
+    )
+
+    configurations = sweep.sweep_configurations(
+        [256],
+        ["4-WAY"],
+        [16],
+        [ReplacementStrategy.LEAST_RECENTLY_USED],
+        [WritePolicy.WRITE_BACK, WritePolicy.WRITE_THROUGH],
+    )
+    write_back, write_through = sweep.run_sweep(str(path), configurations, workers=2)
+
+    assert write_back["hits"] == write_through["hits"]
+    assert write_back["dirty_writebacks"] > 0
+    assert write_through["dirty_writebacks"] == 0
+    assert write_through["ram_writes"] == int(np.count_nonzero(ops))
+    assert write_back["ram_writes"] == write_back["dirty_writebacks"]
+    assert write_back["ram_bytes_written"] == 16 * write_back["ram_writes"]
+    assert write_back["ram_reads"] == write_through["ram_reads"]
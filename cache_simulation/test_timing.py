@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+import sweep
+from cache import Cache
+from cache import Ram
+from hierarchy import CacheHierarchy
+from timing import LevelTiming, TimingModel, rank_configurations
+from util import CacheError, ReplacementStrategy, WritePolicy
+
+
+def single_level(write_policy, capacity=64):
+    cache = Cache(
+        capacity, "2-WAY", 16, ReplacementStrategy.LEAST_RECENTLY_USED, write_policy
+    )
+    return CacheHierarchy([cache], Ram(1, 16))
+
+
+def test_amat_of_hits_and_cold_misses():
+    hierarchy = single_level(WritePolicy.WRITE_BACK)
+    model = TimingModel([LevelTiming(hit_latency=2)], ram_latency=50, ram_bandwidth=4)
+
+    # four blocks, read ten times each
+    addresses = [block * 16 for block in range(4)] * 10
+    report = model.simulate(hierarchy, addresses)
+
+    # a miss: lookup, RAM latency, 16 bytes at 4 bytes per cycle
+    assert report["total_cycles"] == 4 * (2 + 50 + 4) + 36 * 2
+    assert report["amat"] == report["total_cycles"] / 40
+    assert report["served_by_ram"] == 4
+    assert report["levels"][0]["served"] == 36
+    assert report["ram_bytes_read"] == 64
+    assert report["ram_bytes_written"] == 0
+
+
+def test_write_buffer_hides_write_through_latency():
+    rng = random.Random(1)
+    addresses = [rng.randrange(4) * 16 for i in range(500)]
+    ops = [rng.random() < 0.5 for i in range(500)]
+
+    reports = []
+    for write_buffer_size in (0, 1, 8):
+        model = TimingModel(
+            [LevelTiming()], ram_latency=20, write_buffer_size=write_buffer_size
+        )
+        reports.append(
+            model.simulate(single_level(WritePolicy.WRITE_THROUGH), addresses, ops)
+        )
+
+    unbuffered, small, large = reports
+    writes = sum(ops)
+    assert unbuffered["ram_bytes_written"] == writes * 16
+    assert unbuffered["write_stall_cycles"] == writes * (20 + 2)
+    assert small["total_cycles"] < unbuffered["total_cycles"]
+    assert large["write_stall_cycles"] <= small["write_stall_cycles"]
+    assert 1 <= large["write_buffer_max_occupancy"] <= 8
+    assert small["write_buffer_max_occupancy"] == 1
+
+
+def test_lower_levels_and_miss_penalty():
+    levels = [
+        Cache(64, "2-WAY", 16, ReplacementStrategy.LEAST_RECENTLY_USED),
+        Cache(256, "2-WAY", 16, ReplacementStrategy.LEAST_RECENTLY_USED),
+    ]
+    hierarchy = CacheHierarchy(levels, Ram(1, 16))
+    model = TimingModel([LevelTiming(1), LevelTiming(10, bandwidth=8)], ram_latency=100)
+    assert model.access_cycles(0, 16) == (1, False)
+    assert model.access_cycles(1, 16) == (1 + 10 + 2, False)
+    assert model.access_cycles(2, 16) == (11, True)
+
+    fixed = TimingModel([LevelTiming(1, miss_penalty=30), LevelTiming(10)])
+    assert fixed.access_cycles(2, 16) == (31, False)
+
+    report = model.simulate(hierarchy, [block * 16 for block in range(8)] * 3)
+    assert [level["served"] for level in report["levels"]] == [0, 16]
+    assert report["served_by_ram"] == 8
+
+    with pytest.raises(CacheError):
+        TimingModel([LevelTiming()]).simulate(hierarchy, [0])
+
+
+def test_rank_configurations_by_amat():
+    rng = random.Random(7)
+    addresses = [rng.randrange(1 << 10) for i in range(2000)]
+    ops = [rng.random() < 0.3 for i in range(2000)]
+
+    configurations = sweep.sweep_configurations(
+        [128, 512],
+        ["2-WAY"],
+        [16],
+        [ReplacementStrategy.LEAST_RECENTLY_USED],
+        [WritePolicy.WRITE_BACK, WritePolicy.WRITE_THROUGH],
+    )
+    results = rank_configurations(
+        configurations, addresses, ops, TimingModel([LevelTiming()])
+    )
+
+    assert len(results) == 4
+    amats = [result["amat"] for result in results]
+    assert amats == sorted(amats)
+    assert results[0]["capacity"] == 512
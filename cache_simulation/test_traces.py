@@ -0,0 +1,49 @@
+import gzip
+
+import numpy as np
+
+import traces
+from cache import Cache
+from cache import Ram
+
+
+def test_text_traces(tmp_path):
+    dinero = tmp_path / "run.din"
+    dinero.write_text("0 1000\n1 1004\n2 2000\n4 0\n\n0 1008\n")
+
+    chunks = list(traces.read_trace(str(dinero), chunk_size=2))
+    assert [len(addresses) for addresses, ops in chunks] == [2, 2]
+    addresses = np.concatenate([addresses for addresses, ops in chunks])
+    ops = np.concatenate([ops for addresses, ops in chunks])
+    assert addresses.tolist() == [0x1000, 0x1004, 0x2000, 0x1008]
+    assert ops.tolist() == [False, True, False, False]
+
+    lackey = tmp_path / "run.lackey.gz"
+    with gzip.open(lackey, "wt") as trace:
+        trace.write("==123== Lackey\nI  0400d7d4,3\n L 7ff000398,8\n M 0421d368,4\n")
+
+    addresses, ops = next(
+        traces.read_trace(str(lackey), include_instructions=False, address_bits=32)
+    )
+    assert addresses.tolist() == [0xFF000398, 0x0421D368, 0x0421D368]
+    assert ops.tolist() == [False, False, True]
+
+
+def test_binary_trace_round_trip(tmp_path):
+    addresses = np.arange(0, 40000, 4, dtype=np.int64)
+    ops = addresses % 3 == 0
+
+    for name in ("run.bin", "run.bin.gz"):
+        path = str(tmp_path / name)
+        traces.write_binary_trace(path, [(addresses, ops)])
+
+        chunks = list(traces.read_trace(path, chunk_size=4096))
+        assert len(chunks) == 3
+        assert np.concatenate([a for a, o in chunks]).tolist() == addresses.tolist()
+        assert np.concatenate([o for a, o in chunks]).tolist() == ops.tolist()
+
+        cache = Cache(1024, "4-WAY", 16, ram=Ram(1, 16))
+        expected = Cache(1024, "4-WAY", 16, ram=Ram(1, 16))
+        assert traces.replay_trace(cache, path, chunk_size=4096) == (
+            expected.simulate_trace(addresses, ops)[1]
+        )
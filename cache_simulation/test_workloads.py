@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+from array_cache import ArrayCache
+from controller import Controller
+from util import CacheError, ReplacementStrategy, WritePolicy
+from workloads import (
+    ConflictWorkload,
+    PointerChaseWorkload,
+    SequentialWorkload,
+    StridedWorkload,
+    UniformWorkload,
+    WorkingSetShiftWorkload,
+    ZipfWorkload,
+)
+
+
+def all_workloads(seed):
+    return [
+        UniformWorkload(1 << 16, write_ratio=0.3, seed=seed),
+        ZipfWorkload(1 << 16, exponent=0.8, write_ratio=0.3, seed=seed),
+        SequentialWorkload(1 << 16, base=1 << 20, seed=seed),
+        StridedWorkload(1 << 16, 192, access_size=64, seed=seed),
+        PointerChaseWorkload(1 << 16, access_size=64, seed=seed),
+        WorkingSetShiftWorkload(1 << 20, 1 << 12, 1000, seed=seed),
+        ConflictWorkload(16, 32, 8, write_ratio=0.5, seed=seed),
+    ]
+
+
+def concatenated(chunks):
+    chunks = list(chunks)
+    return (
+        np.concatenate([addresses for addresses, ops in chunks]),
+        np.concatenate([ops for addresses, ops in chunks]),
+    )
+
+
+def test_workloads_are_seeded():
+    for first, second, other in zip(
+        all_workloads(1), all_workloads(1), all_workloads(2)
+    ):
+        addresses, ops = concatenated(first.chunks(10000, chunk_size=3000))
+        same_addresses, same_ops = second.generate(10000)
+        assert len(addresses) == 10000
+        assert addresses.tolist() == same_addresses.tolist()
+        assert ops.tolist() == same_ops.tolist()
+        assert np.all(addresses % first.access_size == 0)
+        assert addresses.min() >= first.base
+        assert addresses.max() < first.base + first.region_size
+
+        if not isinstance(first, (SequentialWorkload, StridedWorkload)):
+            assert other.generate(10000)[0].tolist() != addresses.tolist()
+
+
+def test_streams_continue_across_chunks():
+    stream = SequentialWorkload(1 << 10, access_size=4, base=64)
+    addresses, ops = concatenated(stream.chunks(600, chunk_size=7))
+    assert addresses.tolist() == [64 + 4 * (i % 256) for i in range(600)]
+    assert not ops.any()
+
+    strided = StridedWorkload(1 << 10, 96, access_size=32)
+    addresses = np.concatenate([strided.next_chunk(5)[0] for i in range(4)])
+    assert addresses.tolist() == [96 * i % 1024 for i in range(20)]
+
+    # every node of the list once per round, in the same order every round
+    chase = PointerChaseWorkload(1 << 12, access_size=64, seed=3)
+    addresses, ops = concatenated(chase.chunks(192, chunk_size=50))
+    assert sorted(addresses[:64].tolist()) == list(range(0, 1 << 12, 64))
+    assert addresses[:64].tolist() == addresses[64:128].tolist()
+
+
+def test_zipf_popularity():
+    zipf = ZipfWorkload(1 << 14, exponent=1.0, access_size=16, seed=4)
+    addresses, ops = zipf.generate(200000)
+    counts = np.sort(np.bincount(addresses // 16, minlength=1 << 10))[::-1]
+
+    # the unit of rank r gets 1 / (r * H(n)) of the accesses
+    harmonic = np.sum(1 / np.arange(1, 1025))
+    assert counts[0] / 200000 == pytest.approx(1 / harmonic, rel=0.05)
+    assert counts[9] / 200000 == pytest.approx(1 / (10 * harmonic), rel=0.15)
+
+    uniform = ZipfWorkload(1 << 14, exponent=0.0, access_size=16, seed=4)
+    counts = np.bincount(uniform.generate(200000)[0] // 16, minlength=1 << 10)
+    assert counts.max() < 2 * counts.mean()
+
+
+def test_working_set_moves():
+    workload = WorkingSetShiftWorkload(
+        1 << 16, 1 << 10, 500, shift=1 << 9, access_size=4, seed=5
+    )
+    addresses, ops = concatenated(workload.chunks(64000, chunk_size=777))
+    for phase in range(128):
+        start = phase * (1 << 9) % (1 << 16)
+        offsets = (addresses[phase * 500 : (phase + 1) * 500] - start) % (1 << 16)
+        assert offsets.max() < 1 << 10
+
+
+def test_conflicts_defeat_lru():
+    cache = ArrayCache(4096, "4-WAY", 16, ReplacementStrategy.LEAST_RECENTLY_USED)
+    workload = ConflictWorkload.for_cache(cache, first=2, lines=[3, 17], seed=6)
+    addresses, ops = workload.generate(20000)
+
+    lines = (addresses // 16) % cache.no_of_cache_lines
+    assert set(lines.tolist()) == {3, 17}
+    assert lines[:4].tolist() == [3, 17, 3, 17]
+    assert (addresses // 16).min() >= 2 * cache.no_of_cache_lines
+
+    # eight blocks per line compete for four ways
+    hits, counters = cache.simulate_trace(addresses, ops)
+    assert 0.3 < counters["misses"] / 20000 < 0.7
+
+    with pytest.raises(CacheError):
+        ConflictWorkload.for_cache(cache, lines=[64])
+
+
+def test_controller_runs_are_seeded():
+    def replacements(seed):
+        controller = Controller(seed)
+        controller.create_cache(
+            256,
+            "4-WAY",
+            8,
+            ReplacementStrategy.LEAST_RECENTLY_USED,
+            WritePolicy.WRITE_BACK,
+        )
+        controller.create_ram(1, 8)
+        controller.fill_cache()
+        return list(controller.replacement_operations())
+
+    operations = replacements(7)
+    assert operations == replacements(7)
+
+    # one block per line, from beyond the filled cache
+    assert [index for name, tag, index, data in operations] == list(range(8))
+    for name, tag, index, data in operations:
+        assert name.endswith("_with_miss")
+        assert 32 <= tag < (1 << 20) // 8 and tag % 8 == index
@@ -0,0 +1,223 @@
+import math
+from collections import deque
+
+import util
+from cache import Cache
+from cache import Ram
+from hierarchy import CacheHierarchy
+from util import CacheError
+
+# Cost of the accesses of a trace, in processor cycles. The trace runs through
+# a CacheHierarchy (a single cache is a hierarchy of one level) and every
+# access is charged:
+# - the hit latency of every level looked up, down to the level holding the
+#   block, plus the time that level needs to send the block up
+# - for blocks from the RAM, the RAM latency plus the block transfer time
+# RAM writes (write-throughs and write-backs) are posted to a write buffer and
+# drain in the background; the processor only stalls when the buffer is full.
+# The RAM serves one transfer at a time, so writes draining delay the reads
+# queued behind them. Writes between two cache levels are not charged.
+
+
+class LevelTiming:
+
+    # hit_latency - cycles to look the block up (and read it on a hit)
+    # bandwidth - bytes per cycle the level sends to the level above (None
+    # sends a whole block in one cycle)
+    # miss_penalty - fixed cycles of a miss in this level, instead of the cost
+    # of the levels below it
+    def __init__(self, hit_latency=1, bandwidth=None, miss_penalty=None):
+        self.hit_latency = hit_latency
+        self.bandwidth = bandwidth
+        self.miss_penalty = miss_penalty
+
+
+class TimingModel:
+
+    # level_timings - one LevelTiming per level of the hierarchy, L1 first
+    # ram_latency - cycles until a RAM transfer starts
+    # ram_bandwidth - bytes per cycle between the RAM and the last level
+    # write_buffer_size - RAM writes that can be pending (0 makes every RAM
+    # write stall the processor until it is done)
+    def __init__(
+        self, level_timings, ram_latency=100, ram_bandwidth=8, write_buffer_size=4
+    ):
+        if not level_timings:
+            raise CacheError("A timing model needs the timing of at least one level")
+        if ram_bandwidth <= 0:
+            raise CacheError("RAM bandwidth must be positive")
+        if write_buffer_size < 0:
+            raise CacheError("Write buffer size cannot be negative")
+
+        self.level_timings = list(level_timings)
+        self.ram_latency = ram_latency
+        self.ram_bandwidth = ram_bandwidth
+        self.write_buffer_size = write_buffer_size
+
+    @staticmethod
+    def transfer_cycles(block_size, bandwidth):
+        if bandwidth is None:
+            return 1
+        return math.ceil(block_size / bandwidth)
+
+    # cycles of an access served by the level (len(levels) is the RAM), RAM
+    # time excluded; returns (cycles, whether the RAM time is still to be
+    # charged, that is no fixed miss penalty covered it)
+    def access_cycles(self, hit_level, block_size):
+
+        cycles = 0
+        for level, timing in enumerate(self.level_timings):
+            cycles += timing.hit_latency
+            if level == hit_level:
+                if level > 0:
+                    cycles += self.transfer_cycles(block_size, timing.bandwidth)
+                return cycles, False
+            if timing.miss_penalty is not None:
+                return cycles + timing.miss_penalty, False
+
+        return cycles, True
+
+    # runs the trace (addresses and ops, true meaning write) through the
+    # hierarchy and returns the timing report
+    def simulate(self, hierarchy, addresses, ops=None):
+
+        if len(self.level_timings) != len(hierarchy.levels):
+            raise CacheError("The timing model and the hierarchy differ in levels")
+
+        if hasattr(addresses, "tolist"):
+            addresses = addresses.tolist()
+        if ops is None:
+            ops = [False] * len(addresses)
+        elif hasattr(ops, "tolist"):
+            ops = ops.tolist()
+        if len(ops) != len(addresses):
+            raise CacheError("Trace addresses and ops differ in length")
+
+        ram = hierarchy.ram
+        block_size = hierarchy.block_size
+        transfer = self.transfer_cycles(block_size, self.ram_bandwidth)
+        served = [0] * (len(hierarchy.levels) + 1)
+
+        now = 0
+        ram_free_at = 0  # cycle the RAM finishes its queued transfers
+        write_buffer = deque()  # cycles the pending RAM writes complete at
+        write_stall_cycles = 0
+        max_occupancy = 0
+        occupancy_total = 0
+        buffered_writes = 0
+        ram_bytes_read = ram.bytes_read
+        ram_bytes_written = ram.bytes_written
+
+        for address, is_write in zip(addresses, ops):
+            reads_before = ram.read_transactions
+            writes_before = ram.write_transactions
+
+            hit_level, data = hierarchy.access(address, bool(is_write))
+            served[hit_level] += 1
+
+            cycles, charge_ram = self.access_cycles(hit_level, block_size)
+            now += cycles
+
+            # blocks read from the RAM keep the processor waiting (unless a
+            # miss penalty stands for them), they always take RAM bandwidth
+            for read in range(ram.read_transactions - reads_before):
+                start = max(now, ram_free_at)
+                ram_free_at = start + transfer
+                if charge_ram:
+                    now = start + self.ram_latency + transfer
+
+            for write in range(ram.write_transactions - writes_before):
+                while write_buffer and write_buffer[0] <= now:
+                    write_buffer.popleft()
+
+                if self.write_buffer_size == 0:
+                    start = max(now, ram_free_at)
+                    ram_free_at = start + transfer
+                    done = start + self.ram_latency + transfer
+                    write_stall_cycles += done - now
+                    now = done
+                    continue
+
+                if len(write_buffer) == self.write_buffer_size:
+                    write_stall_cycles += write_buffer[0] - now
+                    now = write_buffer.popleft()
+
+                occupancy_total += len(write_buffer)
+                buffered_writes += 1
+                start = max(now, ram_free_at)
+                ram_free_at = start + transfer
+                write_buffer.append(ram_free_at)
+                max_occupancy = max(max_occupancy, len(write_buffer))
+
+        accesses = len(addresses)
+        ram_bytes_read = ram.bytes_read - ram_bytes_read
+        ram_bytes_written = ram.bytes_written - ram_bytes_written
+        ram_bandwidth_used = (ram_bytes_read + ram_bytes_written) / now if now else 0.0
+
+        levels = []
+        for level, (cache, timing) in enumerate(
+            zip(hierarchy.levels, self.level_timings)
+        ):
+            stats = cache.stats
+            levels.append(
+                {
+                    "level": f"L{level + 1}",
+                    "hit_latency": timing.hit_latency,
+                    "served": served[level],
+                    "hit_ratio": stats.hit_ratio(),
+                    "bytes_from_below": stats.ram_reads * block_size,
+                    "bytes_to_below": stats.ram_writes * block_size,
+                }
+            )
+
+        return {
+            "accesses": accesses,
+            "total_cycles": now,
+            "amat": now / accesses if accesses else 0.0,
+            "served_by_ram": served[-1],
+            "write_stall_cycles": write_stall_cycles,
+            "write_buffer_max_occupancy": max_occupancy,
+            "write_buffer_average_occupancy": (
+                occupancy_total / buffered_writes if buffered_writes else 0.0
+            ),
+            "ram_bytes_read": ram_bytes_read,
+            "ram_bytes_written": ram_bytes_written,
+            "ram_bandwidth_used": ram_bandwidth_used,
+            "ram_utilization": ram_bandwidth_used / self.ram_bandwidth,
+            "levels": levels,
+        }
+
+
+# Runs the trace through a single cache per configuration (keyword arguments
+# of Cache, see sweep.sweep_configurations) and returns one row per
+# configuration, fastest (lowest AMAT) first
+def rank_configurations(configurations, addresses, ops, model, ram_size=None):
+
+    if hasattr(addresses, "tolist"):
+        addresses = addresses.tolist()
+    if ram_size is None:
+        # megabytes needed to hold every address of the trace
+        ram_size = max(1, math.ceil((max(addresses, default=0) + 1) / (1 << 20)))
+
+    results = []
+    for configuration in configurations:
+        cache = Cache(**configuration)
+        hierarchy = CacheHierarchy([cache], Ram(ram_size, cache.block_size))
+        report = model.simulate(hierarchy, addresses, ops)
+        results.append(
+            {
+                "capacity": cache.capacity,
+                "associativity": cache.associativity,
+                "block_size": cache.block_size,
+                "strategy": util.strategy_name(cache.strategy),
+                "write_policy": cache.write_policy.name,
+                "hit_ratio": cache.stats.hit_ratio(),
+                "amat": report["amat"],
+                "total_cycles": report["total_cycles"],
+                "write_stall_cycles": report["write_stall_cycles"],
+                "ram_bandwidth_used": report["ram_bandwidth_used"],
+            }
+        )
+
+    results.sort(key=lambda result: result["amat"])
+    return results
@@ -0,0 +1,291 @@
+import gzip
+import mmap
+import os
+from array import array
+
+import numpy as np
+
+import util
+from util import CacheError
+
+# Memory traces are read as a stream of (addresses, ops) chunks: two NumPy
+# arrays of at most chunk_size entries, ops being true for writes. Chunks can
+# be fed straight to Cache.simulate_trace, so a trace of any length is
+# replayed in constant memory.
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+# binary format: the magic, then one packed record per access
+BINARY_MAGIC = b"CACHETR1"
+BINARY_RECORD = np.dtype([("address", "<u8"), ("op", "u1")])
+
+# dinero labels: 0 read, 1 write, 2 instruction fetch (3 escape, 4 flush)
+DINERO_READ = 0
+DINERO_WRITE = 1
+DINERO_FETCH = 2
+
+
+def detect_format(path):
+    name = os.path.basename(path).lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+
+    extension = os.path.splitext(name)[1]
+    if extension in (".din", ".dinero"):
+        return util.DINERO_TRACE
+    if extension in (".lackey", ".vgtrace"):
+        return util.LACKEY_TRACE
+    if extension in (".bin", ".trace"):
+        return util.BINARY_TRACE
+
+    raise CacheError("Unknown trace format of " + path)
+
+
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+# address_bits - if given, addresses are cut to their lowest address_bits bits
+# (e.g. to replay 64 bit traces on a CACHE_ADDRESS_SIZE wide cache)
+def read_trace(
+    path,
+    trace_format=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    include_instructions=True,
+    address_bits=None,
+):
+
+    if trace_format is None:
+        trace_format = detect_format(path)
+
+    if trace_format == util.DINERO_TRACE:
+        chunks = read_dinero(path, chunk_size, include_instructions)
+    elif trace_format == util.LACKEY_TRACE:
+        chunks = read_lackey(path, chunk_size, include_instructions)
+    elif trace_format == util.BINARY_TRACE:
+        chunks = read_binary(path, chunk_size)
+    else:
+        raise CacheError("Invalid trace format: " + str(trace_format))
+
+    if address_bits is None:
+        return chunks
+    return mask_addresses(chunks, address_bits)
+
+
+def mask_addresses(chunks, address_bits):
+    mask = (1 << address_bits) - 1
+    for addresses, ops in chunks:
+        yield addresses & mask, ops
+
+
+# text readers gather a chunk in flat arrays, then hand it over without a copy
+def text_chunks(records, chunk_size):
+
+    addresses = array("q")
+    ops = bytearray()
+
+    for address, is_write in records:
+        addresses.append(address)
+        ops.append(is_write)
+
+        if len(ops) == chunk_size:
+            yield np.frombuffer(addresses, dtype=np.int64), np.frombuffer(
+                ops, dtype=bool
+            )
+            addresses = array("q")
+            ops = bytearray()
+
+    if ops:
+        yield np.frombuffer(addresses, dtype=np.int64), np.frombuffer(ops, dtype=bool)
+
+
+def dinero_records(path, include_instructions):
+
+    with open_text(path) as trace:
+        for line_number, line in enumerate(trace, 1):
+            fields = line.split()
+            if not fields:
+                continue
+
+            try:
+                label = int(fields[0])
+                address = int(fields[1], 16)
+            except (ValueError, IndexError):
+                raise CacheError(f"{path}:{line_number}: invalid dinero record")
+
+            if label == DINERO_WRITE:
+                yield address, 1
+            elif label == DINERO_READ or (
+                label == DINERO_FETCH and include_instructions
+            ):
+                yield address, 0
+
+
+def read_dinero(path, chunk_size=DEFAULT_CHUNK_SIZE, include_instructions=True):
+    return text_chunks(dinero_records(path, include_instructions), chunk_size)
+
+
+# lackey lines look like "I  0400d7d4,8", " L 7ff000398,8", " S ..." and " M ..."
+# (modify: a load followed by a store), valgrind's own lines start with "=="
+def lackey_records(path, include_instructions):
+
+    with open_text(path) as trace:
+        for line_number, line in enumerate(trace, 1):
+            fields = line.split()
+            if len(fields) != 2 or line.startswith("=="):
+                continue
+
+            kind = fields[0]
+            try:
+                address = int(fields[1].split(",")[0], 16)
+            except ValueError:
+                raise CacheError(f"{path}:{line_number}: invalid lackey record")
+
+            if kind == "L":
+                yield address, 0
+            elif kind == "S":
+                yield address, 1
+            elif kind == "M":
+                yield address, 0
+                yield address, 1
+            elif kind == "I":
+                if include_instructions:
+                    yield address, 0
+            else:
+                raise CacheError(f"{path}:{line_number}: invalid lackey record")
+
+
+def read_lackey(path, chunk_size=DEFAULT_CHUNK_SIZE, include_instructions=True):
+    return text_chunks(lackey_records(path, include_instructions), chunk_size)
+
+
+# multi-threaded traces: "<core> <dinero label> <hex address>" per line, read
+# as chunks of (cores, addresses, ops)
+def read_core_trace(path, chunk_size=DEFAULT_CHUNK_SIZE, include_instructions=True):
+
+    cores = array("q")
+    addresses = array("q")
+    ops = bytearray()
+
+    with open_text(path) as trace:
+        for line_number, line in enumerate(trace, 1):
+            fields = line.split()
+            if not fields:
+                continue
+
+            try:
+                core = int(fields[0])
+                label = int(fields[1])
+                address = int(fields[2], 16)
+            except (ValueError, IndexError):
+                raise CacheError(f"{path}:{line_number}: invalid core trace record")
+
+            if label == DINERO_WRITE:
+                is_write = 1
+            elif label == DINERO_READ or (
+                label == DINERO_FETCH and include_instructions
+            ):
+                is_write = 0
+            else:
+                continue
+
+            cores.append(core)
+            addresses.append(address)
+            ops.append(is_write)
+
+            if len(ops) == chunk_size:
+                yield core_chunk(cores, addresses, ops)
+                cores = array("q")
+                addresses = array("q")
+                ops = bytearray()
+
+    if ops:
+        yield core_chunk(cores, addresses, ops)
+
+
+def core_chunk(cores, addresses, ops):
+    return (
+        np.frombuffer(cores, dtype=np.int64),
+        np.frombuffer(addresses, dtype=np.int64),
+        np.frombuffer(ops, dtype=bool),
+    )
+
+
+# Plain binary traces are mapped in memory and every chunk is a view of the
+# mapping. The mapping is released once no chunk refers to it any more.
+def read_binary(path, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    if path.endswith(".gz"):
+        yield from read_compressed_binary(path, chunk_size)
+        return
+
+    with open(path, "rb") as trace:
+        if trace.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise CacheError(path + " is not a binary trace")
+
+        size = os.fstat(trace.fileno()).st_size - len(BINARY_MAGIC)
+        if size % BINARY_RECORD.itemsize:
+            raise CacheError(path + " ends with a truncated record")
+        if size == 0:
+            return
+
+        mapping = mmap.mmap(trace.fileno(), 0, access=mmap.ACCESS_READ)
+
+    no_of_records = size // BINARY_RECORD.itemsize
+    for start in range(0, no_of_records, chunk_size):
+        records = np.frombuffer(
+            mapping,
+            dtype=BINARY_RECORD,
+            count=min(chunk_size, no_of_records - start),
+            offset=len(BINARY_MAGIC) + start * BINARY_RECORD.itemsize,
+        )
+        yield records["address"], records["op"].view(bool)
+
+
+def read_compressed_binary(path, chunk_size):
+
+    with gzip.open(path, "rb") as trace:
+        if trace.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise CacheError(path + " is not a binary trace")
+
+        while True:
+            data = trace.read(chunk_size * BINARY_RECORD.itemsize)
+            if not data:
+                return
+            if len(data) % BINARY_RECORD.itemsize:
+                raise CacheError(path + " ends with a truncated record")
+
+            records = np.frombuffer(data, dtype=BINARY_RECORD)
+            yield records["address"], records["op"].view(bool)
+
+
+# writes a binary trace (gzip compressed if the path ends in .gz); chunks is an
+# iterable of (addresses, ops), e.g. the output of read_trace
+def write_binary_trace(path, chunks):
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wb") as trace:
+        trace.write(BINARY_MAGIC)
+
+        for addresses, ops in chunks:
+            records = np.empty(len(addresses), dtype=BINARY_RECORD)
+            records["address"] = addresses
+            records["op"] = ops
+            trace.write(records.tobytes())
+
+
+# replays a trace file through the cache chunk by chunk, returns the counters
+def replay_trace(cache, path, trace_format=None, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    totals = {}
+    chunks = read_trace(
+        path, trace_format, chunk_size, address_bits=util.CACHE_ADDRESS_SIZE
+    )
+    for addresses, ops in chunks:
+        hits, counters = cache.simulate_trace(addresses, ops)
+        for name, value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+
+    return totals
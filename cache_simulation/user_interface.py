@@ -67,6 +67,14 @@ class Ui_window(object):
         self.start_button = QtWidgets.QPushButton(self.centralwidget)
         self.start_button.setGeometry(QtCore.QRect(180, 650, 93, 28))
         self.start_button.setObjectName("start_button")
+        self.cancel_button = QtWidgets.QPushButton(self.centralwidget)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setGeometry(QtCore.QRect(180, 690, 93, 28))
+        self.cancel_button.setObjectName("cancel_button")
+        self.progress_bar = QtWidgets.QProgressBar(self.centralwidget)
+        self.progress_bar.setGeometry(QtCore.QRect(50, 730, 223, 23))
+        self.progress_bar.setProperty("value", 0)
+        self.progress_bar.setObjectName("progress_bar")
         self.replacement_strategy_label = QtWidgets.QLabel(self.centralwidget)
         self.replacement_strategy_label.setGeometry(QtCore.QRect(20, 150, 141, 20))
         self.replacement_strategy_label.setObjectName("replacement_strategy_label")
@@ -81,6 +89,10 @@ class Ui_window(object):
         self.replacement_strategy_combo_box.addItem("")
         self.replacement_strategy_combo_box.addItem("")
         self.replacement_strategy_combo_box.addItem("")
+        self.replacement_strategy_combo_box.addItem("")
+        self.replacement_strategy_combo_box.addItem("")
+        self.replacement_strategy_combo_box.addItem("")
+        self.replacement_strategy_combo_box.addItem("")
         self.write_policy_combo_box = QtWidgets.QComboBox(self.centralwidget)
         self.write_policy_combo_box.setGeometry(QtCore.QRect(170, 190, 161, 22))
         self.write_policy_combo_box.setObjectName("write_policy_combo_box")
@@ -107,23 +119,19 @@ class Ui_window(object):
         self.block_size_input = QtWidgets.QLineEdit(self.centralwidget)
         self.block_size_input.setGeometry(QtCore.QRect(110, 420, 221, 22))
         self.block_size_input.setObjectName("block_size_input")
-        self.cache_contents_table = QtWidgets.QTableWidget(self.centralwidget)
+        self.cache_contents_table = QtWidgets.QTableView(self.centralwidget)
         self.cache_contents_table.setEnabled(True)
         self.cache_contents_table.setGeometry(QtCore.QRect(360, 50, 631, 701))
         self.cache_contents_table.setObjectName("cache_contents_table")
-        self.cache_contents_table.setColumnCount(0)
-        self.cache_contents_table.setRowCount(0)
         self.line_2 = QtWidgets.QFrame(self.centralwidget)
         self.line_2.setGeometry(QtCore.QRect(1000, 0, 20, 771))
         self.line_2.setFrameShape(QtWidgets.QFrame.VLine)
         self.line_2.setFrameShadow(QtWidgets.QFrame.Sunken)
         self.line_2.setObjectName("line_2")
-        self.operations_table = QtWidgets.QTableWidget(self.centralwidget)
+        self.operations_table = QtWidgets.QTableView(self.centralwidget)
         self.operations_table.setEnabled(True)
         self.operations_table.setGeometry(QtCore.QRect(1030, 50, 381, 701))
         self.operations_table.setObjectName("operations_table")
-        self.operations_table.setColumnCount(0)
-        self.operations_table.setRowCount(0)
         self.cache_config_label_2 = QtWidgets.QLabel(self.centralwidget)
         self.cache_config_label_2.setGeometry(QtCore.QRect(360, 10, 231, 31))
         font = QtGui.QFont()
@@ -163,6 +171,7 @@ class Ui_window(object):
         self.block_configuration_label.setText(_translate("window", "Block Configuration"))
         self.create_button.setText(_translate("window", "Create"))
         self.start_button.setText(_translate("window", "Start"))
+        self.cancel_button.setText(_translate("window", "Cancel"))
         self.replacement_strategy_label.setText(_translate("window", "Replacement strategy:"))
         self.write_policy_combo_label.setText(_translate("window", "Write policy:"))
         self.replacement_strategy_combo_box.setItemText(0, _translate("window", "Random"))
@@ -170,6 +179,10 @@ class Ui_window(object):
         self.replacement_strategy_combo_box.setItemText(2, _translate("window", "Least Frequently Used"))
         self.replacement_strategy_combo_box.setItemText(3, _translate("window", "Least Recently Used"))
         self.replacement_strategy_combo_box.setItemText(4, _translate("window", "Most Recently Used"))
+        self.replacement_strategy_combo_box.setItemText(5, _translate("window", "Pseudo LRU"))
+        self.replacement_strategy_combo_box.setItemText(6, _translate("window", "SRRIP"))
+        self.replacement_strategy_combo_box.setItemText(7, _translate("window", "BRRIP"))
+        self.replacement_strategy_combo_box.setItemText(8, _translate("window", "ARC"))
         self.write_policy_combo_box.setItemText(0, _translate("window", "Write Once"))
         self.write_policy_combo_box.setItemText(1, _translate("window", "Write Back"))
         self.write_policy_combo_box.setItemText(2, _translate("window", "Write Through"))
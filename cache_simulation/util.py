@@ -8,6 +8,16 @@ FULLY_ASSOCIATIVE = "fully_associative"
 DIRECTLY_MAPPED = "directly_mapped"
 CACHE_ADDRESS_SIZE = 32
 
+OBJECT_ENGINE = "object"  # one CacheBlock object per block
+ARRAY_ENGINE = "array"  # block metadata kept in flat typed arrays
+
+DINERO_TRACE = "din"  # "<label> <hex address>" per line
+LACKEY_TRACE = "lackey"  # valgrind --tool=lackey --trace-mem=yes output
+BINARY_TRACE = "binary"  # fixed-width records, see traces.py
+
+SET_SAMPLING = "sets"  # a random subset of the lines, see sampling.py
+INTERVAL_SAMPLING = "intervals"  # measured intervals with warmup
+
 PRIME_ONE = 997
 PRIME_TWO = 1009
 BYTE_MAX = 256
@@ -51,6 +61,37 @@ def extrack_k_from_k_way(associativity):
     raise CacheError(associativity + "is not in K-WAY format")
 
 
+# (number of lines, blocks per line) of a cache; raises CacheError for the
+# geometries a cache cannot have
+def cache_geometry(capacity, associativity, block_size):
+
+    if not is_power_of_two(block_size):
+        raise CacheError("Block size not a power of two")
+
+    if not is_power_of_two(capacity):
+        raise CacheError("Capacity not a power of two")
+
+    if associativity == DIRECTLY_MAPPED:
+        return capacity // block_size, 1
+    if associativity == FULLY_ASSOCIATIVE:
+        return 1, capacity // block_size
+    if is_k_way(associativity):
+        associated = extrack_k_from_k_way(associativity)
+        no_of_cache_lines = capacity // (associated * block_size)
+        if no_of_cache_lines < 2:
+            raise CacheError(
+                "K-way association too high (NOTE: Block Size * Associativity <= Capacity / 2)"
+            )
+        return no_of_cache_lines, associated
+
+    raise CacheError("Invalid associativity: " + associativity)
+
+
+# hex representation of block data, only meant for display
+def format_data(data, separator=" "):
+    return separator.join(hex(byte) for byte in data)
+
+
 class CacheError(Exception):
     pass
 
@@ -61,9 +102,47 @@ class ReplacementStrategy(Enum):
     FIRST_IN_FIRST_OUT = 3
     LEAST_FREQUENTLY_USED = 4
     MOST_RECENTLY_USED = 5
+    PSEUDO_LEAST_RECENTLY_USED = 6
+    STATIC_RRIP = 7
+    BIMODAL_RRIP = 8
+    ADAPTIVE_REPLACEMENT = 9
 
 
 class WritePolicy(Enum):
     WRITE_THROUGH = 1
     WRITE_BACK = 2
     WRITE_ONCE = 3
+
+
+class InclusionPolicy(Enum):
+    INCLUSIVE = 1  # every block of a level is also held by the levels below
+    EXCLUSIVE = 2  # a block is held by at most one level
+    NON_INCLUSIVE = 3  # non-inclusive non-exclusive (NINE): no constraint
+
+
+class CoherenceProtocol(Enum):
+    MESI = 1
+    MOESI = 2  # MESI plus Owned: a dirty block can be shared without a write-back
+
+
+# block metadata shown next to the tags of the cache table, by the replacement
+# strategies that decide on it: access count (AC) or access time (AT)
+ACCESS_COUNT_STRATEGIES = (
+    ReplacementStrategy.LEAST_FREQUENTLY_USED,
+    ReplacementStrategy.STATIC_RRIP,
+    ReplacementStrategy.BIMODAL_RRIP,
+    ReplacementStrategy.ADAPTIVE_REPLACEMENT,
+)
+ACCESS_TIME_STRATEGIES = (
+    ReplacementStrategy.LEAST_RECENTLY_USED,
+    ReplacementStrategy.MOST_RECENTLY_USED,
+    ReplacementStrategy.PSEUDO_LEAST_RECENTLY_USED,
+)
+
+
+# name of a replacement strategy in reports: strategies registered under a
+# name of their own (see replacement.register_policy) are not enum members
+def strategy_name(strategy):
+    if isinstance(strategy, ReplacementStrategy):
+        return strategy.name
+    return str(strategy)
@@ -0,0 +1,217 @@
+import numpy as np
+
+import traces
+import util
+from util import CacheError
+
+# Seeded synthetic workloads, generated as numpy arrays of addresses and ops
+# (True meaning write) like the chunks of traces.read_trace, so they feed
+# Cache.simulate_trace, sweep and sampling directly. Every access of a chunk
+# is drawn at once; the state of a pattern (stream position, pointer, phase)
+# carries over from chunk to chunk, so chunks() can run without end. Addresses
+# and ops are drawn from separate generators, so the accesses do not depend on
+# the chunk size.
+#
+# Sizes are in bytes. Every workload accesses a region of region_size bytes
+# starting at base, in units of access_size bytes (the address of an access
+# is a multiple of access_size).
+
+
+class Workload:
+
+    # write_ratio - share of the accesses that are writes
+    # seed - seed of the generator, or a numpy Generator to draw from
+    def __init__(
+        self,
+        region_size,
+        access_size=util.CELL_SIZE,
+        base=0,
+        write_ratio=0.0,
+        seed=None,
+    ):
+
+        if access_size < 1 or region_size < access_size:
+            raise CacheError("The region must hold at least one access")
+        if not 0.0 <= write_ratio <= 1.0:
+            raise CacheError("Write ratio must be between 0 and 1")
+
+        self.region_size = region_size
+        self.access_size = access_size
+        self.base = base
+        self.no_of_units = region_size // access_size
+        self.write_ratio = write_ratio
+        self.rng = np.random.default_rng(seed)
+        self.op_rng = np.random.default_rng(self.rng.integers(1 << 63))
+        self.position = 0  # accesses generated so far
+
+    # units (offsets in access_size) of the next count accesses
+    def next_units(self, count):
+        raise NotImplementedError
+
+    # the next count accesses as (addresses, ops)
+    def next_chunk(self, count):
+
+        addresses = self.base + self.next_units(count) * self.access_size
+        ops = self.op_rng.random(count) < self.write_ratio
+        self.position += count
+        return addresses, ops
+
+    # no_of_accesses - None generates chunks forever
+    def chunks(self, no_of_accesses=None, chunk_size=traces.DEFAULT_CHUNK_SIZE):
+
+        remaining = no_of_accesses
+        while remaining is None or remaining > 0:
+            count = chunk_size if remaining is None else min(chunk_size, remaining)
+            yield self.next_chunk(count)
+            if remaining is not None:
+                remaining -= count
+
+    # every access at once (a single chunk)
+    def generate(self, no_of_accesses):
+        return self.next_chunk(no_of_accesses)
+
+
+class UniformWorkload(Workload):
+
+    # every unit of the region equally likely
+    def next_units(self, count):
+        return self.rng.integers(0, self.no_of_units, size=count)
+
+
+class ZipfWorkload(Workload):
+
+    # exponent - the unit of popularity rank r is accessed with a probability
+    # proportional to 1 / r ** exponent; the ranks are spread over the region
+    # at random, so the popular units do not all share the same lines
+    def __init__(self, region_size, exponent=1.0, **kwargs):
+
+        super().__init__(region_size, **kwargs)
+        if exponent < 0:
+            raise CacheError("Zipf exponent must not be negative")
+
+        self.exponent = exponent
+        weights = np.arange(1, self.no_of_units + 1, dtype=np.float64) ** -exponent
+        self.cumulative = np.cumsum(weights)
+        self.cumulative /= self.cumulative[-1]
+        self.units = self.rng.permutation(self.no_of_units)  # unit of every rank
+
+    def next_units(self, count):
+        ranks = np.searchsorted(self.cumulative, self.rng.random(count), side="right")
+        return self.units[np.minimum(ranks, self.no_of_units - 1)]
+
+
+class StridedWorkload(Workload):
+
+    # stride - distance in bytes between two accesses (a multiple of
+    # access_size); the stream wraps around at the end of the region
+    def __init__(self, region_size, stride, **kwargs):
+
+        super().__init__(region_size, **kwargs)
+        if stride < 1 or stride % self.access_size:
+            raise CacheError("Stride must be a multiple of the access size")
+        self.stride = stride
+
+    def next_units(self, count):
+        steps = np.arange(self.position, self.position + count, dtype=np.int64)
+        return steps * (self.stride // self.access_size) % self.no_of_units
+
+
+class SequentialWorkload(StridedWorkload):
+
+    # a stream over the region, one access after the other
+    def __init__(self, region_size, access_size=util.CELL_SIZE, **kwargs):
+        super().__init__(region_size, access_size, access_size=access_size, **kwargs)
+
+
+class PointerChaseWorkload(Workload):
+
+    # A linked list with one node per unit of the region, in random order: each
+    # access goes to the node the previous one points to, so consecutive
+    # addresses are unrelated but every node comes back once per round. The
+    # list is a single cycle, so the visiting order is drawn once up front.
+    def __init__(self, region_size, **kwargs):
+
+        super().__init__(region_size, **kwargs)
+        self.order = self.rng.permutation(self.no_of_units)
+
+    def next_units(self, count):
+        steps = np.arange(self.position, self.position + count, dtype=np.int64)
+        return self.order[steps % self.no_of_units]
+
+
+class WorkingSetShiftWorkload(Workload):
+
+    # uniform accesses to a working set of working_set_size bytes, which moves
+    # by shift bytes (default: a whole working set) every phase_length accesses
+    # and wraps around at the end of the region
+    def __init__(
+        self, region_size, working_set_size, phase_length, shift=None, **kwargs
+    ):
+
+        super().__init__(region_size, **kwargs)
+        if shift is None:
+            shift = working_set_size
+        if not self.access_size <= working_set_size <= region_size:
+            raise CacheError("The working set must fit in the region")
+        if phase_length < 1 or shift % self.access_size:
+            raise CacheError("Invalid working set phases")
+
+        self.working_set_units = working_set_size // self.access_size
+        self.shift_units = shift // self.access_size
+        self.phase_length = phase_length
+
+    def next_units(self, count):
+        steps = np.arange(self.position, self.position + count, dtype=np.int64)
+        starts = steps // self.phase_length * self.shift_units
+        offsets = self.rng.integers(0, self.working_set_units, size=count)
+        return (starts + offsets) % self.no_of_units
+
+
+class ConflictWorkload(Workload):
+
+    # Blocks that all compete for the same lines of a cache: the lines are
+    # visited in turn and each access goes to one of the blocks_per_line
+    # blocks mapped to its line, chosen at random. Block k of line i is
+    # block (first + k) * no_of_cache_lines + i, counted from base.
+    # lines - the lines targeted (default: every line)
+    def __init__(
+        self,
+        no_of_cache_lines,
+        block_size,
+        blocks_per_line,
+        first=0,
+        lines=None,
+        **kwargs,
+    ):
+
+        if blocks_per_line < 1:
+            raise CacheError("At least one block per line is needed")
+        region_size = (first + blocks_per_line) * no_of_cache_lines * block_size
+        super().__init__(region_size, access_size=block_size, **kwargs)
+
+        if lines is None:
+            lines = np.arange(no_of_cache_lines)
+        self.lines = np.asarray(lines, dtype=np.int64)
+        if len(self.lines) == 0 or not (
+            0 <= self.lines.min() and self.lines.max() < no_of_cache_lines
+        ):
+            raise CacheError("Targeted lines must be lines of the cache")
+
+        self.no_of_cache_lines = no_of_cache_lines
+        self.blocks_per_line = blocks_per_line
+        self.first = first
+
+    # the workload on the lines of the given cache, blocks_per_line default
+    # twice its associativity
+    @classmethod
+    def for_cache(cls, cache, blocks_per_line=None, **kwargs):
+
+        if blocks_per_line is None:
+            blocks_per_line = 2 * cache.associated
+        return cls(cache.no_of_cache_lines, cache.block_size, blocks_per_line, **kwargs)
+
+    def next_units(self, count):
+        steps = np.arange(self.position, self.position + count, dtype=np.int64)
+        lines = self.lines[steps % len(self.lines)]
+        rows = self.first + self.rng.integers(0, self.blocks_per_line, size=count)
+        return rows * self.no_of_cache_lines + lines